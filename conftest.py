@@ -1,19 +1,23 @@
+import os
 import pytest
-import logging
+from pytest_bdd import parsers, then
 from utilities.config import load_config
-from utilities.db_manager import DatabaseManager
+from utilities.consistency import ConsistencyChecker
+from utilities.db_manager import create_database_manager
+from utilities.incremental import IncrementalSweep, SweepPlan
 from utilities.api_client import APIClient
+from utilities.log_setup import get_logger
+from utilities.metrics import registry
+from utilities.results import ResultStore
+from utilities.sharding import shard_batches, shared_snapshot
+
+pytest_plugins = ["utilities.pytest_metrics", "utilities.pytest_perf_gate", "utilities.pytest_sharding",
+                  "utilities.pytest_profile", "utilities.pytest_soak"]
 
 
 # Setup logger
 def setup_logger():
-    logger = logging.getLogger("api_test_logger")
-    logger.setLevel(logging.INFO)
-    handler = logging.FileHandler("logs/api_test.log")
-    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-    handler.setFormatter(formatter)
-    logger.addHandler(handler)
-    return logger
+    return get_logger("api_test_logger")
 
 
 @pytest.fixture(scope="session")
@@ -21,14 +25,33 @@ def logger():
     return setup_logger()
 
 
+def pytest_addoption(parser):
+    parser.addoption("--record-mode", choices=("off", "replay", "record", "record-missing"), default=None,
+                     help="Replay API responses from the local cassette store instead of (or while) calling the API")
+    parser.addoption("--field-sweep", choices=("first", "sample", "all"), default=None,
+                     help="Which Field_Master fields the field sweep calls GetFieldData for (default: [field_sweep] mode)")
+    parser.addoption("--user-sweep", choices=("full", "incremental"), default=None,
+                     help="Check every user, or only users changed since the last run (default: [incremental] mode)")
+
+
 @pytest.fixture(scope="session")
-def config():
-    return load_config()
+def config(pytestconfig):
+    config = load_config()
+    record_mode = pytestconfig.getoption("record_mode")
+    if record_mode:
+        config['api']['record_mode'] = record_mode
+    field_sweep = pytestconfig.getoption("field_sweep")
+    if field_sweep:
+        config['field_sweep']['mode'] = field_sweep
+    user_sweep = pytestconfig.getoption("user_sweep")
+    if user_sweep:
+        config['incremental']['mode'] = user_sweep
+    return config
 
 
 @pytest.fixture(scope="session")
 def db_manager(config):
-    db = DatabaseManager()
+    db = create_database_manager(config)
     db.connect()
     yield db
     db.close()
@@ -36,4 +59,115 @@ def db_manager(config):
 
 @pytest.fixture(scope="session")
 def api_client(config):
-    return APIClient(config['api']['base_url'])
+    client = APIClient.from_config(config)
+    yield client
+    client.close()
+
+
+@pytest.fixture
+def result_store(config, user_shard, user_shards):
+    store = ResultStore.from_settings(config['api'], suffix=f"shard{user_shard}" if user_shards > 1 else None)
+    yield store
+    store.close()
+
+
+@pytest.fixture(scope="session")
+def user_sweep(config, db_manager, user_shards, shard_directory):
+    """
+    IncrementalSweep with this run's plan in incremental mode (None in full mode). The plan is made once per run
+    and shared by every shard.
+    """
+    if config['incremental'].get('mode', fallback='full') != 'incremental':
+        return None
+    sweep = IncrementalSweep.from_settings(config['incremental'], db_manager)
+    if user_shards == 1:
+        sweep.plan = sweep.make_plan()
+    else:
+        plan = shared_snapshot(os.path.join(shard_directory, "sweep_plan.json"),
+                               lambda: [sweep.make_plan().to_dict()])
+        sweep.plan = SweepPlan.from_dict(plan[0])
+    return sweep
+
+
+def planned_users(user_sweep):
+    """
+    The explicit user list of an incremental plan, or None when every user is checked.
+    """
+    return user_sweep.plan.users if user_sweep is not None else None
+
+
+@pytest.fixture
+def shard_user_emails(db_manager, user_shard, user_shards, shard_directory, user_sweep):
+    """
+    The user emails this test's shard checks, or None when a single unsharded full sweep checks every user.
+
+    Sharded runs read the user list once per session into a snapshot file shared by all xdist workers, then keep
+    only the users that hash into this shard. Incremental runs use the planned users instead.
+    """
+    users = planned_users(user_sweep)
+    if users is None:
+        if user_shards == 1:
+            return None
+        users = shared_snapshot(
+            os.path.join(shard_directory, "users.json"),
+            lambda: (user_email for batch in db_manager.iter_user_emails() for user_email in batch),
+        )
+    return [user_email for batch in shard_batches([users], user_shard, user_shards) for user_email in batch]
+
+
+@pytest.fixture
+def user_access_checker(config, db_manager, shard_user_emails):
+    """
+    ConsistencyChecker preloaded with the expected MAP.User_Access digests of the users in this test's shard, so
+    parallel workers each read only their own users' rows.
+    """
+    checker = ConsistencyChecker.from_settings(config['consistency'])
+    checker.load_expected(db_manager.iter_user_access(shard_user_emails))
+    return checker
+
+
+@pytest.fixture
+def field_name_batches(config, db_manager):
+    """
+    Batches of field names for the field sweep: every field (keyset-paged), the first ``size`` fields, or a
+    ``TABLESAMPLE`` of up to ``size`` fields.
+    """
+    section = config['field_sweep']
+    mode = section.get('mode', fallback='first')
+    if mode == 'all':
+        return db_manager.iter_field_names(section.getint('page_size', fallback=None))
+    size = section.getint('size', fallback=50)
+    sample_percent = section.getfloat('sample_percent', fallback=10.0) if mode == 'sample' else None
+    return [db_manager.sample_field_names(size, sample_percent)]
+
+
+@pytest.fixture
+def user_email_batches(db_manager, shard_user_emails):
+    """
+    Batches of user emails for this test's shard; a single unsharded full sweep streams them straight from the
+    database.
+    """
+    if shard_user_emails is None:
+        return db_manager.iter_user_emails()
+    return [shard_user_emails] if shard_user_emails else []
+
+
+@pytest.fixture
+def scenario_latency():
+    """
+    LatencyWindow of the requests sent by the current scenario; request it from the scenario's given step so the
+    window opens before the first request.
+    """
+    window = registry.open_window()
+    yield window
+    registry.close_window(window)
+
+
+@then(parsers.parse('the p95 latency of "{endpoint}" should be below {limit:d} ms'))
+def verify_p95_latency(scenario_latency, endpoint, limit):
+    histogram = scenario_latency.histogram(endpoint)
+    if not histogram.count:
+        # Replayed responses take no network time and are kept out of the metrics; an empty shard sends nothing
+        pytest.skip(f"This scenario sent no requests to {endpoint}; there is no latency to check")
+    p95 = histogram.percentile(95)
+    assert p95 < limit, f"p95 latency for {endpoint} is {p95:.1f} ms, expected below {limit} ms"
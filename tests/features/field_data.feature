@@ -4,3 +4,10 @@ Feature: Validate Field Data API
     Given the API client and database are available
     When a GET request is sent to "/api/FieldData/GetFieldData"
     Then the response code should be 200
+    Then the response body should match the GetFieldData schema
+    Then the p95 latency of "/api/FieldData/GetFieldData" should be below 2000 ms
+
+  Scenario: Get field data for every field in Field_Master
+    Given the API client and database are available
+    When a GET request is sent to "/api/FieldData/GetFieldData" for each field
+    Then the response code should be 200 for all fields
@@ -4,4 +4,6 @@ Feature: Validate User Access API
     Given the API client and database are available
     When a GET request is sent to "/api/Access/GetUserAccessInfo" for each user
     Then the response code should be 200 for all valid users
+    Then the access returned for each user should match MAP.User_Access
+    Then the p95 latency of "/api/Access/GetUserAccessInfo" should be below 2000 ms
     Then the response code should be 404 for all invalid users
@@ -1,24 +1,80 @@
 import pytest
 from pytest_bdd import scenarios, given, when, then
+from utilities.pipeline import stream_requests
+from utilities.results import ResultStore
+from utilities.schema import SchemaValidationError, load_schema, validate_chunks
 
 scenarios('features/field_data.feature')
 
 
 @given("the API client and database are available")
-def setup(api_client, db_manager):
+def setup(api_client, db_manager, scenario_latency):
     assert api_client is not None
     assert db_manager is not None
 
 
 @when('a GET request is sent to "/api/FieldData/GetFieldData"')
 def send_field_data_request(api_client, db_manager):
-    field_name = db_manager.fetch_field_name()
-    params = {"FieldName": field_name}
-    response = api_client.get("/api/FieldData/GetFieldData", params=params)
-    pytest.response = response
+    params = {"FieldName": db_manager.fetch_field_name()}
+    # Stream the (potentially large) body and validate it as it arrives; a violation is reported by the then step
+    try:
+        pytest.response, pytest.validated_values = api_client.get_validated("/api/FieldData/GetFieldData", params)
+        pytest.schema_error = None
+    except SchemaValidationError as e:
+        pytest.response, pytest.validated_values = None, 0
+        pytest.schema_error = e
 
 
 @then("the response code should be 200")
 def verify_response_code(logger):
+    assert pytest.response is not None, f"Response body failed schema validation: {pytest.schema_error}"
     assert pytest.response.status_code == 200
     logger.info(f"Response Code: {pytest.response.status_code}")
+
+
+@then("the response body should match the GetFieldData schema")
+def verify_response_schema(logger):
+    assert pytest.schema_error is None, f"Response body failed schema validation: {pytest.schema_error}"
+    logger.info(f"Validated {pytest.validated_values} JSON values against the GetFieldData schema")
+
+
+@when('a GET request is sent to "/api/FieldData/GetFieldData" for each field')
+def send_field_sweep_requests(config, field_name_batches):
+    schema = load_schema("/api/FieldData/GetFieldData")
+    pytest.schema_errors = {}
+
+    def validate(field_name, result):
+        # Buffered on purpose: the pipeline's client has already read each body for the result store's size and
+        # hash, and at most `concurrency` bodies are alive at once. get_validated streams single large bodies.
+        if result.response is not None and result.error is None:
+            # Recorded per field so one bad body fails only that field instead of cancelling the sweep
+            try:
+                validate_chunks([result.response.content], schema)
+            except ValueError as e:
+                pytest.schema_errors[field_name] = str(e)
+
+    store = ResultStore.from_settings(config['api'], suffix="fields")
+    try:
+        pytest.field_results = stream_requests(
+            config,
+            "/api/FieldData/GetFieldData",
+            field_name_batches,
+            lambda field_name: {"FieldName": field_name},
+            store=store,
+            observers=[validate],
+        )
+    finally:
+        store.close()
+
+
+@then("the response code should be 200 for all fields")
+def verify_field_sweep_response_codes(logger):
+    assert len(pytest.field_results), "No field names were read from MAP.Field_Master"
+    failures = [(field_name, result.status_code, result.error) for field_name, result in pytest.field_results
+                if result.status_code != 200]
+    logger.info(f"GetFieldData called for {len(pytest.field_results)} fields, {len(failures)} failed")
+    for field_name, error in pytest.schema_errors.items():
+        logger.error("GetFieldData for %s failed schema validation: %s", field_name, error)
+    assert not failures, f"{len(failures)} fields did not return 200, first: {failures[:5]}"
+    assert not pytest.schema_errors, f"{len(pytest.schema_errors)} fields failed schema validation, first: " \
+                                     f"{list(pytest.schema_errors.items())[:5]}"
@@ -1,38 +1,84 @@
+import os
 import pytest
 import httpx
-from pytest_bdd import scenarios, given, when, then
+from pytest_bdd import scenario, given, when, then
+from utilities.consistency import ConsistencyChecker, normalize_key
+from utilities.pipeline import stream_requests
 
-# Load the feature scenarios
-scenarios('features/get_user_access.feature')
+
+@scenario('features/get_user_access.feature', 'Check for valid users in Azure')
+def test_check_for_valid_users_in_azure(user_shard):
+    """
+    Parametrized into one item per user shard, so pytest-xdist can spread the sweep across workers.
+    """
 
 
 @given("the API client and database are available")
-def setup(api_client, db_manager):
+def setup(api_client, db_manager, scenario_latency):
     assert api_client is not None, "API client is not available"
     assert db_manager is not None, "Database manager is not available"
 
 
-@when('a GET request is sent to "/api/Access/GetUserAccessInfo" for each user')
-def send_user_access_request(api_client, db_manager):
+def fetched_user_emails(user_email_batches):
+    """
+    Pass the user email batches through, reporting a database error as a fetch failure. The batches are read
+    while the requests run, so API errors raised meanwhile are left to surface as they are.
+    """
     try:
-        users = db_manager.fetch_user_emails()
+        yield from user_email_batches
     except Exception as e:
         pytest.fail(f"Failed to fetch user emails: {e}")
 
-    pytest.responses = []
 
-    for user_email in users:
-        params = {"UserEmail": user_email}
-        response = api_client.get("/api/Access/GetUserAccessInfo", params=params)
-        pytest.responses.append((user_email, response))
+@when('a GET request is sent to "/api/Access/GetUserAccessInfo" for each user')
+def send_user_access_request(config, user_email_batches, user_shard, shard_report, result_store,
+                             user_access_checker):
+    pytest.responses = stream_requests(
+        config,
+        "/api/Access/GetUserAccessInfo",
+        fetched_user_emails(user_email_batches),
+        lambda user_email: {"UserEmail": user_email},
+        store=result_store,
+        observers=[user_access_checker.observe],
+    )
+
+    shard_report.write(user_shard, (
+        {"user": user_email, "status": result.status_code, "latency_ms": round(result.latency_ms, 1),
+         "body_size": result.body_size, "body_hash": f"{result.body_hash:016x}", "error": result.error}
+        for user_email, result in pytest.responses
+    ))
 
 
 @then("the response code should be 200 for all valid users")
-def verify_response_code(logger):
-    for user_email, response in pytest.responses:
-        logger.info(f"Testing user: {user_email}")
-        assert response.status_code == 200, f"Expected 200 for user: {user_email}, got {response.status_code}"
-        logger.info(f"Response Code for {user_email}: {response.status_code}")
+def verify_response_code(user_sweep, logger):
+    if user_sweep is not None:
+        # Queued before asserting, so the next run re-checks them even when the scenario stops here
+        user_sweep.add_pending(user_email for user_email, result in pytest.responses if result.status_code != 200)
+    for user_email, result in pytest.responses:
+        logger.info("Testing user: %s", user_email, extra={"sample": True})
+        assert result.status_code == 200, \
+            f"Expected 200 for user: {user_email}, got {result.status_code} ({result.error})"
+        logger.info("Response Code for %s: %s", user_email, result.status_code, extra={"sample": True})
+
+
+@then("the access returned for each user should match MAP.User_Access")
+def verify_user_access_matches_database(config, db_manager, user_access_checker, user_shard, user_shards, user_sweep,
+                                        logger):
+    report = user_access_checker.report(fetch_rows=db_manager.iter_user_access)
+    if user_sweep is not None:
+        # The synced version only advances once the comparison is done, so its mismatches cannot be lost
+        mismatched = report["diffs"]
+        user_sweep.commit((user_email, result.status_code == 200 and normalize_key(user_email) not in mismatched)
+                          for user_email, result in pytest.responses)
+    path = config.get('consistency', 'report_path', fallback='logs/user_access_consistency.json')
+    if user_shards > 1:
+        root, ext = os.path.splitext(path)
+        path = f"{root}.shard{user_shard}{ext}"
+    ConsistencyChecker.write_report(report, path)
+    logger.info(f"Compared {report['checked']} users with MAP.User_Access: {report['matched']} matched, "
+                f"{report['mismatched']} mismatched")
+    assert not report["mismatched"], \
+        f"{report['mismatched']} users' access differs from MAP.User_Access; see {path} for the diffs"
 
 
 @then("the response code should be 404 for all invalid users")
@@ -0,0 +1,73 @@
+import asyncio
+
+import httpx
+
+from utilities.api_client import AsyncAPIClient
+from utilities.metrics import MetricsRegistry
+
+ENDPOINT = "/api/Access/GetUserAccessInfo"
+
+
+class FakeServer:
+    """
+    Async MockTransport handler that answers after a short delay and tracks how many requests overlap.
+    """
+
+    def __init__(self, missing=()):
+        self.missing = set(missing)
+        self.in_flight = 0
+        self.peak = 0
+
+    async def __call__(self, request):
+        user = request.url.params["UserEmail"]
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            # Later users answer first, so completion order differs from input order
+            await asyncio.sleep(0.001 * (10 - int(user[1:].split("@")[0]) % 10))
+        finally:
+            self.in_flight -= 1
+        if user in self.missing:
+            return httpx.Response(404, text="not found")
+        return httpx.Response(200, json={"user": user})
+
+
+def make_client(server, concurrency):
+    client = AsyncAPIClient("https://map.test", concurrency=concurrency, metrics_registry=MetricsRegistry())
+    client.client = httpx.AsyncClient(transport=httpx.MockTransport(server))
+    return client
+
+
+def get_many(client, param_sets, **options):
+    async def run():
+        async with client:
+            return await client.get_many(ENDPOINT, param_sets, **options)
+    return asyncio.run(run())
+
+
+def test_results_come_back_in_input_order_with_bounded_concurrency():
+    server = FakeServer()
+    users = [{"UserEmail": f"u{n}@example.com"} for n in range(20)]
+    results = get_many(make_client(server, concurrency=4), users)
+
+    assert [result.response.json()["user"] for result in results] == [params["UserEmail"] for params in users]
+    assert server.peak == 4
+
+
+def test_failed_request_is_recorded_without_aborting_the_batch():
+    server = FakeServer(missing={"u1@example.com"})
+    client = make_client(server, concurrency=2)
+    results = get_many(client, [{"UserEmail": f"u{n}@example.com"} for n in range(3)])
+
+    assert [result.ok for result in results] == [True, False, True]
+    assert results[1].status_code == 404
+    assert isinstance(results[1].error, httpx.HTTPStatusError)
+    assert client.metrics.summary()[ENDPOINT]["requests"] == 3
+
+
+def test_concurrency_override_and_empty_batches():
+    server = FakeServer()
+    assert get_many(make_client(server, concurrency=10), []) == []
+    get_many(make_client(server, concurrency=10), [{"UserEmail": f"u{n}@example.com"} for n in range(5)],
+             concurrency=1)
+    assert server.peak == 1
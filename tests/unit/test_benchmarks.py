@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+from utilities.benchmarks import compare, format_report, main, result, timed
+
+
+def report(*entries):
+    return {"results": list(entries)}
+
+
+def test_result_rounds_float_metrics():
+    assert result("db", "streaming", {"rows": 10}, seconds=0.12345678, rows=10) == {
+        "name": "db.streaming", "params": {"rows": 10}, "metrics": {"seconds": 0.123457, "rows": 10}}
+
+
+def test_timed_reports_the_median_after_a_warm_up():
+    calls = []
+    assert timed(lambda: calls.append(1), repeat=3) >= 0
+    assert len(calls) == 4
+
+
+def test_compare_matches_benchmarks_by_name_and_params():
+    before = report(result("db", "streaming", {"rows": 1000}, rows_per_s=100.0, peak_kib=0.0),
+                    result("db", "streaming", {"rows": 10}, rows_per_s=1.0))
+    after = report(result("db", "streaming", {"rows": 1000}, rows_per_s=150.0, peak_kib=5.0),
+                   result("db", "fetchall", {"rows": 1000}, rows_per_s=50.0))
+
+    lines = compare(before, after).splitlines()
+    assert len(lines) == 2
+    assert lines[1].split() == ["db.streaming", "rows_per_s", "100.000", "150.000", "+50.0%"]
+
+
+def test_format_report_lists_params_and_metrics():
+    lines = format_report(report(result("client", "pooled", {"requests": 5}, requests_per_s=2.5))).splitlines()
+    assert lines[1].split() == ["client.pooled", "requests=5", "requests_per_s=2.5"]
+
+
+def test_db_group_runs_end_to_end(tmp_path, capsys):
+    output = tmp_path / "benchmarks.json"
+    argv = ["--only", "db", "--rows", "50", "--repeat", "1", "--workdir", str(tmp_path), "--output", str(output)]
+    assert main(argv) == 0
+
+    with open(output) as f:
+        written = json.load(f)
+    assert [entry["name"] for entry in written["results"]] == ["db.fetchall", "db.streaming"]
+    assert written["parameters"]["rows"] == [50]
+    assert written["environment"]["python"]
+
+    assert main(argv + ["--compare", str(output)]) == 0
+    assert "db.streaming" in capsys.readouterr().out.split("change")[-1]
+
+
+def test_unknown_group_is_rejected():
+    with pytest.raises(SystemExit):
+        main(["--only", "network"])
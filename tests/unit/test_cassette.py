@@ -0,0 +1,93 @@
+import httpx
+import pytest
+
+from utilities.api_client import APIClient
+from utilities.cassette import Cassette, CassetteMissError, CassetteStore
+from utilities.metrics import MetricsRegistry
+from utilities.schema import SchemaNode, SchemaValidationError
+
+ENDPOINT = "/api/Access/GetUserAccessInfo"
+
+
+def make_client(mode, store, handler):
+    client = APIClient("https://map.test", metrics_registry=MetricsRegistry(), cassette=Cassette(mode, store))
+    client.client.close()
+    client.client = httpx.Client(transport=httpx.MockTransport(handler))
+    return client
+
+
+def offline(request):
+    raise AssertionError(f"Replay touched the network: {request.url}")
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = CassetteStore(str(tmp_path / "cassettes.sqlite"))
+    yield store
+    store.close()
+
+
+def test_record_then_replay(store):
+    calls = []
+
+    def live(request):
+        calls.append(request.url.params["UserEmail"])
+        return httpx.Response(200, json={"user": request.url.params["UserEmail"], "access": [1, 2]},
+                              headers={"ETag": '"v1"'})
+
+    with make_client("record", store, live) as recorder:
+        recorded = recorder.get(ENDPOINT, {"UserEmail": "a@example.com"})
+        assert list(recorder.metrics.endpoints) == [ENDPOINT]
+    assert calls == ["a@example.com"]
+
+    with make_client("replay", store, offline) as replayer:
+        replayed = replayer.get(ENDPOINT, {"UserEmail": "a@example.com"})
+        assert replayed.status_code == 200
+        assert replayed.json() == recorded.json()
+        assert replayed.headers["ETag"] == '"v1"'
+        # Replayed responses take no network time and stay out of the latency metrics
+        assert not replayer.metrics.endpoints
+        with pytest.raises(CassetteMissError):
+            replayer.get(ENDPOINT, {"UserEmail": "b@example.com"})
+
+
+def test_record_missing_only_calls_the_api_for_new_requests(store):
+    calls = []
+
+    def live(request):
+        calls.append(request.url.params["UserEmail"])
+        return httpx.Response(404, json={"error": "not found"})
+
+    with make_client("record-missing", store, live) as client:
+        assert client.send(ENDPOINT, {"UserEmail": "a@example.com"}).status_code == 404
+        assert client.send(ENDPOINT, {"UserEmail": "a@example.com"}).status_code == 404
+        client.send(ENDPOINT, {"UserEmail": "b@example.com"})
+    assert calls == ["a@example.com", "b@example.com"]
+
+
+def test_validated_stream_is_recorded_and_replayed(store):
+    schema = SchemaNode({"type": "array", "items": {"type": "object", "required": ["RowID"]}})
+    rows = [{"RowID": index} for index in range(3)]
+
+    def live(request):
+        return httpx.Response(200, json=rows, headers={"Content-Type": "application/json"})
+
+    with make_client("record", store, live) as recorder:
+        _, recorded_values = recorder.get_validated("/api/FieldData/GetFieldData", {"FieldName": "f"}, schema)
+
+    with make_client("replay", store, offline) as replayer:
+        replayed, values = replayer.get_validated("/api/FieldData/GetFieldData", {"FieldName": "f"}, schema)
+        assert values == recorded_values == 7
+        assert replayed.json() == rows
+
+
+def test_invalid_stream_is_not_recorded(store):
+    schema = SchemaNode({"type": "array", "items": {"type": "object", "required": ["RowID"]}})
+
+    with make_client("record", store, lambda request: httpx.Response(200, json=[{"Other": 1}])) as recorder:
+        with pytest.raises(SchemaValidationError):
+            recorder.get_validated("/api/FieldData/GetFieldData", {"FieldName": "f"}, schema)
+
+    with make_client("replay", store, offline) as replayer:
+        with pytest.raises(CassetteMissError):
+            replayer.get_validated("/api/FieldData/GetFieldData", {"FieldName": "f"}, schema)
@@ -0,0 +1,66 @@
+import datetime
+
+import httpx
+
+from utilities.api_client import RequestResult
+from utilities.consistency import ConsistencyChecker
+
+ROWS = [[
+    {"UserEmail": "A@example.com", "RoleID": 1, "FieldID": 10, "GrantedOn": datetime.datetime(2024, 1, 2, 3, 4, 5),
+     "IsActive": True},
+    {"UserEmail": "a@example.com", "RoleID": 2, "FieldID": 20, "GrantedOn": None, "IsActive": False},
+    {"UserEmail": "b@example.com", "RoleID": 1, "FieldID": 30, "GrantedOn": None, "IsActive": True},
+]]
+
+
+def result(body=None, content=None):
+    request = httpx.Request("GET", "https://map.test/api/Access/GetUserAccessInfo")
+    response = httpx.Response(200, json=body, request=request) if content is None else \
+        httpx.Response(200, content=content, request=request)
+    return RequestResult({}, response=response)
+
+
+def checker():
+    checker = ConsistencyChecker()
+    checker.load_expected(ROWS)
+    return checker
+
+
+def test_matching_payload_ignores_order_case_and_extra_fields():
+    consistency = checker()
+    consistency.observe("a@example.com", result({"userEmail": "a@example.com", "access": [
+        {"RoleID": 2, "FieldID": 20, "GrantedOn": None, "IsActive": 0, "Extra": "x"},
+        {"RoleID": 1, "FieldID": 10, "GrantedOn": "2024-01-02T03:04:05", "IsActive": 1},
+    ]}))
+
+    report = consistency.report()
+    assert (report["checked"], report["matched"], report["mismatched"]) == (1, 1, 0)
+
+
+def test_mismatch_is_diffed_against_the_database():
+    consistency = checker()
+    consistency.observe("B@example.com", result([{"RoleID": 1, "FieldID": 31, "GrantedOn": None, "IsActive": True}]))
+
+    report = consistency.report(fetch_rows=lambda users: [[row for row in ROWS[0]
+                                                          if row["UserEmail"].lower() in users]])
+    assert report["mismatched"] == 1
+    diff = report["diffs"]["b@example.com"]
+    assert [record["fieldid"] for record in diff["missing_from_api"]] == [30]
+    assert [record["fieldid"] for record in diff["unexpected_in_api"]] == [31]
+
+
+def test_non_json_body_counts_as_mismatch_without_raising():
+    consistency = checker()
+    consistency.observe("a@example.com", result(content=b"<html>Service Unavailable</html>"))
+    consistency.observe("b@example.com", result([{"RoleID": 1, "FieldID": 30, "GrantedOn": None, "IsActive": 1}]))
+
+    report = consistency.report(fetch_rows=lambda users: [])
+    assert (report["checked"], report["matched"], report["mismatched"], report["invalid"]) == (2, 1, 1, 1)
+    assert "not valid JSON" in report["diffs"]["a@example.com"]["error"]
+
+
+def test_unknown_users_are_reported():
+    consistency = checker()
+    consistency.observe("c@example.com", result([]))
+
+    assert consistency.report()["unknown_users"] == ["c@example.com"]
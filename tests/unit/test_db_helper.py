@@ -0,0 +1,47 @@
+from utilities.db_helper import SeenSet, fetch_batches, iter_unique_column, unique_batches
+
+
+class FakeCursor:
+    """
+    DB-API cursor over a list of rows; fetchmany() honours arraysize and counts round-trips.
+    """
+
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.arraysize = 1
+        self.fetches = 0
+
+    def fetchmany(self):
+        self.fetches += 1
+        batch, self.rows = self.rows[:self.arraysize], self.rows[self.arraysize:]
+        return batch
+
+
+def test_rows_are_fetched_batch_size_at_a_time():
+    cursor = FakeCursor([(n,) for n in range(5)])
+    assert [len(batch) for batch in fetch_batches(cursor, 2)] == [2, 2, 1]
+    assert cursor.fetches == 4
+
+
+def test_batches_are_pulled_lazily():
+    cursor = FakeCursor([(n,) for n in range(10)])
+    batches = fetch_batches(cursor, 3)
+    next(batches)
+    assert cursor.fetches == 1
+
+
+def test_duplicates_are_dropped_across_batches_in_first_seen_order():
+    cursor = FakeCursor([("a@example.com",), ("b@example.com",), ("a@example.com",),
+                         ("a@example.com",), ("c@example.com",)])
+    assert list(iter_unique_column(cursor, batch_size=2)) == [["a@example.com", "b@example.com"], ["c@example.com"]]
+
+
+def test_unique_batches_reads_the_requested_column():
+    batches = [[(1, "a@example.com"), (2, "a@example.com")], [(3, "b@example.com")]]
+    assert list(unique_batches(batches, column=1)) == [["a@example.com"], ["b@example.com"]]
+
+
+def test_seen_set_reports_first_sightings():
+    seen = SeenSet()
+    assert [seen.add(value) for value in ("a", "b", "a")] == [True, True, False]
+    assert len(seen) == 2
@@ -0,0 +1,150 @@
+import threading
+
+import pytest
+
+from utilities import db_pool
+from utilities.db_pool import ConnectionPool, PoolTimeoutError
+
+
+class FakeTime:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def perf_counter(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeTime()
+    monkeypatch.setattr(db_pool, "time", fake)
+    return fake
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute(self, sql):
+        self.connection.checks += 1
+        if not self.connection.alive:
+            raise ConnectionError("connection reset")
+
+    def fetchone(self):
+        return (1,)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.alive = True
+        self.closed = False
+        self.checks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def connections():
+    return []
+
+
+@pytest.fixture
+def connect(connections):
+    def open_connection():
+        connections.append(FakeConnection())
+        return connections[-1]
+    return open_connection
+
+
+def test_recently_used_connection_skips_the_health_check(clock, connect, connections):
+    pool = ConnectionPool(connect, health_check_interval=30)
+    clock.advance(29)
+    with pool.connection() as connection:
+        assert connection is connections[0]
+    assert connections[0].checks == 0
+
+    clock.advance(30)
+    with pool.connection():
+        pass
+    assert connections[0].checks == 1
+
+
+def test_failed_health_check_replaces_the_connection(clock, connect, connections):
+    pool = ConnectionPool(connect, health_check_interval=30)
+    connections[0].alive = False
+    clock.advance(31)
+    with pool.connection() as connection:
+        assert connection is connections[1]
+    assert connections[0].closed
+    assert pool.stats() == {"size": 1, "idle": 1, "in_use": 0, "opened": 2, "discarded": 1, "open_cursors": 0}
+
+
+def test_connection_is_health_checked_after_a_failed_lease(clock, connect, connections):
+    pool = ConnectionPool(connect, health_check_interval=30)
+    with pytest.raises(ValueError):
+        with pool.connection():
+            raise ValueError("query failed")
+    with pool.connection():
+        pass
+    assert connections[0].checks == 1
+
+
+def test_idle_connections_above_min_size_are_recycled(clock, connect, connections):
+    pool = ConnectionPool(connect, min_size=1, max_size=3, max_idle=300)
+    leases = [pool.acquire() for _ in range(3)]
+    for entry in leases:
+        pool.release(entry)
+    assert pool.stats()["idle"] == 3
+
+    clock.advance(301)
+    with pool.connection():
+        pass
+    assert pool.stats()["size"] == 1
+    assert sum(connection.closed for connection in connections) == 2
+
+
+def test_acquire_times_out_when_the_pool_is_exhausted(connect):
+    pool = ConnectionPool(connect, max_size=1, acquire_timeout=0.05)
+    entry = pool.acquire()
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire()
+
+    waiter = threading.Timer(0.01, pool.release, args=(entry,))
+    waiter.start()
+    pool.acquire_timeout = 5
+    assert pool.acquire() is entry
+    waiter.join()
+
+
+def test_failed_connect_gives_the_slot_back(connections):
+    def refuse():
+        raise ConnectionError("login timeout")
+
+    pool = ConnectionPool(refuse, min_size=0, max_size=1)
+    with pytest.raises(ConnectionError):
+        pool.acquire()
+    assert pool.stats()["size"] == 0
+
+
+def test_close_discards_idle_and_returned_connections(connect, connections):
+    pool = ConnectionPool(connect, min_size=2)
+    entry = pool.acquire()
+    pool.close()
+    pool.release(entry)
+    assert all(connection.closed for connection in connections)
+    assert pool.stats()["size"] == 0
+    with pytest.raises(RuntimeError):
+        pool.acquire()
@@ -0,0 +1,111 @@
+import logging
+import os
+
+import pytest
+
+from utilities import db_snapshot
+from utilities.db_manager import DatabaseManager
+from utilities.db_snapshot import SnapshotStore
+
+QUERY = "SELECT UserEmail FROM MAP.User_Master;"
+PROBE = "SELECT CHECKSUM_AGG(BINARY_CHECKSUM(*)) FROM MAP.User_Master;"
+
+
+class FakeTime:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeTime()
+    monkeypatch.setattr(db_snapshot, "time", fake)
+    return fake
+
+
+class FakeDatabaseManager(DatabaseManager):
+    """
+    DatabaseManager.query_batches over in-memory rows; counts how often the probe and the query reach the database.
+    """
+
+    def __init__(self, store, rows):
+        self.logger = logging.getLogger("DatabaseManager")
+        self.server, self.database = "sql.test", "MAP"
+        self.fetch_batch_size = 2
+        self.snapshots = store
+        self.rows = rows
+        self.checksum = "1"
+        self.probes = 0
+        self.queries = 0
+
+    def probe(self, probe_query):
+        self.probes += 1
+        return [self.checksum]
+
+    def fetch_query_batches(self, query, batch_size):
+        self.queries += 1
+        for start in range(0, len(self.rows), batch_size):
+            yield self.rows[start:start + batch_size]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SnapshotStore(str(tmp_path), trust_ttl=300)
+
+
+@pytest.fixture
+def db(store):
+    return FakeDatabaseManager(store, [["a@example.com"], ["b@example.com"], ["c@example.com"]])
+
+
+def read_all(db):
+    return [row for batch in db.query_batches(QUERY, PROBE) for row in batch]
+
+
+def test_snapshot_is_trusted_within_the_ttl_without_a_probe(clock, db):
+    assert read_all(db) == db.rows
+    clock.advance(299)
+    assert read_all(db) == db.rows
+    assert (db.queries, db.probes) == (1, 1)
+
+
+def test_stale_snapshot_is_revalidated_with_the_probe_only(clock, db, store):
+    read_all(db)
+    clock.advance(301)
+    assert read_all(db) == db.rows
+    assert (db.queries, db.probes) == (1, 2)
+
+    # Revalidation restarts the trust window
+    assert store.is_trusted(store.metadata("sql.test/MAP", QUERY))
+    clock.advance(299)
+    read_all(db)
+    assert db.probes == 2
+
+
+def test_changed_probe_rereads_the_query(clock, db):
+    read_all(db)
+    clock.advance(301)
+    db.checksum = "2"
+    db.rows.append(["d@example.com"])
+    assert read_all(db) == db.rows
+    assert db.queries == 2
+
+
+def test_partially_consumed_query_publishes_no_snapshot(db, store, tmp_path):
+    batches = db.query_batches(QUERY, PROBE)
+    next(batches)
+    batches.close()
+    assert store.metadata("sql.test/MAP", QUERY) is None
+    assert os.listdir(tmp_path) == []
+
+
+def test_snapshots_are_keyed_by_target(clock, db, store):
+    read_all(db)
+    assert store.metadata("sql.test/MAP", QUERY)["rows"] == 3
+    assert store.metadata("other.test/MAP", QUERY) is None
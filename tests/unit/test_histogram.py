@@ -0,0 +1,51 @@
+import json
+import random
+
+import pytest
+
+from utilities.histogram import LatencyHistogram
+
+
+def histogram(*milliseconds):
+    result = LatencyHistogram()
+    for value in milliseconds:
+        result.record(value / 1000)
+    return result
+
+
+def test_small_values_are_exact():
+    assert all(LatencyHistogram.bucket_value(LatencyHistogram.bucket_index(value)) == value for value in range(128))
+
+
+def test_bucket_midpoint_stays_within_the_relative_error_bound():
+    values = list(range(128, 70_000)) + [random.Random(0).randrange(1, 10 ** 9) for _ in range(10_000)]
+    previous = -1
+    for value in sorted(values):
+        index = LatencyHistogram.bucket_index(value)
+        assert index >= previous
+        previous = index
+        assert abs(LatencyHistogram.bucket_value(index) - value) / value < 1 / 64
+
+
+def test_percentiles_follow_nearest_rank_and_never_exceed_the_max():
+    latencies = histogram(*range(1, 101))
+    assert latencies.percentile(50) == pytest.approx(50, rel=1 / 64)
+    assert latencies.percentile(95) == pytest.approx(95, rel=1 / 64)
+    assert latencies.percentile(100) == pytest.approx(100, rel=1 / 64)
+    assert histogram(1000.4).percentile(99) == 1000.4
+    assert LatencyHistogram().percentile(50) is None
+    assert LatencyHistogram().summary()["min_ms"] is None
+
+
+def test_merged_histograms_match_recording_everything_in_one():
+    merged = histogram(1, 5, 250).merge(histogram(3, 40_000)).merge(LatencyHistogram())
+    combined = histogram(1, 5, 250, 3, 40_000)
+    assert merged.to_dict() == combined.to_dict()
+    assert (merged.min, merged.max) == (1000, 40_000_000)
+
+
+def test_dict_round_trip_survives_json():
+    original = histogram(0.5, 12, 12, 900)
+    restored = LatencyHistogram.from_dict(json.loads(json.dumps(original.to_dict())))
+    assert restored.summary() == original.summary()
+    assert restored.counts == original.counts
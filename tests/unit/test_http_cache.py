@@ -0,0 +1,75 @@
+import configparser
+
+import httpx
+import pytest
+
+from utilities.http_cache import ConditionalCache
+
+ENDPOINT = "/api/Access/GetUserAccessInfo"
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "http_cache.sqlite")
+
+
+def response(status, user, body=b"", etag=None):
+    request = httpx.Request("GET", f"https://map.test{ENDPOINT}", params={"UserEmail": user})
+    return httpx.Response(status, headers={"ETag": etag} if etag else None, content=body, request=request)
+
+
+def remember(cache, user, body, etag='"v1"'):
+    key, _ = cache.prepare(ENDPOINT, {"UserEmail": user})
+    cache.resolve(key, response(200, user, body, etag))
+    return key
+
+
+def test_not_modified_is_answered_before_and_after_the_write(path):
+    cache = ConditionalCache(path, flush_interval=60)
+    key = remember(cache, "a@example.com", b'{"access": [1]}')
+    assert cache.prepare(ENDPOINT, {"UserEmail": "a@example.com"})[1] == {"If-None-Match": '"v1"'}
+
+    # Still queued for the writer
+    cached = cache.resolve(key, response(304, "a@example.com"))
+    assert (cached.status_code, cached.content) == (200, b'{"access": [1]}')
+    cache.close()
+
+    reopened = ConditionalCache(path)
+    assert reopened.prepare(ENDPOINT, {"UserEmail": "a@example.com"})[1] == {"If-None-Match": '"v1"'}
+    cached = reopened.resolve(key, response(304, "a@example.com"))
+    assert cached.content == b'{"access": [1]}'
+    assert cached.extensions["from_cache"]
+    reopened.close()
+
+
+def test_responses_without_validators_are_not_stored(path):
+    cache = ConditionalCache(path)
+    key = remember(cache, "a@example.com", b"{}", etag=None)
+    cache.flush()
+    assert cache.prepare(ENDPOINT, {"UserEmail": "a@example.com"})[1] == {}
+    assert cache.resolve(key, response(304, "a@example.com")).status_code == 304
+    cache.close()
+
+
+def test_least_recently_used_entries_are_evicted_over_the_limit(path):
+    cache = ConditionalCache(path, max_bytes=60)
+    for user in ("a@example.com", "b@example.com", "c@example.com"):
+        # Random-looking bodies so zlib cannot shrink them below the limit
+        remember(cache, user, bytes(range(user.encode()[0], user.encode()[0] + 20)))
+        cache.flush()
+
+    assert cache.total <= 60
+    assert cache.total == sum(cache.sizes.values())
+    assert cache.prepare(ENDPOINT, {"UserEmail": "a@example.com"})[1] == {}
+    assert cache.prepare(ENDPOINT, {"UserEmail": "c@example.com"})[1] == {"If-None-Match": '"v1"'}
+    cache.close()
+
+    reopened = ConditionalCache(path, max_bytes=60)
+    assert reopened.total == cache.total
+    reopened.close()
+
+
+def test_cache_is_off_unless_enabled():
+    config = configparser.ConfigParser()
+    config.read_dict({"api": {}})
+    assert ConditionalCache.from_settings(config["api"]) is None
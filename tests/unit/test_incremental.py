@@ -0,0 +1,146 @@
+import pytest
+
+from utilities.incremental import IncrementalSweep, SweepPlan, SyncState
+
+
+class FakeDatabase:
+    """
+    The change-tracking queries IncrementalSweep uses, answered from plain attributes.
+    """
+
+    def __init__(self, users, current=10, min_valid=1):
+        self.users = list(users)
+        self.versions = (current, min_valid)
+        self.changed = []
+        self.sampled = []
+        self.columns = ["UserID", "RoleID", "FieldID"]
+        self.keys = {"User_Master": ["UserID"], "User_Access": ["UserID", "FieldID"]}
+        self.strata = []
+
+    def change_tracking_versions(self):
+        return self.versions
+
+    def changed_user_emails(self, since_version):
+        return list(self.changed)
+
+    def existing_user_emails(self, user_emails):
+        known = {user.lower() for user in self.users}
+        return [user for user in user_emails if user.lower() in known]
+
+    def table_columns(self, table):
+        return list(self.columns)
+
+    def primary_key_columns(self, table):
+        return list(self.keys[table])
+
+    def sample_user_emails(self, per_stratum, stratum_column=None):
+        self.strata.append(stratum_column)
+        return list(self.sampled)
+
+
+@pytest.fixture
+def db():
+    return FakeDatabase(["a@example.com", "b@example.com", "c@example.com", "d@example.com"])
+
+
+@pytest.fixture
+def state(tmp_path):
+    return SyncState(str(tmp_path / "sync_state.json"), "server/database")
+
+
+def run(db, state, outcomes=None, **options):
+    """
+    Plan one run, then commit ``outcomes`` (every planned user passes by default); returns the plan.
+    """
+    sweep = IncrementalSweep(db, state, **{"full_sweep_every": 0, "full_sweep_interval": 0, **options})
+    sweep.plan = plan = sweep.make_plan()
+    users = plan.users if plan.users is not None else db.users
+    sweep.commit([(user, (outcomes or {}).get(user, True)) for user in users])
+    return plan
+
+
+def test_first_run_is_a_full_sweep_that_records_the_version(db, state):
+    plan = run(db, state)
+
+    assert (plan.mode, plan.users) == ("full", None)
+    assert plan.reason == "no synced change version yet"
+    assert state.load()["version"] == 10
+
+
+def test_incremental_run_checks_changed_pending_and_sampled_users(db, state):
+    run(db, state, outcomes={"b@example.com": False})
+    db.versions = (12, 1)
+    db.changed = ["c@example.com"]
+    db.sampled = ["d@example.com", "c@example.com"]
+
+    plan = run(db, state)
+
+    assert plan.mode == "incremental"
+    assert plan.users == ["c@example.com", "b@example.com", "d@example.com"]
+    entry = state.load()
+    assert (entry["version"], entry["pending"], entry["runs_since_full"]) == (12, [], 1)
+
+
+def test_failed_users_stay_pending_until_they_pass(db, state):
+    run(db, state, outcomes={"b@example.com": False})
+    run(db, state, outcomes={"b@example.com": False})
+    assert state.load()["pending"] == ["b@example.com"]
+
+    run(db, state)
+    assert state.load()["pending"] == []
+
+
+def test_pending_users_that_no_longer_exist_are_dropped(db, state):
+    run(db, state, outcomes={"b@example.com": False, "c@example.com": False})
+    db.users.remove("b@example.com")
+
+    plan = run(db, state, outcomes={"c@example.com": False})
+
+    assert plan.users == ["c@example.com"]
+    assert plan.dropped == ["b@example.com"]
+    assert state.load()["pending"] == ["c@example.com"]
+
+
+def test_full_sweep_when_change_tracking_is_unavailable_or_too_old(db, state):
+    run(db, state)
+    db.versions = (20, 15)
+    assert run(db, state).reason == "synced version 10 is older than the minimum valid version 15"
+
+    db.versions = None
+    plan = run(db, state)
+    assert (plan.mode, plan.reason) == ("full", "change tracking is not available")
+
+
+def test_full_sweep_when_user_id_is_not_in_the_primary_key(db, state):
+    run(db, state)
+    db.keys["User_Access"] = ["AccessID"]
+
+    plan = run(db, state)
+
+    assert (plan.mode, plan.reason) == ("full", "UserID is not part of the primary key of MAP.User_Access")
+
+
+@pytest.mark.parametrize("configured, used", [(None, None), ("roleid", "RoleID"), ("Region", None)])
+def test_sample_is_stratified_only_by_an_existing_column(db, state, configured, used):
+    run(db, state)
+    run(db, state, stratum_column=configured)
+    assert db.strata == [used]
+
+
+def test_periodic_full_sweep_after_every_n_runs(db, state):
+    modes = [run(db, state, full_sweep_every=3).mode for _ in range(7)]
+    assert modes == ["full", "incremental", "incremental"] * 2 + ["full"]
+
+
+def test_full_sweep_resets_pending_to_what_failed_again(db, state):
+    run(db, state, outcomes={"b@example.com": False})
+    state.update(lambda entry: entry.update(version=None))
+
+    run(db, state, outcomes={"c@example.com": False})
+
+    assert state.load()["pending"] == ["c@example.com"]
+
+
+def test_plan_round_trips_through_the_shared_snapshot(db, state):
+    plan = IncrementalSweep(db, state).make_plan()
+    assert vars(SweepPlan.from_dict(plan.to_dict())) == vars(plan)
@@ -0,0 +1,51 @@
+import asyncio
+import configparser
+
+import httpx
+import pytest
+
+from utilities.load import drive, run_load
+
+TARGET = ("/api/Access/GetUserAccessInfo", "UserEmail")
+
+
+class FakeClient:
+    def __init__(self):
+        self.params = []
+
+    async def get(self, url, params=None):
+        self.params.append(params["UserEmail"])
+        return httpx.Response(200)
+
+
+@pytest.mark.parametrize("targets, message", [
+    ({}, "No endpoints to drive"),
+    ({"user-access": (*TARGET, [])}, "No parameter values for user-access"),
+])
+def test_drive_rejects_missing_targets_or_values(targets, message):
+    with pytest.raises(ValueError, match=message):
+        asyncio.run(drive(FakeClient(), "https://map.test", targets, rps=None, concurrency=4, duration=0.01))
+
+
+def test_drive_rejects_zero_concurrency():
+    with pytest.raises(ValueError, match="Concurrency must be at least 1"):
+        asyncio.run(drive(FakeClient(), "https://map.test", {"user-access": (*TARGET, ["a"])}, rps=None,
+                          concurrency=0, duration=0.01))
+
+
+def test_drive_cycles_through_the_parameter_values():
+    client = FakeClient()
+    stats, _ = asyncio.run(drive(client, "https://map.test", {"user-access": (*TARGET, ["a", "b"])}, rps=200,
+                                 concurrency=2, duration=0.05))
+
+    assert stats["user-access"].requests == len(client.params) > 2
+    assert client.params[:4] == ["a", "b", "a", "b"]
+
+
+def test_run_load_rejects_empty_parameters_before_starting_workers():
+    config = configparser.ConfigParser()
+    config.read_dict({"api": {"base_url": "https://map.test"}})
+
+    with pytest.raises(ValueError, match="No parameter values for field-data"):
+        run_load(config, ["user-access", "field-data"], duration=0.01, processes=1,
+                 parameters={"user-access": ["a"], "field-data": []})
@@ -0,0 +1,28 @@
+import logging
+
+from utilities.log_setup import ProjectFilter, SamplingFilter
+
+
+def make_record(name, level=logging.INFO, sample=False):
+    record = logging.LogRecord(name, level, __file__, 1, "message", (), None)
+    if sample:
+        record.sample = True
+    return record
+
+
+def test_only_project_loggers_pass_below_warning():
+    project = ProjectFilter()
+    assert project.filter(make_record("APIClient"))
+    assert project.filter(make_record("utilities.incremental"))
+    assert not project.filter(make_record("urllib3.connectionpool"))
+    assert not project.filter(make_record("azure.identity"))
+    assert project.filter(make_record("azure.identity", logging.WARNING))
+
+
+def test_sampling_keeps_one_in_every_n_sampled_records():
+    sampler = SamplingFilter(0.25)
+    kept = [sampler.filter(make_record("api_test_logger", sample=True)) for _ in range(8)]
+    assert kept == [True, False, False, False] * 2
+    assert sampler.filter(make_record("api_test_logger"))
+    assert sampler.filter(make_record("api_test_logger", logging.WARNING, sample=True))
+    assert not SamplingFilter(0).filter(make_record("api_test_logger", sample=True))
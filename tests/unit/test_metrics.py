@@ -0,0 +1,29 @@
+import json
+
+import httpx
+
+from utilities.metrics import MetricsRegistry, RequestTimer
+
+ENDPOINT = "/api/Access/GetUserAccessInfo"
+
+
+def record(registry, user, status=200):
+    request = httpx.Request("GET", f"https://map.test{ENDPOINT}", params={"UserEmail": user})
+    registry.record(ENDPOINT, {"UserEmail": user}, RequestTimer(), response=httpx.Response(status, request=request))
+
+
+def test_worker_registries_merge_into_the_controller():
+    workers = [MetricsRegistry(slowest=2), MetricsRegistry(slowest=2)]
+    for index in range(3):
+        record(workers[0], f"a{index}@example.com")
+    record(workers[1], "b@example.com", status=404)
+
+    controller = MetricsRegistry(slowest=2)
+    for worker in workers:
+        # workeroutput travels through execnet, so the data must survive plain serialization
+        controller.merge(json.loads(json.dumps(worker.to_dict())))
+
+    summary = controller.summary()[ENDPOINT]
+    assert (summary["requests"], summary["errors"], summary["statuses"]) == (4, 1, {"200": 3, "404": 1})
+    assert summary["latency"]["total_ms"]["count"] == 4
+    assert len(summary["slowest"]) == 2
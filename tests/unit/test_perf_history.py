@@ -0,0 +1,62 @@
+import json
+import sqlite3
+
+import pytest
+
+from utilities.histogram import LatencyHistogram
+from utilities.perf_history import PerfHistory, compare, mann_whitney
+
+ENDPOINT = "/api/Access/GetUserAccessInfo"
+ENVIRONMENT = "https://map.test"
+
+
+def histogram(*milliseconds):
+    result = LatencyHistogram()
+    for value in milliseconds:
+        result.record(value / 1000)
+    return result
+
+
+@pytest.fixture
+def history(tmp_path):
+    store = PerfHistory(str(tmp_path / "perf_history.sqlite"))
+    yield store
+    store.close()
+
+
+def test_baseline_merges_recent_runs_of_the_same_worker_count(history):
+    history.record(ENDPOINT, ENVIRONMENT, "a", histogram(10, 20))
+    history.record(ENDPOINT, ENVIRONMENT, "b", histogram(30), workers=2)
+    history.record(ENDPOINT, ENVIRONMENT, "c", histogram(40))
+
+    single, runs = history.baseline(ENDPOINT, ENVIRONMENT)
+    assert (single.count, runs) == (3, 2)
+    parallel, runs = history.baseline(ENDPOINT, ENVIRONMENT, workers=2)
+    assert (parallel.count, runs) == (1, 1)
+    assert history.baseline(ENDPOINT, ENVIRONMENT, runs=1)[0].count == 1
+    assert history.baseline(ENDPOINT, "https://other.test")[1] == 0
+
+
+def test_history_without_worker_counts_is_migrated(tmp_path):
+    path = str(tmp_path / "perf_history.sqlite")
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE runs (id INTEGER PRIMARY KEY AUTOINCREMENT, recorded_at REAL NOT NULL, "
+                       "endpoint TEXT NOT NULL, environment TEXT NOT NULL, commit_id TEXT NOT NULL, "
+                       "count INTEGER NOT NULL, p50_ms REAL, p95_ms REAL, p99_ms REAL, histogram TEXT NOT NULL)")
+    connection.execute("INSERT INTO runs VALUES (1, 0, ?, ?, 'old', 1, 5, 5, 5, ?)",
+                       (ENDPOINT, ENVIRONMENT, json.dumps(histogram(5).to_dict())))
+    connection.commit()
+    connection.close()
+
+    history = PerfHistory(path)
+    assert history.baseline(ENDPOINT, ENVIRONMENT)[1] == 1
+    history.close()
+
+
+def test_shifted_distribution_is_a_regression():
+    baseline = histogram(*([100] * 50 + [120] * 50))
+    assert not compare(histogram(*([100] * 50 + [121] * 50)), baseline)["regressed"]
+    assert compare(histogram(*([200] * 100)), baseline)["regressed"]
+    z, p_value = mann_whitney(histogram(*([100] * 50 + [120] * 50)), baseline)
+    assert z == pytest.approx(0.0)
+    assert p_value == pytest.approx(0.5)
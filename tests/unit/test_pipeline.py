@@ -0,0 +1,77 @@
+import configparser
+
+import httpx
+import pytest
+
+from utilities import pipeline
+from utilities.api_client import RequestResult
+from utilities.results import ResultStore
+
+
+class FakeClient:
+    """
+    Stands in for AsyncAPIClient: answers every request with 200 and the params as JSON.
+    """
+    concurrency = 3
+
+    @classmethod
+    def from_config(cls, config):
+        return cls()
+
+    async def fetch(self, endpoint, params=None):
+        request = httpx.Request("GET", f"https://map.test{endpoint}", params=params)
+        return RequestResult(params, response=httpx.Response(200, json=params, request=request))
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+@pytest.fixture
+def settings(monkeypatch):
+    monkeypatch.setattr(pipeline, "AsyncAPIClient", FakeClient)
+    config = configparser.ConfigParser()
+    config.read_dict({"api": {"pipeline_queue_size": "2"}})
+    return config
+
+
+BATCHES = [["a", "b"], ["c"], [], ["d", "e"]]
+
+
+def test_results_come_back_in_source_order_with_observers(settings):
+    observed = []
+    results = pipeline.stream_requests(settings, "/api/Access/GetUserAccessInfo", BATCHES,
+                                       lambda user: {"UserEmail": user},
+                                       observers=[lambda item, result: observed.append(result.response.json())])
+
+    assert [item for item, _ in results] == ["a", "b", "c", "d", "e"]
+    assert all(result.status_code == 200 for _, result in results)
+    assert sorted(body["UserEmail"] for body in observed) == ["a", "b", "c", "d", "e"]
+
+
+def test_store_and_observers_both_see_every_result(settings, tmp_path):
+    observed = []
+    store = ResultStore(spill="off", spill_path=str(tmp_path / "bodies.jsonl"))
+    returned = pipeline.stream_requests(settings, "/api/Access/GetUserAccessInfo", BATCHES,
+                                        lambda user: {"UserEmail": user}, store=store,
+                                        observers=[lambda item, result: observed.append(item)])
+
+    assert returned is store
+    assert len(store) == 5
+    assert sorted(observed) == ["a", "b", "c", "d", "e"]
+
+
+def test_observer_failure_is_kept_on_that_item_only(settings, tmp_path):
+    def observe(item, result):
+        if item == "c":
+            raise ValueError("bad body")
+
+    store = ResultStore(spill="off", spill_path=str(tmp_path / "bodies.jsonl"))
+    pipeline.stream_requests(settings, "/api/Access/GetUserAccessInfo", BATCHES, lambda user: {"UserEmail": user},
+                             store=store, observers=[observe])
+
+    assert len(store) == 5
+    assert [item for item, _ in store.failures()] == ["c"]
+    assert "bad body" in store.failures()[0][1].error
@@ -0,0 +1,106 @@
+import threading
+from collections import Counter
+
+import pytest
+
+from utilities import profiling
+from utilities.profiling import StepProfiler, StepStats
+
+
+class FakeTime:
+    def __init__(self):
+        self.wall = 1000.0
+        self.cpu = 10.0
+
+    def perf_counter(self):
+        return self.wall
+
+    def process_time(self):
+        return self.cpu
+
+    def advance(self, wall, cpu):
+        self.wall += wall
+        self.cpu += cpu
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeTime()
+    monkeypatch.setattr(profiling, "time", fake)
+    return fake
+
+
+def sampled(stacks):
+    stats = StepStats()
+    stats.stacks = Counter(stacks)
+    return stats
+
+
+def busy_loop():
+    return sum(index * index for index in range(20_000))
+
+
+def test_sampled_hotspots_split_self_and_inclusive_time():
+    profiler = StepProfiler(interval=0.005)
+    stats = sampled({
+        ("MainThread", "steps.py:when", "api_client.py:get"): 3,
+        ("MainThread", "steps.py:when"): 1,
+    })
+
+    assert profiler.hotspots(stats) == [
+        {"frame": "api_client.py:get", "self_pct": 75.0, "total_pct": 75.0, "self_ms": 15.0},
+        {"frame": "steps.py:when", "self_pct": 25.0, "total_pct": 100.0, "self_ms": 5.0},
+    ]
+    assert StepProfiler(top=1).hotspots(stats)[0]["frame"] == "api_client.py:get"
+    assert profiler.hotspots(StepStats()) == []
+
+
+def test_summary_aggregates_calls_and_orders_steps_by_wall_time(clock):
+    profiler = StepProfiler(mode="cprofile")
+    for wall, cpu in ((0.010, 0.005), (0.030, 0.005)):
+        profiler.begin("when_users_are_fetched")
+        clock.advance(wall, cpu)
+        profiler.end()
+    profiler.begin("then_status_is_200")
+    clock.advance(0.001, 0.001)
+    profiler.end()
+    profiler.end()
+
+    summary = profiler.summary()
+    assert list(summary) == ["when_users_are_fetched", "then_status_is_200"]
+    step = summary["when_users_are_fetched"]
+    assert (step["calls"], step["wall_ms"], step["mean_wall_ms"], step["max_wall_ms"]) == (2, 40.0, 20.0, 30.0)
+    assert (step["cpu_ms"], step["cpu_ratio"]) == (10.0, 0.25)
+
+
+def test_cprofile_hotspots_name_the_profiled_function(tmp_path):
+    profiler = StepProfiler(mode="cprofile", top=3)
+    profiler.begin("step")
+    busy_loop()
+    profiler.end()
+
+    hotspots = profiler.summary()["step"]["hotspots"]
+    assert any(hotspot["frame"] == "test_profiling.py:<genexpr>" for hotspot in hotspots)
+    assert len(hotspots) <= 3
+    assert profiler.write(str(tmp_path), suffix="gw0") == [str(tmp_path / "step.gw0.pstats")]
+
+
+def test_sampled_stacks_are_rooted_at_the_step_function(tmp_path):
+    profiler = StepProfiler(interval=0.001)
+    profiler.begin("step", busy_loop)
+    while not profiler._active[1].stacks:
+        busy_loop()
+    profiler.end()
+
+    thread = threading.current_thread().name
+    stacks = profiler.steps["step"].stacks
+    assert stacks
+    assert all(stack[:2] == (thread, "test_profiling.py:busy_loop") for stack in stacks)
+    path, = profiler.write(str(tmp_path))
+    with open(path) as f:
+        assert f.readline().startswith(f"{thread};test_profiling.py:busy_loop")
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        StepProfiler(mode="perf")
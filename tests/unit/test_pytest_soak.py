@@ -0,0 +1,59 @@
+import json
+
+# Loaded here rather than in the root conftest, so API runs that do not collect this module never load it
+pytest_plugins = ["pytester"]
+
+TEST_MODULE = """
+import pytest
+
+
+def record(event):
+    with open("events.txt", "a") as f:
+        print(event, file=f)
+
+
+@pytest.fixture(scope="session")
+def session_resource():
+    record("session setup")
+    yield
+    record("session teardown")
+
+
+@pytest.fixture
+def function_resource(session_resource):
+    record("function setup")
+    yield
+    record("function teardown")
+
+
+def test_uses_fixtures(function_resource):
+    with open("events.txt") as f:
+        assert f.read().splitlines()[-1] == "function setup"
+"""
+
+
+def test_single_item_repeats_with_fresh_function_fixtures(pytester):
+    pytester.makepyfile(test_soak_target=TEST_MODULE)
+    report_path = pytester.path / "soak.json"
+    result = pytester.runpytest("-p", "utilities.pytest_soak", "--soak-iterations", "3", "--soak-tracemalloc", "0",
+                                "--soak-report", str(report_path))
+
+    result.assert_outcomes(passed=3)
+    events = (pytester.path / "events.txt").read_text().splitlines()
+    assert events == ["session setup"] + ["function setup", "function teardown"] * 3 + ["session teardown"]
+    report = json.loads(report_path.read_text())
+    assert report["iterations"] == 3
+    assert [sample["iteration"] for sample in report["samples"]] == [1, 2]
+
+
+def test_several_items_repeat(pytester):
+    pytester.makepyfile(test_soak_target=TEST_MODULE + """
+
+@pytest.mark.parametrize("value", [1, 2])
+def test_parametrized(function_resource, value):
+    assert value in (1, 2)
+""")
+    result = pytester.runpytest("-p", "utilities.pytest_soak", "--soak-iterations", "2", "--soak-tracemalloc", "0",
+                                "--soak-report", str(pytester.path / "soak.json"))
+
+    result.assert_outcomes(passed=6)
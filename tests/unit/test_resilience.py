@@ -0,0 +1,144 @@
+import httpx
+import pytest
+
+from utilities import resilience
+from utilities.resilience import CircuitBreaker, CircuitOpenError, RequestPolicy, TokenBucket
+
+
+class FakeTime:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeTime()
+    monkeypatch.setattr(resilience, "time", fake)
+    return fake
+
+
+def response(status, headers=None):
+    return httpx.Response(status, headers=headers, request=httpx.Request("GET", "https://map.test/api"))
+
+
+def test_bucket_spends_burst_then_waits_for_refill(clock):
+    bucket = TokenBucket(10, burst=2)
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == pytest.approx(0.1)
+    clock.advance(1.0)
+    assert bucket.reserve() == 0.0
+
+
+def test_bucket_throttle_decreases_rate_once_per_second_and_pauses(clock):
+    bucket = TokenBucket(10, min_rate=2, decrease=0.5)
+    bucket.on_throttle(pause=5)
+    bucket.on_throttle()
+    assert bucket.rate == 5
+    assert bucket.reserve() == pytest.approx(5.0)
+    clock.advance(1.0)
+    bucket.on_throttle()
+    bucket.on_throttle()
+    clock.advance(1.0)
+    bucket.on_throttle()
+    assert bucket.rate == 2
+
+
+def test_bucket_success_increases_rate_up_to_max(clock):
+    bucket = TokenBucket(10, max_rate=11, increase=5)
+    bucket.on_success()
+    assert bucket.rate == pytest.approx(10.5)
+    bucket.on_success()
+    bucket.on_success()
+    assert bucket.rate == 11
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+
+def open_breaker(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock.advance(30)
+    assert breaker.state == "half-open"
+    return breaker
+
+
+def test_breaker_lets_one_probe_through_and_closes_on_success(clock):
+    breaker = open_breaker(clock)
+    breaker.check()
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    breaker.check()
+
+
+def test_breaker_reopens_when_probe_fails(clock):
+    breaker = open_breaker(clock)
+    breaker.check()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.opened == 2
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+
+def test_throttled_probe_reopens_the_circuit(clock):
+    breaker = open_breaker(clock)
+    policy = RequestPolicy(breaker=breaker, max_retries=0)
+    policy.before()
+    assert policy.after(0, response=response(429)) is None
+    assert breaker.state == "open"
+    clock.advance(30)
+    policy.before()
+    policy.after(0, response=response(200))
+    assert breaker.state == "closed"
+
+
+def test_throttle_does_not_count_as_failure_when_closed(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    policy = RequestPolicy(breaker=breaker, max_retries=0)
+    policy.after(0, response=response(429))
+    assert breaker.state == "closed"
+
+
+def test_probe_that_never_reports_times_out(clock):
+    breaker = open_breaker(clock)
+    breaker.check()
+    clock.advance(29)
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    clock.advance(1)
+    breaker.check()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_policy_retries_with_retry_after(clock):
+    policy = RequestPolicy(bucket=TokenBucket(10), max_retries=2, max_delay=30)
+    assert policy.after(0, response=response(503, {"Retry-After": "7"})) >= 7
+    assert policy.after(2, response=response(503)) is None
+    assert policy.after(0, response=response(404)) is None
+    assert policy.after(0, error=httpx.ConnectError("refused")) is not None
+    assert policy.after(0, error=ValueError("not retryable")) is None
@@ -0,0 +1,80 @@
+import configparser
+import json
+
+import httpx
+import pytest
+
+from utilities.api_client import RequestResult
+from utilities.results import ResultStore, body_digest
+
+ENDPOINT = "/api/Access/GetUserAccessInfo"
+
+
+def result(user, status=200, body=b"[]"):
+    request = httpx.Request("GET", f"https://map.test{ENDPOINT}", params={"UserEmail": user})
+    response = httpx.Response(status, content=body, request=request)
+    error = None
+    if status >= 400:
+        error = httpx.HTTPStatusError(f"{status}", request=request, response=response)
+    return RequestResult({"UserEmail": user}, response=response, error=error)
+
+
+def fill(store):
+    store.add("a@example.com", result("a@example.com", body=b'[{"FieldID": 1}]'), 12.5)
+    store.add("b@example.com", result("b@example.com", status=404, body=b"not found"), 3.0)
+    store.add("c@example.com", RequestResult({"UserEmail": "c@example.com"}, error=httpx.ReadTimeout("timed out")),
+              30000.0)
+    store.close()
+
+
+def spilled(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_records_keep_status_latency_and_body_digest(tmp_path):
+    store = ResultStore(spill_path=str(tmp_path / "bodies.jsonl"))
+    fill(store)
+
+    records = dict(store)
+    assert len(store) == 3
+    assert records["a@example.com"].ok
+    assert (records["a@example.com"].status_code, records["a@example.com"].latency_ms) == (200, 12.5)
+    assert records["a@example.com"].body_size == 16
+    assert records["a@example.com"].body_hash == body_digest(b'[{"FieldID": 1}]')
+    assert (records["c@example.com"].status_code, records["c@example.com"].body_size) == (None, 0)
+    assert [item for item, _ in store.failures()] == ["b@example.com", "c@example.com"]
+
+
+def test_only_failures_are_spilled_by_default(tmp_path):
+    path = tmp_path / "bodies.jsonl"
+    store = ResultStore(spill_path=str(path))
+    fill(store)
+
+    lines = spilled(path)
+    assert [line["item"] for line in lines] == ["b@example.com", "c@example.com"]
+    assert (lines[0]["status"], lines[0]["body"]) == (404, "not found")
+    assert (lines[1]["status"], lines[1]["body"]) == (None, None)
+    assert "ReadTimeout" in lines[1]["error"]
+    assert store.spilled == 2
+
+
+@pytest.mark.parametrize("spill, expected", [("all", 3), ("off", 0)])
+def test_spill_modes(tmp_path, spill, expected):
+    path = tmp_path / "bodies.jsonl"
+    store = ResultStore(spill=spill, spill_path=str(path))
+    fill(store)
+    assert store.spilled == expected
+    assert path.exists() == bool(expected)
+
+
+def test_unknown_spill_mode_is_rejected():
+    with pytest.raises(ValueError):
+        ResultStore(spill="errors")
+
+
+def test_shards_spill_to_separate_files():
+    config = configparser.ConfigParser()
+    config.read_dict({"api": {"spill_bodies": "all", "spill_path": "logs/bodies.jsonl"}})
+    store = ResultStore.from_settings(config["api"], suffix="gw1")
+    assert (store.spill, store.spill_path) == ("all", "logs/bodies.gw1.jsonl")
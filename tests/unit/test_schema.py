@@ -0,0 +1,54 @@
+import json
+import os
+
+import pytest
+
+from utilities.schema import SchemaValidationError, load_schema, validate_chunks
+
+SCHEMA_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "config", "schemas")
+
+
+@pytest.fixture
+def field_data_schema():
+    return load_schema("/api/FieldData/GetFieldData", SCHEMA_DIR)
+
+
+def field_data(**changes):
+    payload = {"fieldName": "Field_0000001", "rows": [
+        {"RowID": index, "FieldName": "Field_0000001", "Value": f"Field_0000001-{index:06d}"} for index in range(3)
+    ]}
+    payload.update(changes)
+    return payload
+
+
+def validate(payload, schema, chunk_size=7):
+    body = json.dumps(payload).encode()
+    return validate_chunks((body[start:start + chunk_size] for start in range(0, len(body), chunk_size)), schema)
+
+
+def test_field_data_payload_is_valid(field_data_schema):
+    assert validate(field_data(), field_data_schema) == 15
+
+
+@pytest.mark.parametrize("payload, path", [
+    ([], "$"),
+    ({"rows": field_data()["rows"]}, "$"),
+    (field_data(rows=[]), "$.rows"),
+    (field_data(rows=[{"RowID": 0, "FieldName": "Field_0000001"}]), "$.rows[0]"),
+    (field_data(rows=[{"RowID": "0", "FieldName": "Field_0000001", "Value": None}]), "$.rows[0].RowID"),
+    (field_data(rows=[{"RowID": -1, "FieldName": "Field_0000001", "Value": None}]), "$.rows[0].RowID"),
+    (field_data(rows=[{"RowID": 0, "FieldName": "Field_0000001", "Value": [1]}]), "$.rows[0].Value"),
+    (field_data(fieldName=""), "$.fieldName"),
+])
+def test_field_data_violations_name_the_offending_path(field_data_schema, payload, path):
+    with pytest.raises(SchemaValidationError) as error:
+        validate(payload, field_data_schema)
+    assert error.value.path == path
+
+
+@pytest.mark.parametrize("body", [b"<html>Bad Gateway</html>", json.dumps(field_data()).encode()[:40]])
+def test_non_json_or_truncated_body_is_a_schema_error(field_data_schema, body):
+    with pytest.raises(SchemaValidationError) as error:
+        validate_chunks([body[:20], body[20:]], field_data_schema)
+    assert error.value.path == "$"
+    assert "invalid JSON" in str(error.value)
@@ -0,0 +1,117 @@
+import builtins
+import threading
+
+import pytest
+
+from utilities import secret_provider
+from utilities.secret_provider import EncryptedFileCache, LocalSecretClient, SecretProvider, clear_memory_cache
+
+VAULT = "https://vault.test"
+
+
+class FakeTime:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeTime()
+    monkeypatch.setattr(secret_provider, "time", fake)
+    return fake
+
+
+@pytest.fixture(autouse=True)
+def empty_memory_cache():
+    clear_memory_cache()
+    yield
+    clear_memory_cache()
+
+
+@pytest.fixture
+def client():
+    return LocalSecretClient({"db-server": "sql.test", "db-database": "MAP"})
+
+
+@pytest.fixture
+def cache_key():
+    fernet = pytest.importorskip("cryptography.fernet")
+    return fernet.Fernet.generate_key()
+
+
+def test_secrets_are_fetched_once_until_the_ttl_expires(clock, client):
+    provider = SecretProvider(VAULT, client=client, ttl=60)
+    assert provider.get_secrets(["db-server", "db-database"]) == {"db-server": "sql.test", "db-database": "MAP"}
+    clock.advance(59)
+    assert provider.get_secret("db-server") == "sql.test"
+    assert client.calls == 2
+
+    clock.advance(1)
+    provider.get_secret("db-server")
+    assert client.calls == 3
+
+
+def test_missing_secret_raises(client):
+    with pytest.raises(KeyError):
+        SecretProvider(VAULT, client=client).get_secret("db-password")
+
+
+def test_encrypted_disk_cache_round_trip(clock, client, cache_key, tmp_path):
+    path = str(tmp_path / "secrets")
+    SecretProvider(VAULT, client=client, ttl=60, cache_path=path, cache_key=cache_key).get_secret("db-server")
+    with open(path, "rb") as f:
+        assert b"sql.test" not in f.read()
+
+    clear_memory_cache()
+    offline = LocalSecretClient()
+    provider = SecretProvider(VAULT, client=offline, ttl=60, cache_path=path, cache_key=cache_key)
+    assert provider.get_secret("db-server") == "sql.test"
+    assert offline.calls == 0
+
+    clear_memory_cache()
+    clock.advance(60)
+    with pytest.raises(KeyError):
+        provider.get_secret("db-server")
+
+
+def test_concurrent_disk_cache_writes_leave_a_readable_file(cache_key, tmp_path):
+    cache = EncryptedFileCache(str(tmp_path / "secrets"), cache_key)
+    threads = [threading.Thread(target=cache.store, args=({f"{VAULT}|s{n}": (2000.0, "x" * 1000)},))
+               for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(cache.load()) == 1
+    assert list(tmp_path.iterdir()) == [tmp_path / "secrets"]
+
+
+def test_disk_cache_is_disabled_without_a_key(monkeypatch, client):
+    monkeypatch.delenv("MAPAPI_SECRET_CACHE_KEY", raising=False)
+    provider = SecretProvider.from_config(VAULT, client=client)
+    assert provider.disk_cache is not None and not provider.disk_cache.enabled
+    assert provider.get_secret("db-server") == "sql.test"
+    assert provider.disk_cache.load() == {}
+
+
+def test_disk_cache_is_disabled_without_cryptography(monkeypatch, client, tmp_path):
+    real_import = builtins.__import__
+
+    def without_cryptography(name, *args, **kwargs):
+        if name.startswith("cryptography"):
+            raise ImportError(name)
+        return real_import(name, *args, **kwargs)
+
+    monkeypatch.setattr(builtins, "__import__", without_cryptography)
+    path = tmp_path / "secrets"
+    provider = SecretProvider(VAULT, client=client, cache_path=str(path), cache_key=b"not-used")
+    assert provider.get_secret("db-server") == "sql.test"
+    assert not provider.disk_cache.enabled
+    assert not path.exists()
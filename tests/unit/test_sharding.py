@@ -0,0 +1,83 @@
+import json
+import os
+import threading
+
+import pytest
+
+from utilities import sharding
+from utilities.sharding import ShardReport, shard_batches, shard_of, shared_snapshot
+
+
+def test_every_item_lands_in_exactly_one_shard():
+    users = [f"user{n}@example.com" for n in range(200)]
+    shards = [[user for batch in shard_batches([users[:120], users[120:]], shard, 4) for user in batch]
+              for shard in range(4)]
+    assert sorted(user for shard in shards for user in shard) == sorted(users)
+    assert all(shard_of(user, 4) == index for index, shard in enumerate(shards) for user in shard)
+
+
+def test_snapshot_is_produced_once_and_then_read_back(tmp_path):
+    path = str(tmp_path / "snapshots" / "users.json")
+    calls = []
+
+    def produce():
+        calls.append(1)
+        return ["a@example.com", "b@example.com"]
+
+    assert shared_snapshot(path, produce) == ["a@example.com", "b@example.com"]
+    assert shared_snapshot(path, produce) == ["a@example.com", "b@example.com"]
+    assert len(calls) == 1
+    assert sorted(os.listdir(tmp_path / "snapshots")) == ["users.json"]
+
+
+def test_snapshot_published_while_acquiring_the_lock_is_not_rebuilt(monkeypatch, tmp_path):
+    path = str(tmp_path / "users.json")
+    real_open = os.open
+
+    def publish_then_open(*args, **kwargs):
+        # The other worker finishes between our exists() check and the O_EXCL open
+        with open(path, "w") as f:
+            json.dump(["other@example.com"], f)
+        return real_open(*args, **kwargs)
+
+    monkeypatch.setattr(sharding.os, "open", publish_then_open)
+    assert shared_snapshot(path, lambda: pytest.fail("snapshot rebuilt")) == ["other@example.com"]
+    assert not os.path.exists(f"{path}.lock")
+
+
+def test_concurrent_workers_share_one_producer(tmp_path):
+    path = str(tmp_path / "users.json")
+    calls = []
+    results = []
+
+    def produce():
+        calls.append(1)
+        return ["a@example.com"]
+
+    threads = [threading.Thread(target=lambda: results.append(shared_snapshot(path, produce, poll=0.01)))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == [["a@example.com"]] * 4
+
+
+def test_waiting_for_a_stale_lock_times_out(tmp_path):
+    path = str(tmp_path / "users.json")
+    open(f"{path}.lock", "w").close()
+    with pytest.raises(TimeoutError):
+        shared_snapshot(path, list, timeout=0.05, poll=0.01)
+
+
+def test_shard_reports_merge_sorted_by_user(tmp_path):
+    report = ShardReport(str(tmp_path / "shards"))
+    report.write(0, [{"user": "b@example.com", "status": 200}])
+    report.write(1, [{"user": "a@example.com", "status": 404}])
+
+    merged = report.merge(str(tmp_path / "report.json"))
+    assert [record["user"] for record in merged["results"]] == ["a@example.com", "b@example.com"]
+    assert (merged["users"], merged["shards"], merged["failed"]) == (2, 2, 1)
+    assert ShardReport(str(tmp_path / "empty")).merge(str(tmp_path / "none.json")) is None
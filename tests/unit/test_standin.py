@@ -0,0 +1,97 @@
+import asyncio
+
+import httpx
+import pytest
+
+from utilities.db_manager import FIELD_MASTER_PROBE, FIRST_FIELD_QUERY, USER_ACCESS_PROBE
+from utilities.standin_api import FIELD_DATA_PATH, USER_ACCESS_PATH, StandInAPI
+from utilities.standin_db import SQLiteDatabaseManager, seed_database, translate
+
+
+@pytest.fixture(scope="module")
+def db_path(tmp_path_factory):
+    return seed_database(str(tmp_path_factory.mktemp("standin") / "standin.sqlite"), users=20, fields=5)
+
+
+@pytest.fixture
+def db(db_path):
+    manager = SQLiteDatabaseManager(db_path)
+    manager.snapshots = None
+    yield manager
+    manager.close()
+
+
+def call(app, path, params=None, headers=None):
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://standin") as client:
+            return await client.get(path, params=params, headers=headers)
+    return asyncio.run(run())
+
+
+def test_top_and_tablesample_become_limit():
+    assert translate("SELECT DISTINCT TOP (?) Field_Name FROM MAP.Field_Master WHERE Field_Name > ? "
+                     "ORDER BY Field_Name;", (10, "F")) == (
+        "SELECT DISTINCT Field_Name FROM MAP.Field_Master WHERE Field_Name > ? ORDER BY Field_Name LIMIT ?",
+        ("F", 10))
+    assert translate("SELECT TOP 5 Field_Name FROM MAP.Field_Master TABLESAMPLE (1 PERCENT);", ()) == (
+        "SELECT Field_Name FROM MAP.Field_Master ORDER BY RANDOM() LIMIT ?", (5,))
+    assert translate("SELECT COUNT_BIG(*), CHECKSUM_AGG(BINARY_CHECKSUM(*)) FROM MAP.Field_Master;", ())[0] == (
+        "SELECT COUNT(*), CHECKSUM_AGG(BINARY_CHECKSUM(Field_Name)) FROM MAP.Field_Master;")
+
+
+def test_database_manager_queries_run_against_the_seeded_file(db):
+    emails = [email for batch in db.iter_user_emails(batch_size=7) for email in batch]
+    assert emails == sorted(set(emails), key=emails.index)
+    assert len(emails) == 20
+    assert db.fetch_field_name() == "Field_0000000"
+    assert db.table_columns("User_Access") == ["UserID", "RoleID", "FieldID", "GrantedOn", "IsActive"]
+    assert db.primary_key_columns("User_Master") == ["UserID"]
+    assert db.probe(FIELD_MASTER_PROBE) == db.probe(FIELD_MASTER_PROBE)
+    assert list(db.query_batches(FIRST_FIELD_QUERY)) == [[("Field_0000000",)]]
+
+
+def test_seeding_is_deterministic_per_seed(tmp_path, db):
+    probes = []
+    for seed in (0, 1):
+        other = SQLiteDatabaseManager(seed_database(str(tmp_path / f"seed{seed}.sqlite"), users=20, fields=5,
+                                                    seed=seed))
+        other.snapshots = None
+        probes.append(other.probe(USER_ACCESS_PROBE))
+        other.close()
+    assert probes[0] == db.probe(USER_ACCESS_PROBE)
+    assert probes[1] != probes[0]
+
+
+def test_user_access_is_served_with_etags(db_path):
+    app = StandInAPI(db_path)
+    response = call(app, USER_ACCESS_PATH, {"UserEmail": "USER0000001@example.com"})
+    assert response.status_code == 200
+    lowercase = call(app, USER_ACCESS_PATH, {"UserEmail": "user0000001@example.com"})
+    assert lowercase.json()["access"] == response.json()["access"]
+
+    cached = call(app, USER_ACCESS_PATH, {"UserEmail": "USER0000001@example.com"},
+                  {"If-None-Match": response.headers["ETag"]})
+    assert (cached.status_code, cached.content) == (304, b"")
+    assert call(app, USER_ACCESS_PATH, {"UserEmail": "nobody@example.com"}).status_code == 404
+    assert call(app, USER_ACCESS_PATH).status_code == 400
+    app.close()
+
+
+def test_large_bodies_are_gzipped_only_when_accepted():
+    app = StandInAPI(field_rows=100)
+    compressed = call(app, FIELD_DATA_PATH, {"FieldName": "Field_0000001"}, {"Accept-Encoding": "gzip"})
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert len(compressed.json()["rows"]) == 100
+
+    plain = call(app, FIELD_DATA_PATH, {"FieldName": "Field_0000001"}, {"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in plain.headers
+    assert plain.json() == compressed.json()
+
+
+def test_injected_throttling_and_errors():
+    assert call(StandInAPI(throttle_rate=1.0, retry_after=7), FIELD_DATA_PATH, {"FieldName": "F"}).headers[
+        "Retry-After"] == "7"
+    assert call(StandInAPI(error_rate=1.0, error_status=503), FIELD_DATA_PATH,
+                {"FieldName": "F"}).status_code == 503
+    assert call(StandInAPI(), "/api/Unknown").status_code == 404
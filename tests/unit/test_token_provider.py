@@ -0,0 +1,56 @@
+import struct
+
+import pytest
+
+from utilities import token_provider
+from utilities.token_provider import (SQL_COPT_SS_ACCESS_TOKEN, CachedTokenProvider, StaticTokenProvider,
+                                      access_token_attrs)
+
+
+class FakeTime:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+    def perf_counter(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeTime()
+    monkeypatch.setattr(token_provider, "time", fake)
+    return fake
+
+
+def test_access_token_attrs_packs_length_prefixed_utf16():
+    attrs = access_token_attrs("abc")
+    raw = "abc".encode("utf-16-le")
+    assert attrs == {SQL_COPT_SS_ACCESS_TOKEN: struct.pack("<I", len(raw)) + raw}
+
+
+def test_cached_provider_reuses_token_until_refresh_margin(clock):
+    source = StaticTokenProvider("token", lifetime=3600)
+    provider = CachedTokenProvider(source, refresh_margin=300)
+    assert provider.get_token() == ("token", 4600.0)
+    clock.advance(3299)
+    provider.get_token()
+    assert source.calls == 1
+
+
+def test_cached_provider_refreshes_before_expiry(clock):
+    source = StaticTokenProvider("token", lifetime=3600)
+    provider = CachedTokenProvider(source, refresh_margin=300)
+    provider.get_token()
+    clock.advance(3300)
+    token, expires_on = provider.get_token()
+    assert source.calls == 2
+    assert expires_on == 1000.0 + 3300 + 3600
+    clock.advance(1)
+    provider.get_token()
+    assert source.calls == 2
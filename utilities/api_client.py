@@ -1,42 +1,354 @@
+import asyncio
+import importlib.util
+import time
+
 import httpx
-import logging
+
+from utilities import metrics
+from utilities.cassette import Cassette
+from utilities.http_cache import ConditionalCache, accept_encoding
+from utilities.log_setup import get_logger
+from utilities.metrics import RequestTimer
+from utilities.resilience import THROTTLE_STATUSES, CircuitOpenError, RequestPolicy
+from utilities.schema import load_schema, validate_chunks
+
+# Per-request INFO lines are subject to [logging] request_sample_rate
+SAMPLED = {"sample": True}
+
+
+def client_settings(section):
+    """
+    Read connection pool and timeout settings from the [api] section of settings.ini.
+    """
+    return {
+        "http2": section.getboolean("http2", fallback=False),
+        "timeout": section.getfloat("timeout", fallback=30.0),
+        "connect_timeout": section.getfloat("connect_timeout", fallback=10.0),
+        "max_connections": section.getint("max_connections", fallback=100),
+        "max_keepalive_connections": section.getint("max_keepalive_connections", fallback=20),
+        "keepalive_expiry": section.getfloat("keepalive_expiry", fallback=30.0),
+        "compression": section.getboolean("compression", fallback=True),
+    }
+
+
+def pool_options(logger, http2=False, timeout=30.0, connect_timeout=10.0,
+                 max_connections=100, max_keepalive_connections=20, keepalive_expiry=30.0, compression=True):
+    """
+    Build the keyword arguments shared by the sync and async httpx clients.
+    """
+    if http2 and importlib.util.find_spec("h2") is None:
+        logger.warning("HTTP/2 requested but the 'h2' package is not installed; falling back to HTTP/1.1")
+        http2 = False
+
+    return {
+        "verify": False,
+        "http2": http2,
+        "headers": {"Accept-Encoding": accept_encoding(compression)},
+        "timeout": httpx.Timeout(timeout, connect=connect_timeout),
+        "limits": httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        ),
+    }
+
+
+def _collect(chunks, body):
+    """
+    Pass ``chunks`` through, keeping a copy of each in ``body``.
+    """
+    for chunk in chunks:
+        body.append(chunk)
+        yield chunk
+
+
+class RequestResult:
+    """
+    Outcome of one request in a batch: the response, or the error it raised.
+    """
+    __slots__ = ("params", "response", "error")
+
+    def __init__(self, params, response=None, error=None):
+        self.params = params
+        self.response = response
+        self.error = error
+        if response is None and isinstance(error, httpx.HTTPStatusError):
+            self.response = error.response
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    @property
+    def status_code(self):
+        return self.response.status_code if self.response is not None else None
 
 
 class APIClient:
-    def __init__(self, base_url):
+    def __init__(self, base_url, metrics_registry=None, cassette=None, policy=None, http_cache=None, **options):
         self.base_url = base_url
+        self.metrics = metrics_registry or metrics.registry
+        self.cassette = cassette
+        self.policy = policy
+        self.http_cache = http_cache
         self.logger = self.setup_logger()
+        # One long-lived client per session so connections (and their TLS sessions) are reused
+        self.client = httpx.Client(**pool_options(self.logger, **options))
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config['api']['base_url'], cassette=Cassette.from_settings(config['api']),
+                   policy=RequestPolicy.from_settings(config['api']),
+                   http_cache=ConditionalCache.from_settings(config['api']), **client_settings(config['api']))
 
     def setup_logger(self):
-        logger = logging.getLogger("APIClient")
-        logger.setLevel(logging.INFO)
-        handler = logging.StreamHandler()
-        formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
-        handler.setFormatter(formatter)
-        logger.addHandler(handler)
-        return logger
+        return get_logger("APIClient")
+
+    def send(self, endpoint, params=None):
+        """
+        Send a GET request and record its timings and sizes in the metrics registry, without checking the status.
+
+        With a cassette configured, recorded responses are returned without touching the network (or the metrics).
+        With a RequestPolicy, requests are rate limited, retried on transport errors and 429/502/503/504, and refused
+        with CircuitOpenError while the host's circuit is open. With a ConditionalCache, known resources are
+        revalidated with If-None-Match/If-Modified-Since and a 304 is answered from the cache.
+        """
+        url = f"{self.base_url}{endpoint}"
+        if self.cassette:
+            request = self.client.build_request("GET", url, params=params)
+            replayed = self.cassette.replay("GET", endpoint, params, request)
+            if replayed is not None:
+                return replayed
+
+        cache_key, conditional = self.http_cache.prepare(endpoint, params) if self.http_cache else (None, None)
+        attempt = throttled = 0
+        while True:
+            if self.policy:
+                try:
+                    time.sleep(self.policy.before())
+                except CircuitOpenError:
+                    self.metrics.record_rejection(endpoint)
+                    raise
+            timer = RequestTimer()
+            try:
+                response = self.client.get(url, params=params, headers=conditional,
+                                           extensions={"trace": timer.trace})
+            except Exception as e:
+                delay = self.policy.after(attempt, error=e) if self.policy else None
+                if delay is None:
+                    self.metrics.record(endpoint, params, timer, error=e, retries=attempt, throttled=throttled)
+                    raise
+            else:
+                delay = self.policy.after(attempt, response=response) if self.policy else None
+                if delay is None:
+                    break
+                throttled += response.status_code in THROTTLE_STATUSES
+                response.close()
+            self.logger.warning("Retrying GET %s in %.2fs (attempt %d)", url, delay, attempt + 1)
+            time.sleep(delay)
+            attempt += 1
+
+        self.metrics.record(endpoint, params, timer, response=response, retries=attempt, throttled=throttled)
+        if self.http_cache:
+            response = self.http_cache.resolve(cache_key, response)
+        if self.cassette:
+            self.cassette.record("GET", endpoint, params, response)
+        return response
 
     def get(self, endpoint, params=None):
         try:
-            # Configure the client to verify SSL certificates
-            with httpx.Client(verify=False) as client:
-                self.logger.info(f"Sending GET request to {self.base_url}{endpoint} with params {params}")
-                response = client.get(f"{self.base_url}{endpoint}", params=params)
-                response.raise_for_status()
-                self.logger.info(f"Received response with status code {response.status_code}")
+            self.logger.info("Sending GET request to %s%s with params %s", self.base_url, endpoint, params, extra=SAMPLED)
+            response = self.send(endpoint, params=params)
+            response.raise_for_status()
+            self.logger.info("Received response with status code %s", response.status_code, extra=SAMPLED)
             return response
         except httpx.HTTPStatusError as e:
-            self.logger.error(f"HTTP error occurred: {e.response.status_code} - {e.response.text}", exc_info=True)
+            self.logger.error("HTTP error occurred: %s - %s", e.response.status_code, e.response.text, exc_info=True)
             raise
         except Exception as e:
-            self.logger.error(f"An error occurred: {str(e)}", exc_info=True)
+            self.logger.error("An error occurred: %s", e, exc_info=True)
             raise
 
+    def get_validated(self, endpoint, params=None, schema=None):
+        """
+        GET ``endpoint`` in streaming mode, validating the JSON body against its schema (``load_schema(endpoint)``
+        unless ``schema`` is given) while it downloads. The body is never held in memory, except while a cassette
+        records it.
+
+        Raises for an error status, or SchemaValidationError at the first violation, which also stops the download.
+        Returns the (closed) response and the number of JSON values validated.
+        """
+        schema = schema or load_schema(endpoint)
+        url = f"{self.base_url}{endpoint}"
+        self.logger.info("Streaming GET request to %s with params %s", url, params)
+        if self.cassette:
+            request = self.client.build_request("GET", url, params=params)
+            replayed = self.cassette.replay("GET", endpoint, params, request)
+            if replayed is not None:
+                replayed.raise_for_status()
+                return replayed, validate_chunks(replayed.iter_bytes(), schema)
+        recording = self.cassette is not None and self.cassette.recording
+
+        if self.policy:
+            time.sleep(self.policy.before())
+        timer = RequestTimer()
+        try:
+            with self.client.stream("GET", url, params=params, extensions={"trace": timer.trace}) as response:
+                try:
+                    if self.policy:
+                        self.policy.after(0, response=response)
+                    if recording and response.is_error:
+                        response.read()
+                        self.cassette.record("GET", endpoint, params, response)
+                    response.raise_for_status()
+                    chunks = response.iter_bytes()
+                    if recording:
+                        body = []
+                        chunks = _collect(chunks, body)
+                    values = validate_chunks(chunks, schema)
+                finally:
+                    self.metrics.record(endpoint, params, timer, response=response)
+        except httpx.HTTPError as e:
+            if not isinstance(e, httpx.HTTPStatusError):
+                if self.policy:
+                    self.policy.after(0, error=e)
+                self.metrics.record(endpoint, params, timer, error=e)
+            self.logger.error("An error occurred: %s", e, exc_info=True)
+            raise
+        self.logger.info("Validated %d JSON values from %s (%d bytes)", values, url, response.num_bytes_downloaded)
+        if recording:
+            # Only a body that passed validation is recorded, so a replay never serves a truncated download
+            self.cassette.record("GET", endpoint, params, httpx.Response(
+                response.status_code, headers=response.headers, content=b"".join(body), request=response.request))
+        return response, values
 
     def get_new(self, endpoint, params=None):
-    # Configure the client to verify SSL certificates
-    with httpx.Client(verify=False) as client:
-        self.logger.info(f"Sending GET request to {self.base_url}{endpoint} with params {params}")
-        response = client.get(f"{self.base_url}{endpoint}", params=params)
-        self.logger.info(f"Received response with status code {response.status_code}")
-    return response
+        self.logger.info("Sending GET request to %s%s with params %s", self.base_url, endpoint, params, extra=SAMPLED)
+        response = self.send(endpoint, params=params)
+        self.logger.info("Received response with status code %s", response.status_code, extra=SAMPLED)
+        return response
+
+    def close(self):
+        self.client.close()
+        self.logger.info("HTTP client closed.")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class AsyncAPIClient:
+    def __init__(self, base_url, concurrency=10, metrics_registry=None, cassette=None, policy=None, http_cache=None,
+                 **options):
+        self.base_url = base_url
+        self.concurrency = concurrency
+        self.metrics = metrics_registry or metrics.registry
+        self.cassette = cassette
+        self.policy = policy
+        self.http_cache = http_cache
+        self.logger = get_logger("APIClient")
+        self.client = httpx.AsyncClient(**pool_options(self.logger, **options))
+
+    @classmethod
+    def from_config(cls, config):
+        concurrency = config['api'].getint("concurrency", fallback=10)
+        return cls(config['api']['base_url'], concurrency=concurrency,
+                   cassette=Cassette.from_settings(config['api']), policy=RequestPolicy.from_settings(config['api']),
+                   http_cache=ConditionalCache.from_settings(config['api']), **client_settings(config['api']))
+
+    async def send(self, endpoint, params=None):
+        url = f"{self.base_url}{endpoint}"
+        if self.cassette:
+            request = self.client.build_request("GET", url, params=params)
+            replayed = self.cassette.replay("GET", endpoint, params, request)
+            if replayed is not None:
+                return replayed
+
+        cache_key, conditional = self.http_cache.prepare(endpoint, params) if self.http_cache else (None, None)
+        attempt = throttled = 0
+        while True:
+            if self.policy:
+                try:
+                    await asyncio.sleep(self.policy.before())
+                except CircuitOpenError:
+                    self.metrics.record_rejection(endpoint)
+                    raise
+            timer = RequestTimer()
+            try:
+                response = await self.client.get(url, params=params, headers=conditional,
+                                                 extensions={"trace": timer.atrace})
+            except Exception as e:
+                delay = self.policy.after(attempt, error=e) if self.policy else None
+                if delay is None:
+                    self.metrics.record(endpoint, params, timer, error=e, retries=attempt, throttled=throttled)
+                    raise
+            else:
+                delay = self.policy.after(attempt, response=response) if self.policy else None
+                if delay is None:
+                    break
+                throttled += response.status_code in THROTTLE_STATUSES
+                await response.aclose()
+            self.logger.warning("Retrying GET %s in %.2fs (attempt %d)", url, delay, attempt + 1)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+        self.metrics.record(endpoint, params, timer, response=response, retries=attempt, throttled=throttled)
+        if self.http_cache:
+            response = self.http_cache.resolve(cache_key, response)
+        if self.cassette:
+            self.cassette.record("GET", endpoint, params, response)
+        return response
+
+    async def get(self, endpoint, params=None):
+        try:
+            self.logger.info("Sending GET request to %s%s with params %s", self.base_url, endpoint, params, extra=SAMPLED)
+            response = await self.send(endpoint, params=params)
+            response.raise_for_status()
+            self.logger.info("Received response with status code %s", response.status_code, extra=SAMPLED)
+            return response
+        except httpx.HTTPStatusError as e:
+            self.logger.error("HTTP error occurred: %s - %s", e.response.status_code, e.response.text)
+            raise
+        except Exception as e:
+            self.logger.error("An error occurred: %s", e, exc_info=True)
+            raise
+
+    async def fetch(self, endpoint, params=None):
+        """
+        Like get(), but returns a RequestResult instead of raising.
+        """
+        try:
+            return RequestResult(params, response=await self.get(endpoint, params=params))
+        except Exception as e:
+            return RequestResult(params, error=e)
+
+    async def get_many(self, endpoint, param_sets, concurrency=None):
+        """
+        GET ``endpoint`` once per entry of ``param_sets`` with at most ``concurrency`` requests in flight.
+
+        Returns one RequestResult per entry, in input order. A failing request is recorded on its
+        result instead of aborting the rest of the batch.
+        """
+        param_sets = list(param_sets)
+        results = [None] * len(param_sets)
+        pending = iter(enumerate(param_sets))
+
+        async def worker():
+            for index, params in pending:
+                results[index] = await self.fetch(endpoint, params)
+
+        workers = min(concurrency or self.concurrency, len(param_sets))
+        await asyncio.gather(*(worker() for _ in range(workers)))
+        return results
+
+    async def close(self):
+        await self.client.aclose()
+        self.logger.info("Async HTTP client closed.")
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
@@ -1,13 +1,13 @@
-from azure.identity import DefaultAzureCredential
-from azure.keyvault.secrets import SecretClient
+import pyodbc
 import logging
+from utilities.secret_provider import SecretProvider
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class DatabaseManager:
-    def __init__(self, key_vault_name):
+    def __init__(self, key_vault_name, secret_client=None):
         """
         Initialize the DatabaseManager with Azure Key Vault name.
         """
@@ -15,8 +15,7 @@ class DatabaseManager:
             raise ValueError("Key Vault name must be provided.")
         
         self.key_vault_url = f"https://{key_vault_name}.vault.azure.net"
-        self.credentials = DefaultAzureCredential()
-        self.secret_client = SecretClient(vault_url=self.key_vault_url, credential=self.credentials)
+        self.secrets = SecretProvider.from_config(self.key_vault_url, client=secret_client)
         self.connection = None
         self.cursor = None
 
@@ -26,8 +25,9 @@ class DatabaseManager:
         """
         try:
             logger.info("Fetching secrets from Azure Key Vault...")
-            self.vault_url = self.secret_client.get_secret("vault-url").value
-            self.secret_name = self.secret_client.get_secret("secret-name").value
+            secrets = self.secrets.get_secrets(["vault-url", "secret-name"])
+            self.vault_url = secrets["vault-url"]
+            self.secret_name = secrets["secret-name"]
             
             logger.info("Successfully fetched secrets.")
         except Exception as e:
@@ -35,41 +35,39 @@ class DatabaseManager:
             raise
 
     def connect_to_database(self):
-    """
-    Connect to the database using details fetched from Azure Key Vault.
-    """
-    try:
-        logger.info("Fetching database connection details from Azure Key Vault...")
-        
-        # Fetch necessary details from Azure Key Vault
-        server = self.secret_client.get_secret("db-server").value
-        database = self.secret_client.get_secret("db-database").value
-        username = self.secret_client.get_secret("db-username").value
-        password = self.secret_client.get_secret("db-password").value
-        authentication = self.secret_client.get_secret("db-authentication").value  # Optional if needed
+        """
+        Connect to the database using details fetched from Azure Key Vault.
+        """
+        try:
+            logger.info("Fetching database connection details from Azure Key Vault...")
 
-        logger.info("Successfully fetched database details. Constructing connection string...")
-        
-        # Construct the connection string
-        connection_string = (
-            f"DRIVER={{ODBC Driver 17 for SQL Server}};"
-            f"SERVER={server};"
-            f"DATABASE={database};"
-            f"UID={username};"
-            f"PWD={password};"
-            f"Authentication={authentication}"
-        )
-        
-        logger.info("Connecting to the database...")
-        
-        # Establish the database connection
-        self.connection = pyodbc.connect(connection_string)
-        self.cursor = self.connection.cursor()
-        
-        logger.info("Database connection established successfully.")
-    except Exception as e:
-        logger.error(f"Error connecting to the database: {e}", exc_info=True)
-        raise
+            # Fetch necessary details from Azure Key Vault concurrently (served from cache when fresh)
+            secrets = self.secrets.get_secrets(
+                ["db-server", "db-database", "db-username", "db-password", "db-authentication"]
+            )
+
+            logger.info("Successfully fetched database details. Constructing connection string...")
+
+            # Construct the connection string
+            connection_string = (
+                f"DRIVER={{ODBC Driver 17 for SQL Server}};"
+                f"SERVER={secrets['db-server']};"
+                f"DATABASE={secrets['db-database']};"
+                f"UID={secrets['db-username']};"
+                f"PWD={secrets['db-password']};"
+                f"Authentication={secrets['db-authentication']}"
+            )
+
+            logger.info("Connecting to the database...")
+
+            # Establish the database connection
+            self.connection = pyodbc.connect(connection_string)
+            self.cursor = self.connection.cursor()
+
+            logger.info("Database connection established successfully.")
+        except Exception as e:
+            logger.error(f"Error connecting to the database: {e}", exc_info=True)
+            raise
 
 
     def close_connection(self):
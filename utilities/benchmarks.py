@@ -0,0 +1,319 @@
+"""
+Benchmarks for the client, database and pipeline hot paths, run against the local stand-ins (utilities.standin_db
+and utilities.standin_api), so results are reproducible on any Linux box.
+
+Groups:
+
+- ``client``: requests/s of ``APIClient.get`` with a new client per call versus one pooled client.
+- ``fanout``: a sequential ``APIClient.get`` loop versus ``AsyncAPIClient.get_many``.
+- ``db``: ``fetch_user_emails`` (fetch everything) versus streaming ``iter_user_emails`` at increasing row counts.
+- ``memory``: peak traced memory per 10k users of a pipelined user sweep, keeping every response versus a
+  ResultStore.
+
+Results and environment metadata are written as JSON; ``--compare`` prints the change against an earlier run:
+
+    python -m utilities.benchmarks --output logs/benchmarks-before.json
+    python -m utilities.benchmarks --only db --rows 1000,100000 --compare logs/benchmarks-before.json
+"""
+import argparse
+import asyncio
+import datetime
+import gc
+import importlib.metadata
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from itertools import cycle, islice
+
+import httpx
+
+from utilities.api_client import APIClient, AsyncAPIClient
+from utilities.metrics import MetricsRegistry
+from utilities.pipeline import run_pipeline
+from utilities.results import ResultStore
+from utilities.standin_api import USER_ACCESS_PATH, StandInAPI, serve_in_thread
+from utilities.standin_db import SQLiteDatabaseManager, seed_database
+
+GROUPS = ("client", "fanout", "db", "memory")
+
+# Packages whose versions change what is being measured
+VERSIONED_PACKAGES = ("httpx", "h2", "h11", "anyio", "uvicorn", "ijson", "pyodbc")
+
+
+def environment():
+    """
+    Where and on what the benchmarks ran: interpreter, platform, CPUs, package versions and git revision.
+    """
+    versions = {}
+    for package in VERSIONED_PACKAGES:
+        try:
+            versions[package] = importlib.metadata.version(package)
+        except importlib.metadata.PackageNotFoundError:
+            versions[package] = None
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "packages": versions,
+        "git_commit": _git("rev-parse", "HEAD"),
+        "git_dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+    }
+
+
+def _git(*args):
+    try:
+        return subprocess.run(["git", *args], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def timed(function, repeat):
+    """
+    Median wall time of ``repeat`` runs of ``function`` (after one warm-up run).
+    """
+    function()
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def peak_memory(function):
+    """
+    Peak traced allocation in bytes while ``function`` runs.
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def result(group, name, params, **metrics):
+    return {"name": f"{group}.{name}", "params": params,
+            "metrics": {key: round(value, 6) if isinstance(value, float) else value for key, value in metrics.items()}}
+
+
+def seeded(workdir, users, access_per_user, seed):
+    path = os.path.join(workdir, f"standin-{users}x{access_per_user}.sqlite")
+    if not os.path.exists(path):
+        seed_database(path, users=users, access_per_user=access_per_user, fields=1000, seed=seed)
+    return path
+
+
+def database_manager(path):
+    db = SQLiteDatabaseManager(path)
+    # Measure the queries themselves, not the local snapshot that would answer them after the first run
+    db.snapshots = None
+    db.connect()
+    return db
+
+
+def user_params(db, count):
+    emails = [email for batch in db.iter_user_emails() for email in batch]
+    return [{"UserEmail": email} for email in islice(cycle(emails), count)]
+
+
+def bench_client(args, base_url, params):
+    def per_call():
+        for entry in params:
+            with APIClient(base_url, metrics_registry=MetricsRegistry()) as client:
+                client.get(USER_ACCESS_PATH, entry)
+
+    pooled_client = APIClient(base_url, metrics_registry=MetricsRegistry())
+
+    def pooled():
+        for entry in params:
+            pooled_client.get(USER_ACCESS_PATH, entry)
+
+    shared = {"requests": len(params), "latency_ms": args.latency_ms}
+    try:
+        return [result("client", name, shared, requests_per_s=len(params) / seconds, seconds=seconds)
+                for name, seconds in (("per_call", timed(per_call, args.repeat)),
+                                      ("pooled", timed(pooled, args.repeat)))]
+    finally:
+        pooled_client.close()
+
+
+def bench_fanout(args, base_url, params):
+    sync_client = APIClient(base_url, metrics_registry=MetricsRegistry())
+
+    def sequential():
+        for entry in params:
+            sync_client.get(USER_ACCESS_PATH, entry)
+
+    def fan_out():
+        async def run():
+            async with AsyncAPIClient(base_url, concurrency=args.concurrency,
+                                      metrics_registry=MetricsRegistry(),
+                                      max_connections=args.concurrency) as client:
+                results = await client.get_many(USER_ACCESS_PATH, params)
+            failed = sum(not entry.ok for entry in results)
+            if failed:
+                raise RuntimeError(f"{failed} of {len(results)} fan-out requests failed")
+        asyncio.run(run())
+
+    shared = {"requests": len(params), "latency_ms": args.latency_ms}
+    try:
+        sequential_seconds = timed(sequential, args.repeat)
+        fan_out_seconds = timed(fan_out, args.repeat)
+        return [
+            result("fanout", "sync", shared,
+                   requests_per_s=len(params) / sequential_seconds, seconds=sequential_seconds),
+            result("fanout", "async", {**shared, "concurrency": args.concurrency},
+                   requests_per_s=len(params) / fan_out_seconds, seconds=fan_out_seconds),
+        ]
+    finally:
+        sync_client.close()
+
+
+def bench_db(args):
+    results = []
+    for rows in args.rows:
+        db = database_manager(seeded(args.workdir, rows, 1, args.seed))
+        try:
+            def fetch_all():
+                return len(db.fetch_user_emails())
+
+            def stream():
+                return sum(len(batch) for batch in db.iter_user_emails())
+
+            for name, function in (("fetchall", fetch_all), ("streaming", stream)):
+                seconds = timed(function, args.repeat)
+                peak = peak_memory(function)
+                results.append(result("db", name, {"rows": rows, "batch_size": db.fetch_batch_size},
+                                      rows_per_s=rows / seconds, seconds=seconds, peak_kib=peak / 1024))
+        finally:
+            db.close()
+    return results
+
+
+def bench_memory(args):
+    users = args.memory_users
+    db = database_manager(seeded(args.workdir, users, 3, args.seed))
+    app = StandInAPI(db.path, field_rows=0)
+
+    def sweep(keep_responses):
+        async def run():
+            client = AsyncAPIClient("http://standin", concurrency=args.concurrency, metrics_registry=MetricsRegistry())
+            client.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app))
+            store = ResultStore(spill="off")
+            try:
+                results = await run_pipeline(client, USER_ACCESS_PATH, db.iter_user_emails(),
+                                             lambda email: {"UserEmail": email},
+                                             on_result=None if keep_responses else store.add)
+                return len(results) if keep_responses else len(store)
+            finally:
+                await client.close()
+        return asyncio.run(run())
+
+    results = []
+    try:
+        for name, keep_responses in (("responses", True), ("result_store", False)):
+            peak = peak_memory(lambda: sweep(keep_responses))
+            results.append(result("memory", name, {"users": users, "concurrency": args.concurrency},
+                                  peak_kib=peak / 1024, peak_kib_per_10k_users=peak / 1024 * 10000 / users))
+    finally:
+        app.close()
+        db.close()
+    return results
+
+
+def run_benchmarks(args):
+    os.makedirs(args.workdir, exist_ok=True)
+    groups = args.only or list(GROUPS)
+    results = []
+    if "client" in groups or "fanout" in groups:
+        db = database_manager(seeded(args.workdir, args.users, 3, args.seed))
+        params = user_params(db, args.requests)
+        db.close()
+        app = StandInAPI(db.path, latency_ms=args.latency_ms, field_rows=0)
+        server, base_url = serve_in_thread(app)
+        try:
+            if "client" in groups:
+                results += bench_client(args, base_url, params)
+            if "fanout" in groups:
+                results += bench_fanout(args, base_url, params)
+        finally:
+            server.should_exit = True
+            app.close()
+    if "db" in groups:
+        results += bench_db(args)
+    if "memory" in groups:
+        results += bench_memory(args)
+    parameters = {key: value for key, value in vars(args).items() if key not in ("output", "compare")}
+    return {"environment": environment(), "parameters": parameters, "results": results}
+
+
+def compare(before, after):
+    """
+    One line per metric present in both reports: before, after and the relative change.
+    """
+    previous = {(entry["name"], json.dumps(entry["params"], sort_keys=True)): entry["metrics"]
+                for entry in before["results"]}
+    lines = [f"{'benchmark':<24} {'metric':<24} {'before':>12} {'after':>12} {'change':>8}"]
+    for entry in after["results"]:
+        metrics = previous.get((entry["name"], json.dumps(entry["params"], sort_keys=True)))
+        if metrics is None:
+            continue
+        for metric, value in entry["metrics"].items():
+            old = metrics.get(metric)
+            if not old or not isinstance(value, (int, float)):
+                continue
+            lines.append(f"{entry['name']:<24} {metric:<24} {old:>12.3f} {value:>12.3f} {(value - old) / old:>+8.1%}")
+    return "\n".join(lines)
+
+
+def format_report(report):
+    lines = [f"{'benchmark':<24} {'params':<48} metrics"]
+    for entry in report["results"]:
+        params = ", ".join(f"{key}={value}" for key, value in entry["params"].items())
+        metrics = ", ".join(f"{key}={value}" for key, value in entry["metrics"].items())
+        lines.append(f"{entry['name']:<24} {params:<48} {metrics}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the client, database and pipeline hot paths.")
+    parser.add_argument("--only", action="append", choices=GROUPS, help="Benchmark group to run (repeatable)")
+    parser.add_argument("--requests", type=int, default=500, help="Requests per client/fan-out run")
+    parser.add_argument("--latency-ms", type=float, default=2.0, help="Stand-in API latency per request")
+    parser.add_argument("--concurrency", type=int, default=32, help="Requests in flight for async runs")
+    parser.add_argument("--users", type=int, default=1000, help="Users seeded for the client/fan-out runs")
+    parser.add_argument("--rows", type=lambda value: [int(rows) for rows in value.split(",")],
+                        default=[1000, 10000, 100000], help="Comma-separated row counts for the db group")
+    parser.add_argument("--memory-users", type=int, default=10000, help="Users swept in the memory group")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per benchmark (median is reported)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the synthetic data")
+    parser.add_argument("--workdir", default="logs/benchmarks", help="Where the seeded databases are kept")
+    parser.add_argument("--output", default="logs/benchmarks.json", help="Where to write the JSON results")
+    parser.add_argument("--compare", default=None, help="Earlier results to compare against")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args)
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(format_report(report))
+    if args.compare:
+        with open(args.compare) as f:
+            print()
+            print(compare(json.load(f), report))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
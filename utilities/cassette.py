@@ -0,0 +1,163 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+MODES = ("off", "replay", "record", "record-missing")
+
+# Headers that describe the wire encoding; stored bodies are already decoded
+_DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    method TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    recorded_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_by_age ON responses (recorded_at);
+"""
+
+
+class CassetteMissError(LookupError):
+    pass
+
+
+def normalize_params(params):
+    """
+    Canonical JSON for request parameters, so equivalent dicts map to the same cassette entry.
+    """
+    items = sorted((str(key), str(value)) for key, value in (params or {}).items())
+    return json.dumps(items, separators=(",", ":"))
+
+
+def cassette_key(method, endpoint, params):
+    return hashlib.sha256(f"{method.upper()} {endpoint} {normalize_params(params)}".encode()).hexdigest()
+
+
+class CassetteStore:
+    """
+    Compact on-disk store of recorded responses (zlib-compressed bodies in SQLite), bounded by age and size.
+    """
+
+    def __init__(self, path, max_age=7 * 24 * 3600.0, max_bytes=100 * 1024 * 1024):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.executescript(SCHEMA)
+        self.evict()
+
+    def load(self, method, endpoint, params, request):
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT status, headers, body FROM responses WHERE key = ? AND recorded_at >= ?",
+                (cassette_key(method, endpoint, params), time.time() - self.max_age),
+            ).fetchone()
+        if row is None:
+            return None
+        status, headers, body = row
+        return httpx.Response(status, headers=json.loads(headers), content=zlib.decompress(body), request=request)
+
+    def save(self, method, endpoint, params, response):
+        headers = [(name, value) for name, value in response.headers.multi_items()
+                   if name.lower() not in _DROPPED_HEADERS]
+        body = zlib.compress(response.content)
+        with self._lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (cassette_key(method, endpoint, params), method.upper(), endpoint, normalize_params(params),
+                 response.status_code, json.dumps(headers), body, len(body), time.time()),
+            )
+
+    def evict(self):
+        """
+        Drop entries older than ``max_age``, then the oldest entries until the store fits in ``max_bytes``.
+        """
+        with self._lock, self.connection:
+            self.connection.execute("DELETE FROM responses WHERE recorded_at < ?", (time.time() - self.max_age,))
+            total = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                excess = total - self.max_bytes
+                for key, size in self.connection.execute(
+                        "SELECT key, size FROM responses ORDER BY recorded_at").fetchall():
+                    self.connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    excess -= size
+                    if excess <= 0:
+                        break
+                logger.info(f"Evicted cassette entries to keep {self.path} under {self.max_bytes} bytes")
+
+    def close(self):
+        with self._lock:
+            self.connection.close()
+
+
+class Cassette:
+    """
+    Record/replay policy around a CassetteStore.
+
+    ``replay`` never touches the network, ``record`` always does and overwrites entries, ``record-missing``
+    replays what it has and records the rest.
+    """
+    _stores = {}
+    _stores_lock = threading.Lock()
+
+    def __init__(self, mode, store):
+        if mode not in MODES:
+            raise ValueError(f"Unknown record mode '{mode}', expected one of {MODES}.")
+        self.mode = mode
+        self.store = store
+
+    @classmethod
+    def from_settings(cls, section):
+        """
+        Build the cassette configured in the [api] section, or None when record_mode is off.
+        """
+        mode = section.get("record_mode", fallback="off")
+        if mode == "off":
+            return None
+        path = section.get("cassette_path", fallback="logs/cassettes.sqlite")
+        # Share one store per file between the sync and async clients of a session
+        with cls._stores_lock:
+            store = cls._stores.get(path)
+            if store is None:
+                store = cls._stores[path] = CassetteStore(
+                    path,
+                    max_age=section.getfloat("cassette_max_age", fallback=7 * 24 * 3600.0),
+                    max_bytes=section.getint("cassette_max_bytes", fallback=100 * 1024 * 1024),
+                )
+        return cls(mode, store)
+
+    def replay(self, method, endpoint, params, request):
+        """
+        Return the recorded response, None when the network should be used, or raise in strict replay mode.
+        """
+        if self.mode == "record":
+            return None
+        response = self.store.load(method, endpoint, params, request)
+        if response is None and self.mode == "replay":
+            raise CassetteMissError(f"No recorded response for {method} {endpoint} {normalize_params(params)}")
+        return response
+
+    @property
+    def recording(self):
+        return self.mode in ("record", "record-missing")
+
+    def record(self, method, endpoint, params, response):
+        if self.recording:
+            self.store.save(method, endpoint, params, response)
@@ -0,0 +1,194 @@
+import datetime
+import decimal
+import hashlib
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Join keys that identify the user rather than describe the access granted
+DEFAULT_IGNORED = ("userid", "useremail")
+
+
+def normalize_key(user_email):
+    return str(user_email).strip().casefold()
+
+
+def normalize_value(value):
+    """
+    Canonical form of one scalar, so DB values and their JSON renderings compare equal.
+    """
+    if isinstance(value, str):
+        return value.strip().casefold()
+    if value is None:
+        return value
+    if isinstance(value, bool):
+        # bit columns come back as bool from pyodbc but as 0/1 from other drivers and some payloads
+        return int(value)
+    if isinstance(value, (int, float, decimal.Decimal)):
+        number = float(value)
+        return int(number) if number.is_integer() else round(number, 6)
+    if isinstance(value, datetime.datetime):
+        return (value.isoformat(timespec="seconds") if not value.microsecond else value.isoformat()).casefold()
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    if isinstance(value, (bytes, bytearray)):
+        return value.hex()
+    return str(value).strip().casefold()
+
+
+class RecordNormalizer:
+    """
+    Projects DB rows and API records onto the same canonical shape: lower-cased field names and normalized values,
+    restricted to ``fields`` (or to every field except the ``ignored`` join keys).
+    """
+
+    def __init__(self, fields=None, ignored=DEFAULT_IGNORED):
+        self.fields = tuple(field.casefold() for field in fields) if fields else None
+        self.ignored = frozenset(field.casefold() for field in ignored)
+
+    def record(self, mapping):
+        items = {str(name).casefold(): value for name, value in mapping.items()}
+        names = self.fields or sorted(name for name in items if name not in self.ignored)
+        return json.dumps({name: normalize_value(items.get(name)) for name in names}, sort_keys=True,
+                          separators=(",", ":"))
+
+    def records(self, mappings):
+        """
+        Canonical, order-independent form of a user's records (a sorted list of canonical JSON strings).
+        """
+        return sorted(self.record(mapping) for mapping in mappings)
+
+
+def digest(canonical_records):
+    return hashlib.blake2b("\n".join(canonical_records).encode(), digest_size=16).digest()
+
+
+def extract_records(payload, records_path=None):
+    """
+    The list of access records in an API payload: the value at ``records_path`` (dot separated), else the payload
+    itself when it is a list, else its first list-valued property, else the payload as a single record.
+    """
+    if records_path:
+        for part in records_path.split("."):
+            payload = payload.get(part) if isinstance(payload, dict) else None
+        payload = payload if payload is not None else []
+    elif isinstance(payload, dict):
+        payload = next((value for value in payload.values() if isinstance(value, list)), [payload])
+    if not isinstance(payload, list):
+        payload = [payload]
+    return [record if isinstance(record, dict) else {"value": record} for record in payload]
+
+
+def diff_records(expected, actual):
+    """
+    Structural diff of two canonical record lists: records only in the DB, and records only in the API.
+    """
+    remaining = list(actual)
+    missing = []
+    for record in expected:
+        if record in remaining:
+            remaining.remove(record)
+        else:
+            missing.append(json.loads(record))
+    return {"missing_from_api": missing, "unexpected_in_api": [json.loads(record) for record in remaining]}
+
+
+class ConsistencyChecker:
+    """
+    Compares what GetUserAccessInfo returns with MAP.User_Access for every user of a sweep.
+
+    The expected access for all users is loaded up front from one streamed, set-based query and kept as a 16-byte
+    digest per user. Each API payload is normalized and digested as it arrives, so a matching user costs one dict
+    lookup and nothing is retained for it. Only mismatched users keep their (normalized) API records; their DB rows
+    are re-read in a final set-based pass to build a structural diff.
+    """
+
+    def __init__(self, normalizer=None, records_path=None):
+        self.normalizer = normalizer or RecordNormalizer()
+        self.records_path = records_path
+        self.expected = {}
+        self.checked = 0
+        self.matched = 0
+        self.mismatched = {}
+        self.invalid = {}
+        self.unknown_users = []
+
+    @classmethod
+    def from_settings(cls, section):
+        """
+        Build a checker from the [consistency] section (``user_access_fields``, ``user_access_records_path``).
+        """
+        fields = [field.strip() for field in section.get("user_access_fields", fallback="").split(",")
+                  if field.strip()]
+        return cls(RecordNormalizer(fields or None), section.get("user_access_records_path", fallback=None))
+
+    def load_expected(self, row_batches, key="UserEmail"):
+        """
+        Digest the expected records per user from batches of row mappings (one row per access entry).
+        """
+        grouped = {}
+        for batch in row_batches:
+            for row in batch:
+                if self.normalizer.fields is None:
+                    # Compare on the DB columns, so extra fields in the API payload do not count as differences
+                    self.normalizer.fields = tuple(name.casefold() for name in row
+                                                   if name.casefold() not in self.normalizer.ignored)
+                grouped.setdefault(normalize_key(row[key]), []).append(self.normalizer.record(row))
+        self.expected = {user: digest(sorted(records)) for user, records in grouped.items()}
+        logger.info(f"Loaded expected access digests for {len(self.expected)} users")
+        return len(self.expected)
+
+    def observe(self, user_email, result):
+        """
+        Compare one successful API result with the expected digest; suitable as a pipeline observer. A body that is
+        not JSON counts as a mismatch instead of raising, so one bad response does not abort the pipeline.
+        """
+        if result.response is None or result.error is not None:
+            return
+        user = normalize_key(user_email)
+        self.checked += 1
+        try:
+            payload = result.response.json()
+        except ValueError as e:
+            self.invalid[user] = f"Response body is not valid JSON: {e}"
+            return
+        actual = self.normalizer.records(extract_records(payload, self.records_path))
+        expected = self.expected.get(user)
+        if expected is None:
+            self.unknown_users.append(user_email)
+        elif digest(actual) == expected:
+            self.matched += 1
+        else:
+            self.mismatched[user] = actual
+
+    def report(self, fetch_rows=None, key="UserEmail"):
+        """
+        Summary plus a structural diff per mismatched user; ``fetch_rows(users)`` re-reads their DB rows. Users
+        whose body was not JSON count as mismatched, with the decode error in place of a diff.
+        """
+        diffs = {user: None for user in self.mismatched} if fetch_rows is None else {}
+        if self.mismatched and fetch_rows is not None:
+            expected = {}
+            for batch in fetch_rows(sorted(self.mismatched)):
+                for row in batch:
+                    expected.setdefault(normalize_key(row[key]), []).append(self.normalizer.record(row))
+            for user, actual in sorted(self.mismatched.items()):
+                diffs[user] = diff_records(sorted(expected.get(user, [])), actual)
+        diffs.update((user, {"error": error}) for user, error in self.invalid.items())
+        return {
+            "expected_users": len(self.expected),
+            "checked": self.checked,
+            "matched": self.matched,
+            "mismatched": len(self.mismatched) + len(self.invalid),
+            "invalid": len(self.invalid),
+            "unknown_users": sorted(self.unknown_users),
+            "diffs": dict(sorted(diffs.items())),
+        }
+
+    @staticmethod
+    def write_report(report, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2, default=str)
@@ -0,0 +1,56 @@
+import hashlib
+
+DEFAULT_BATCH_SIZE = 500
+
+
+def fetch_batches(cursor, batch_size=None):
+    """
+    Yield lists of rows from an executed cursor, pulling ``batch_size`` rows per round-trip.
+    """
+    cursor.arraysize = batch_size or DEFAULT_BATCH_SIZE
+    while True:
+        rows = cursor.fetchmany()
+        if not rows:
+            return
+        yield rows
+
+
+class SeenSet:
+    """
+    Membership set that keeps a 64-bit digest per value instead of the value itself.
+    """
+    __slots__ = ("_digests",)
+
+    def __init__(self):
+        self._digests = set()
+
+    def __len__(self):
+        return len(self._digests)
+
+    def add(self, value):
+        """
+        Add ``value`` and return True if it had not been seen before.
+        """
+        digest = int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8).digest(), "little")
+        if digest in self._digests:
+            return False
+        self._digests.add(digest)
+        return True
+
+
+def unique_batches(row_batches, column=0):
+    """
+    Yield batches of distinct values of ``column`` from an iterator of row batches, in first-seen order.
+    """
+    seen = SeenSet()
+    for rows in row_batches:
+        batch = [row[column] for row in rows if seen.add(row[column])]
+        if batch:
+            yield batch
+
+
+def iter_unique_column(cursor, batch_size=None, column=0):
+    """
+    Yield batches of distinct values of ``column`` from an executed cursor, in first-seen order.
+    """
+    yield from unique_batches(fetch_batches(cursor, batch_size), column)
@@ -1,14 +1,79 @@
-import pyodbc
+try:
+    import pyodbc
+except ImportError:  # Optional: only the SQL Server backend needs pyodbc and the ODBC driver
+    pyodbc = None
 import configparser
-import logging
+import threading
+import time
+from utilities.db_helper import fetch_batches, unique_batches
+from utilities.db_pool import ConnectionPool, pool_settings
+from utilities.db_snapshot import SnapshotStore
+from utilities.log_setup import get_logger
+from utilities.token_provider import AzureIdentityTokenProvider, CachedTokenProvider, access_token_attrs
+
+USER_EMAILS_QUERY = "SELECT UM.UserEmail FROM MAP.User_Master UM JOIN MAP.User_Access UA ON UM.UserID = UA.UserID;"
+FIRST_FIELD_QUERY = "SELECT TOP 1 Field_Name FROM MAP.Field_Master ORDER BY Field_Name;"
+# Keyset pagination: each page seeks past the last name of the previous page instead of using OFFSET
+FIELD_PAGE_QUERY = "SELECT DISTINCT TOP (?) Field_Name FROM MAP.Field_Master {where}ORDER BY Field_Name;"
+FIELD_SAMPLE_QUERY = "SELECT DISTINCT TOP (?) Field_Name FROM MAP.Field_Master TABLESAMPLE ({percent:g} PERCENT);"
+USER_ACCESS_ROWS_QUERY = "SELECT UM.UserEmail, UA.* FROM MAP.User_Master UM JOIN MAP.User_Access UA ON UM.UserID = UA.UserID"
+
+# Users per IN (...) list; SQL Server allows at most 2100 parameters per statement
+IN_LIST_SIZE = 500
+
+# Cheap change probes: one aggregate row instead of re-reading the tables
+USER_ACCESS_PROBE = (
+    "SELECT (SELECT CHECKSUM_AGG(BINARY_CHECKSUM(UserID, UserEmail)) FROM MAP.User_Master), "
+    "(SELECT CHECKSUM_AGG(BINARY_CHECKSUM(*)) FROM MAP.User_Access), "
+    "(SELECT COUNT_BIG(*) FROM MAP.User_Access);"
+)
+FIELD_MASTER_PROBE = "SELECT CHECKSUM_AGG(BINARY_CHECKSUM(Field_Name)), COUNT_BIG(*) FROM MAP.Field_Master;"
+
+# Change tracking (ALTER TABLE ... ENABLE CHANGE_TRACKING) on User_Master and User_Access; CHANGETABLE returns each
+# changed row's primary key, so IncrementalSweep checks that UserID is part of both keys before relying on it
+CHANGE_VERSION_QUERY = "SELECT CHANGE_TRACKING_CURRENT_VERSION();"
+MIN_VALID_VERSION_QUERY = (
+    "SELECT CHANGE_TRACKING_MIN_VALID_VERSION(OBJECT_ID('MAP.User_Master')), "
+    "CHANGE_TRACKING_MIN_VALID_VERSION(OBJECT_ID('MAP.User_Access'));"
+)
+CHANGED_USERS_QUERY = (
+    "SELECT DISTINCT UM.UserEmail FROM MAP.User_Master UM JOIN ("
+    "SELECT CT.UserID FROM CHANGETABLE(CHANGES MAP.User_Master, ?) AS CT UNION "
+    "SELECT CT.UserID FROM CHANGETABLE(CHANGES MAP.User_Access, ?) AS CT"
+    ") AS Changed ON UM.UserID = Changed.UserID;"
+)
+# Which of the given users (an IN list of lower-cased emails) still have access rows
+EXISTING_USERS_QUERY = (
+    "SELECT DISTINCT UM.UserEmail FROM MAP.User_Master UM JOIN MAP.User_Access UA ON UM.UserID = UA.UserID "
+    "WHERE LOWER(UM.UserEmail) IN ({placeholders});"
+)
+# Up to ? random users per value of a User_Access column, so every stratum is covered by the safety-net sample;
+# {column} is only ever a name read back from TABLE_COLUMNS_QUERY
+STRATIFIED_USERS_QUERY = (
+    "SELECT UserEmail FROM (SELECT UM.UserEmail, "
+    "ROW_NUMBER() OVER (PARTITION BY UA.[{column}] ORDER BY NEWID()) AS Pick "
+    "FROM MAP.User_Master UM JOIN MAP.User_Access UA ON UM.UserID = UA.UserID) AS Ranked WHERE Pick <= ?;"
+)
+RANDOM_USERS_QUERY = (
+    "SELECT TOP (?) UM.UserEmail FROM MAP.User_Master UM "
+    "WHERE EXISTS (SELECT 1 FROM MAP.User_Access UA WHERE UA.UserID = UM.UserID) ORDER BY NEWID();"
+)
+TABLE_COLUMNS_QUERY = "SELECT COLUMN_NAME FROM INFORMATION_SCHEMA.COLUMNS WHERE TABLE_SCHEMA = 'MAP' AND TABLE_NAME = ?;"
+PRIMARY_KEY_QUERY = (
+    "SELECT KCU.COLUMN_NAME FROM INFORMATION_SCHEMA.TABLE_CONSTRAINTS TC "
+    "JOIN INFORMATION_SCHEMA.KEY_COLUMN_USAGE KCU ON TC.CONSTRAINT_SCHEMA = KCU.CONSTRAINT_SCHEMA "
+    "AND TC.CONSTRAINT_NAME = KCU.CONSTRAINT_NAME "
+    "WHERE TC.CONSTRAINT_TYPE = 'PRIMARY KEY' AND TC.TABLE_SCHEMA = 'MAP' AND TC.TABLE_NAME = ?;"
+)
 
 
 class DatabaseManager:
-    def __init__(self):
+    def __init__(self, token_provider=None):
         self.logger = self.setup_logger()
         self.load_db_config()
-        self.connection = None
-        self.cursor = None
+        self.pool = None
+        self.pool_lock = threading.Lock()
+        self.token_provider = token_provider
 
     def load_db_config(self):
         config = configparser.ConfigParser()
@@ -18,50 +83,157 @@ class DatabaseManager:
         self.database = config['database']['database']
         self.username = config['database']['username']
         self.password = config['database']['password']
+        self.fetch_batch_size = config['database'].getint('fetch_batch_size', fallback=500)
+        self.pool_settings = pool_settings(config['database'])
+        self.authentication = config['database'].get('authentication', fallback='ActiveDirectoryMsi')
+        self.token_refresh_margin = config['database'].getfloat('token_refresh_margin', fallback=300.0)
+        self.lazy_connect = config['database'].getboolean('lazy_connect', fallback=True)
+        self.snapshots = None
+        if config['database'].getboolean('snapshots', fallback=True):
+            self.snapshots = SnapshotStore(
+                config['database'].get('snapshot_dir', fallback='logs/snapshots'),
+                trust_ttl=config['database'].getfloat('snapshot_trust_ttl', fallback=300.0),
+            )
 
     def setup_logger(self):
-        logger = logging.getLogger('DatabaseManager')
-        logger.setLevel(logging.INFO)
-        handler = logging.FileHandler('database_manager.log')
-        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        handler.setFormatter(formatter)
-        logger.addHandler(handler)
-        return logger
+        return get_logger('DatabaseManager')
 
     def connect(self):
         # connection_string = (f'DRIVER={{ODBC Driver 18 for SQL Server}};SERVER={self.server};DATABASE={self.database};'
         #                      f'=Authentication=ActiveDirectoryServicePrincipal;Encrypt=yes;TrustServerCertificate=yes')
+
+        #   connection_string = (f'DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={self.server};DATABASE={self.database};'
+        #                      f'UID={self.username};PWD={self.password};Authentication=ActiveDirectoryPassword;')
+
+        if self.authentication == 'access_token' and not isinstance(self.token_provider, CachedTokenProvider):
+            provider = self.token_provider or AzureIdentityTokenProvider()
+            self.token_provider = CachedTokenProvider(provider, self.token_refresh_margin)
+
+        # With lazy_connect the pool (and its connect latency) is only paid for once a query actually needs it,
+        # so sessions served entirely from snapshots never connect
+        if not self.lazy_connect:
+            self.ensure_pool()
+
+    def ensure_pool(self):
+        with self.pool_lock:
+            if self.pool is not None:
+                return
+            try:
+                self.pool = ConnectionPool(self.open_connection, **self.pool_settings)
+                self.logger.info('Database connection established.')
+            except Exception as e:
+                self.logger.error(f"Error connecting to the database: {e}", exc_info=True)
+                raise
+
+    def open_connection(self):
+        """
+        Open one connection, passing a cached AAD access token to the driver when authentication = access_token.
+        """
         connection_string = (
             'DRIVER={ODBC Driver 18 for SQL Server};'
-            'SERVER=lvdms-dev.database.windows.net;'
-            'AUTHENTICATION=ActiveDirectoryMsi;'
-            'DATABASE=LVDMS;'
+            f'SERVER={self.server};'
+            f'DATABASE={self.database};'
             'Encrypt=yes;TrustServerCertificate=no;'
         )
+        attrs_before = {}
+        start = time.perf_counter()
+        if self.authentication == 'access_token':
+            token, _ = self.token_provider.get_token()
+            attrs_before = access_token_attrs(token)
+        else:
+            connection_string += f'AUTHENTICATION={self.authentication};'
+        token_time = time.perf_counter() - start
 
-        #   connection_string = (f'DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={self.server};DATABASE={self.database};'
-        #                      f'UID={self.username};PWD={self.password};Authentication=ActiveDirectoryPassword;')
-        
-        try:
-            self.connection = pyodbc.connect(connection_string)
-            self.cursor = self.connection.cursor()
-            self.logger.info('Database connection established.')
-        except Exception as e:
-            self.logger.error(f"Error connecting to the database: {e}", exc_info=True)
+        if pyodbc is None:
+            raise ImportError("pyodbc is required for the SQL Server backend; set [database] backend = sqlite to use "
+                              "the local stand-in instead.")
+        connection = pyodbc.connect(connection_string, attrs_before=attrs_before)
+        self.logger.info(f"Connected to {self.server} in {time.perf_counter() - start:.3f}s "
+                         f"(token {token_time:.3f}s, authentication={self.authentication})")
+        return connection
+
+    def cursor(self):
+        """
+        Lease a pooled connection and return a cursor context manager that is private to the caller.
+        """
+        self.ensure_pool()
+        return self.pool.cursor()
 
     def close(self):
-        if self.cursor:
-            self.cursor.close()
-        if self.connection:
-            self.connection.close()
+        if self.pool:
+            self.pool.close()
         self.logger.info('Database connection closed.')
 
     # Add your methods for fetching data, etc. here
 
+    def probe(self, probe_query):
+        with self.cursor() as cursor:
+            cursor.execute(probe_query)
+            row = cursor.fetchone()
+        return [None if value is None else str(value) for value in row]
+
+    def query_batches(self, query, probe_query=None, batch_size=None):
+        """
+        Yield batches of rows for ``query``, served from the local snapshot while ``probe_query`` reports no change.
+        """
+        batch_size = batch_size or self.fetch_batch_size
+        if self.snapshots is None or probe_query is None:
+            yield from self.fetch_query_batches(query, batch_size)
+            return
+
+        target = f"{self.server}/{self.database}"
+        meta = self.snapshots.metadata(target, query)
+        probe = None
+        if meta is not None and not self.snapshots.is_trusted(meta):
+            probe = self.probe(probe_query)
+            if probe == meta["probe"]:
+                meta = self.snapshots.mark_validated(target, query, meta)
+            else:
+                self.logger.info("Source tables changed since the last snapshot; re-reading.")
+                meta = None
+
+        if meta is not None:
+            self.logger.info(f"Serving {meta['rows']} rows from snapshot instead of querying the database.")
+            yield from self.snapshots.read_batches(target, query, batch_size)
+            return
+
+        if probe is None:
+            probe = self.probe(probe_query)
+        yield from self.snapshots.write_batches(target, query, probe, self.fetch_query_batches(query, batch_size))
+
+    def fetch_query_batches(self, query, batch_size):
+        with self.cursor() as cursor:
+            cursor.execute(query)
+            yield from fetch_batches(cursor, batch_size)
+
+    def fetch_records(self, query, params, batch_size):
+        """
+        Yield batches of rows as dicts keyed by column name.
+        """
+        with self.cursor() as cursor:
+            cursor.execute(query, *params)
+            columns = [column[0] for column in cursor.description]
+            for batch in fetch_batches(cursor, batch_size):
+                yield [dict(zip(columns, row)) for row in batch]
+
+    def iter_user_access(self, user_emails=None, batch_size=None):
+        """
+        Stream MAP.User_Access rows joined with the user's email, for every user in one query, or only for
+        ``user_emails`` (matched case-insensitively) in a few IN-list queries.
+        """
+        batch_size = batch_size or self.fetch_batch_size
+        if user_emails is None:
+            yield from self.fetch_records(USER_ACCESS_ROWS_QUERY, (), batch_size)
+            return
+        user_emails = [user_email.lower() for user_email in user_emails]
+        for start in range(0, len(user_emails), IN_LIST_SIZE):
+            chunk = user_emails[start:start + IN_LIST_SIZE]
+            query = f"{USER_ACCESS_ROWS_QUERY} WHERE LOWER(UM.UserEmail) IN ({', '.join('?' * len(chunk))})"
+            yield from self.fetch_records(query, chunk, batch_size)
+
     def fetch_user_emails(self):
         try:
-            self.cursor.execute("SELECT UM.UserEmail FROM MAP.User_Master UM JOIN MAP.User_Access UA ON UM.UserID = UA.UserID;")
-            rows = self.cursor.fetchall()
+            rows = [row for batch in self.query_batches(USER_EMAILS_QUERY, USER_ACCESS_PROBE) for row in batch]
             if not rows:
                 raise ValueError("No user emails found.")
             return [row[0] for row in rows]
@@ -69,13 +241,139 @@ class DatabaseManager:
             print(f"Error fetching user emails: {e}")
             raise
 
+    def iter_user_emails(self, batch_size=None):
+        """
+        Stream distinct user emails in batches instead of materialising the whole join.
+        """
+        try:
+            found = False
+            for batch in unique_batches(self.query_batches(USER_EMAILS_QUERY, USER_ACCESS_PROBE, batch_size)):
+                found = True
+                yield batch
+            if not found:
+                raise ValueError("No user emails found.")
+        except Exception as e:
+            print(f"Error fetching user emails: {e}")
+            raise
+
+    def change_tracking_versions(self):
+        """
+        ``(current, min_valid)`` change-tracking versions for User_Master/User_Access, or None when change tracking
+        is not enabled on both tables. Changes since a version older than ``min_valid`` are no longer available.
+        """
+        with self.cursor() as cursor:
+            cursor.execute(CHANGE_VERSION_QUERY)
+            current = cursor.fetchone()[0]
+            if current is None:
+                return None
+            cursor.execute(MIN_VALID_VERSION_QUERY)
+            row = cursor.fetchone()
+        if any(version is None for version in row):
+            return None
+        return current, max(row)
+
+    def changed_user_emails(self, since_version):
+        """
+        Distinct emails of users whose User_Master or User_Access rows changed after ``since_version``.
+        """
+        with self.cursor() as cursor:
+            cursor.execute(CHANGED_USERS_QUERY, since_version, since_version)
+            return [row[0] for batch in fetch_batches(cursor, self.fetch_batch_size) for row in batch]
+
+    def existing_user_emails(self, user_emails):
+        """
+        The subset of ``user_emails`` (matched case-insensitively) still in User_Master with User_Access rows.
+        """
+        user_emails = [user_email.lower() for user_email in user_emails]
+        existing = []
+        for start in range(0, len(user_emails), IN_LIST_SIZE):
+            chunk = user_emails[start:start + IN_LIST_SIZE]
+            with self.cursor() as cursor:
+                cursor.execute(EXISTING_USERS_QUERY.format(placeholders=", ".join("?" * len(chunk))), *chunk)
+                existing.extend(row[0] for row in cursor.fetchall())
+        return existing
+
+    def table_columns(self, table):
+        """
+        Column names of ``MAP.<table>``.
+        """
+        with self.cursor() as cursor:
+            cursor.execute(TABLE_COLUMNS_QUERY, table)
+            return [row[0] for row in cursor.fetchall()]
+
+    def primary_key_columns(self, table):
+        """
+        Primary key column names of ``MAP.<table>`` (empty when it has no primary key).
+        """
+        with self.cursor() as cursor:
+            cursor.execute(PRIMARY_KEY_QUERY, table)
+            return [row[0] for row in cursor.fetchall()]
+
+    def sample_user_emails(self, per_stratum, stratum_column=None):
+        """
+        A random sample of users with access rows: up to ``per_stratum`` distinct users per value of the User_Access
+        ``stratum_column``, or ``per_stratum`` users in all without one. The column name is formatted into the query,
+        so it must come from ``table_columns``.
+        """
+        with self.cursor() as cursor:
+            if stratum_column:
+                cursor.execute(STRATIFIED_USERS_QUERY.format(column=stratum_column), per_stratum)
+            else:
+                cursor.execute(RANDOM_USERS_QUERY, per_stratum)
+            return list(dict.fromkeys(row[0] for row in cursor.fetchall()))
+
+    def iter_field_names(self, page_size=None):
+        """
+        Page through every distinct Field_Name in name order with keyset pagination. The connection goes back to
+        the pool between pages, so a slow consumer never holds a cursor open on Field_Master.
+        """
+        page_size = page_size or self.fetch_batch_size
+        last = None
+        while True:
+            with self.cursor() as cursor:
+                if last is None:
+                    cursor.execute(FIELD_PAGE_QUERY.format(where=""), page_size)
+                else:
+                    cursor.execute(FIELD_PAGE_QUERY.format(where="WHERE Field_Name > ? "), page_size, last)
+                page = [row[0] for row in cursor.fetchall()]
+            if page:
+                yield page
+            if len(page) < page_size:
+                return
+            last = page[-1]
+
+    def sample_field_names(self, count, sample_percent=None):
+        """
+        A cheap subset of Field_Master for quick runs: the first ``count`` names, or up to ``count`` names from a
+        page-level ``TABLESAMPLE`` of ``sample_percent`` percent (falling back to the first names if the sample
+        comes back empty, which can happen on small tables).
+        """
+        if sample_percent:
+            with self.cursor() as cursor:
+                cursor.execute(FIELD_SAMPLE_QUERY.format(percent=float(sample_percent)), count)
+                names = [row[0] for row in cursor.fetchall()]
+            if names:
+                return names
+            self.logger.info("TABLESAMPLE returned no rows; using the first field names instead.")
+        return next(self.iter_field_names(page_size=count), [])
+
     def fetch_field_name(self):
         try:
-            self.cursor.execute("SELECT Field_Name FROM MAP.Field_Master")
-            result = self.cursor.fetchone()
-            if result is None:
+            rows = [row for batch in self.query_batches(FIRST_FIELD_QUERY, FIELD_MASTER_PROBE) for row in batch]
+            if not rows:
                 raise ValueError("No field name found.")
-            return result[0]
+            return rows[0][0]
         except Exception as e:
             print(f"Error fetching field name: {e}")
             raise
+
+
+def create_database_manager(config):
+    """
+    DatabaseManager for the configured ``[database] backend``: ``sqlserver`` (default) or ``sqlite`` (the local
+    stand-in at ``sqlite_path``).
+    """
+    if config['database'].get('backend', fallback='sqlserver') == 'sqlite':
+        from utilities.standin_db import SQLiteDatabaseManager
+        return SQLiteDatabaseManager(config['database'].get('sqlite_path', fallback='logs/standin.sqlite'))
+    return DatabaseManager()
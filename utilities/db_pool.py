@@ -0,0 +1,197 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(Exception):
+    pass
+
+
+def pool_settings(section):
+    """
+    Read connection pool settings from the [database] section of settings.ini.
+    """
+    return {
+        "min_size": section.getint("pool_min_size", fallback=1),
+        "max_size": section.getint("pool_max_size", fallback=5),
+        "max_idle": section.getfloat("pool_max_idle", fallback=300.0),
+        "health_check_interval": section.getfloat("pool_health_check_interval", fallback=30.0),
+        "acquire_timeout": section.getfloat("pool_acquire_timeout", fallback=30.0),
+    }
+
+
+class PooledConnection:
+    __slots__ = ("connection", "created_at", "last_used")
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.created_at = self.last_used = time.monotonic()
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of DB-API connections.
+
+    Every lease hands out a connection that no other thread holds, so each thread works with its own
+    connection and cursor. Connections idle for longer than ``health_check_interval`` are checked with
+    ``SELECT 1`` before being handed out, and idle connections beyond ``min_size`` are closed after ``max_idle``
+    seconds.
+    """
+
+    def __init__(self, connect, min_size=1, max_size=5, max_idle=300.0, health_check_interval=30.0,
+                 acquire_timeout=30.0):
+        if max_size < 1 or min_size > max_size:
+            raise ValueError("Pool sizes must satisfy 0 <= min_size <= max_size and max_size >= 1.")
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.health_check_interval = health_check_interval
+        self.acquire_timeout = acquire_timeout
+
+        self._idle = []
+        self._size = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self.opened = 0
+        self.discarded = 0
+        self.open_cursors = 0
+
+        for _ in range(min_size):
+            self._size += 1
+            self._idle.append(self._open())
+
+    def _open(self):
+        start = time.perf_counter()
+        entry = PooledConnection(self._connect())
+        self.opened += 1
+        logger.info(f"Opened pooled database connection in {time.perf_counter() - start:.3f}s")
+        return entry
+
+    def _discard(self, entry):
+        self.discarded += 1
+        try:
+            entry.connection.close()
+        except Exception as e:
+            logger.warning(f"Error closing pooled connection: {e}")
+
+    def _healthy(self, entry):
+        if time.monotonic() - entry.last_used < self.health_check_interval:
+            return True
+        try:
+            cursor = entry.connection.cursor()
+            try:
+                cursor.execute("SELECT 1")
+                result = cursor.fetchone()
+            finally:
+                cursor.close()
+            return result is not None and result[0] == 1
+        except Exception as e:
+            logger.warning(f"Pooled connection failed health check: {e}")
+            return False
+
+    def _recycle_idle(self):
+        now = time.monotonic()
+        keep = []
+        # Idle list is a stack (most recently used last), so stale connections sit at the front
+        for entry in self._idle:
+            if now - entry.last_used > self.max_idle and self._size > self.min_size:
+                self._size -= 1
+                self._discard(entry)
+            else:
+                keep.append(entry)
+        self._idle = keep
+
+    def acquire(self):
+        deadline = time.monotonic() + self.acquire_timeout
+        while True:
+            with self._cond:
+                entry = None
+                while True:
+                    if self._closed:
+                        raise RuntimeError("Connection pool is closed.")
+                    self._recycle_idle()
+                    if self._idle:
+                        entry = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not self._cond.wait(remaining):
+                        raise PoolTimeoutError(f"No database connection available after {self.acquire_timeout}s.")
+
+            if entry is not None:
+                if self._healthy(entry):
+                    return entry
+                self._discard(entry)
+                with self._cond:
+                    self._size -= 1
+                continue
+
+            try:
+                return self._open()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+
+    def release(self, entry, discard=False, suspect=False):
+        with self._cond:
+            if discard or self._closed:
+                self._size -= 1
+                self._discard(entry)
+            else:
+                # A suspect connection gets health-checked on its next lease instead of being trusted
+                entry.last_used = 0.0 if suspect else time.monotonic()
+                self._idle.append(entry)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        entry = self.acquire()
+        failed = False
+        try:
+            yield entry.connection
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self.release(entry, suspect=failed)
+
+    @contextmanager
+    def cursor(self):
+        with self.connection() as connection:
+            cursor = connection.cursor()
+            with self._cond:
+                self.open_cursors += 1
+            try:
+                yield cursor
+            finally:
+                with self._cond:
+                    self.open_cursors -= 1
+                cursor.close()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "opened": self.opened,
+                "discarded": self.discarded,
+                "open_cursors": self.open_cursors,
+            }
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for entry in idle:
+            self._discard(entry)
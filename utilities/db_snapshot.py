@@ -0,0 +1,94 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotStore:
+    """
+    Local, gzip-compressed JSON-lines snapshots of query results, keyed by query text and connection target.
+
+    Each snapshot carries the value of a cheap probe query (e.g. a CHECKSUM_AGG over the source tables) taken just
+    before the data was read. A snapshot younger than ``trust_ttl`` seconds is used without contacting the
+    database at all; an older one is revalidated by re-running only the probe.
+    """
+
+    def __init__(self, directory="logs/snapshots", trust_ttl=300.0):
+        self.directory = directory
+        self.trust_ttl = trust_ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, target, query):
+        key = hashlib.sha256(f"{target}\n{query}".encode()).hexdigest()[:32]
+        base = os.path.join(self.directory, key)
+        return f"{base}.json", f"{base}.jsonl.gz"
+
+    def metadata(self, target, query):
+        meta_path, data_path = self._paths(target, query)
+        if not os.path.exists(meta_path) or not os.path.exists(data_path):
+            return None
+        try:
+            with open(meta_path) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable snapshot metadata {meta_path}: {e}")
+            return None
+
+    def is_trusted(self, meta):
+        return time.time() - meta["validated_at"] < self.trust_ttl
+
+    def mark_validated(self, target, query, meta):
+        meta_path, _ = self._paths(target, query)
+        meta = dict(meta, validated_at=time.time())
+        self._write_json(meta_path, meta)
+        return meta
+
+    def read_batches(self, target, query, batch_size):
+        _, data_path = self._paths(target, query)
+        batch = []
+        with gzip.open(data_path, "rt") as f:
+            for line in f:
+                batch.append(json.loads(line))
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+    def write_batches(self, target, query, probe, batches):
+        """
+        Pass ``batches`` through while streaming them to disk; the snapshot is only published once fully consumed.
+        """
+        meta_path, data_path = self._paths(target, query)
+        tmp_path = f"{data_path}.{os.getpid()}.tmp"
+        rows = 0
+        complete = False
+        try:
+            with gzip.open(tmp_path, "wt") as f:
+                for batch in batches:
+                    for row in batch:
+                        f.write(json.dumps(list(row), default=str))
+                        f.write("\n")
+                    rows += len(batch)
+                    yield batch
+            complete = True
+        finally:
+            if complete:
+                os.replace(tmp_path, data_path)
+                now = time.time()
+                self._write_json(meta_path, {"query": query, "target": target, "probe": probe, "rows": rows,
+                                             "saved_at": now, "validated_at": now})
+                logger.info(f"Saved snapshot of {rows} rows to {data_path}")
+            elif os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    @staticmethod
+    def _write_json(path, data):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
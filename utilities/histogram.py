@@ -0,0 +1,100 @@
+SUB_BUCKET_BITS = 7
+_HALF = 1 << (SUB_BUCKET_BITS - 1)
+
+
+class LatencyHistogram:
+    """
+    HDR-style log-linear latency histogram.
+
+    Values are recorded in microseconds. Values below 2**SUB_BUCKET_BITS are exact; above that each power of two
+    is split into 64 linear sub-buckets, keeping the relative error under ~1.6% at any magnitude. Counts are kept
+    in a sparse dict, so histograms are small, picklable and can be merged across workers and runs.
+    """
+    __slots__ = ("counts", "count", "total", "min", "max")
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    @staticmethod
+    def bucket_index(value):
+        if value < (1 << SUB_BUCKET_BITS):
+            return value
+        shift = value.bit_length() - SUB_BUCKET_BITS
+        return (shift << (SUB_BUCKET_BITS - 1)) + (value >> shift)
+
+    @staticmethod
+    def bucket_value(index):
+        """
+        Midpoint of the values that fall into bucket ``index``.
+        """
+        if index < (1 << SUB_BUCKET_BITS):
+            return index
+        shift = (index >> (SUB_BUCKET_BITS - 1)) - 1
+        mantissa = index - (shift << (SUB_BUCKET_BITS - 1))
+        return (mantissa << shift) + ((1 << shift) - 1) // 2
+
+    def record(self, seconds):
+        value = max(0, int(seconds * 1_000_000))
+        index = self.bucket_index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+
+    def percentile(self, percent):
+        """
+        Latency in milliseconds at ``percent`` (0-100), or None for an empty histogram.
+        """
+        if not self.count:
+            return None
+        rank = max(1, -(-self.count * percent // 100))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self.bucket_value(index), self.max) / 1000
+        return self.max / 1000
+
+    def mean(self):
+        return self.total / self.count / 1000 if self.count else None
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "min_ms": self.min / 1000 if self.min is not None else None,
+            "mean_ms": self.mean(),
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99),
+            "p99_9_ms": self.percentile(99.9),
+            "max_ms": self.max / 1000 if self.max is not None else None,
+        }
+
+    def to_dict(self):
+        return {"counts": {str(index): count for index, count in self.counts.items()},
+                "count": self.count, "total": self.total, "min": self.min, "max": self.max}
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls()
+        histogram.counts = {int(index): count for index, count in data["counts"].items()}
+        histogram.count = data["count"]
+        histogram.total = data["total"]
+        histogram.min = data["min"]
+        histogram.max = data["max"]
+        return histogram
@@ -0,0 +1,239 @@
+import atexit
+import importlib.util
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+import zlib
+
+import httpx
+
+from utilities.cassette import cassette_key
+
+logger = logging.getLogger(__name__)
+
+# Headers that describe the wire encoding; cached bodies are stored decoded
+_DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    status INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_by_use ON entries (last_used);
+"""
+
+
+def accept_encoding(compression=True):
+    """
+    Accept-Encoding value for the codecs httpx can decode here: br (with brotli/brotlicffi) and zstd (with
+    zstandard) when installed, then gzip and deflate; ``identity`` when compression is disabled.
+    """
+    if not compression:
+        return "identity"
+    encodings = []
+    if importlib.util.find_spec("brotli") or importlib.util.find_spec("brotlicffi"):
+        encodings.append("br")
+    if importlib.util.find_spec("zstandard"):
+        encodings.append("zstd")
+    return ", ".join(encodings + ["gzip", "deflate"])
+
+
+class ConditionalCache:
+    """
+    ETag/Last-Modified validators and bodies of earlier responses, kept across runs in SQLite (zlib-compressed)
+    and evicted least-recently-used once the bodies exceed ``max_bytes``.
+
+    ``prepare`` adds If-None-Match/If-Modified-Since for a known resource. ``resolve`` turns a 304 into the
+    cached response and stores new validators from a 200.
+
+    The validators and entry sizes are kept in memory, and new bodies are compressed and written by a background
+    thread in batches, one transaction each, so the request path (often an event loop) never waits on SQLite for
+    a 200.
+    """
+    _caches = {}
+    _caches_lock = threading.Lock()
+
+    def __init__(self, path, max_bytes=50 * 1024 * 1024, flush_interval=1.0):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        # _lock guards the in-memory state and is only held briefly; _db_lock serializes use of the connection
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.executescript(SCHEMA)
+        self.validators = {}
+        self.sizes = {}
+        for key, etag, last_modified, size in self.connection.execute(
+                "SELECT key, etag, last_modified, size FROM entries"):
+            self.validators[key] = (etag, last_modified)
+            self.sizes[key] = size
+        self.total = sum(self.sizes.values())
+        # Responses queued for the writer, so a 304 for one of them can be answered before it reaches the file
+        self._pending = {}
+        self._queue = queue.Queue()
+        self._closing = threading.Event()
+        self._writer = threading.Thread(target=self._write_loop, name="http-cache-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    @classmethod
+    def from_settings(cls, section):
+        """
+        The cache configured in the [api] section (shared per file), or None when conditional_cache is off.
+        """
+        if not section.getboolean("conditional_cache", fallback=False):
+            return None
+        path = section.get("conditional_cache_path", fallback="logs/http_cache.sqlite")
+        with cls._caches_lock:
+            cache = cls._caches.get(path)
+            if cache is None:
+                cache = cls._caches[path] = cls(
+                    path, section.getint("conditional_cache_max_bytes", fallback=50 * 1024 * 1024))
+        return cache
+
+    def prepare(self, endpoint, params):
+        """
+        Returns ``(key, headers)``: the cache key and the conditional request headers for this resource.
+        """
+        key = cassette_key("GET", endpoint, params)
+        with self._lock:
+            validators = self.validators.get(key)
+        headers = {}
+        if validators is not None:
+            etag, last_modified = validators
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+        return key, headers
+
+    def resolve(self, key, response):
+        """
+        The response to hand to the caller: the cached one for a 304, else ``response`` (stored if it has
+        validators).
+        """
+        if response.status_code == 304:
+            with self._lock:
+                pending = self._pending.get(key)
+            if pending is not None:
+                status, headers, content = pending[3], pending[4], pending[5]
+            else:
+                with self._db_lock:
+                    row = self.connection.execute("SELECT status, headers, body FROM entries WHERE key = ?",
+                                                  (key,)).fetchone()
+                if row is None:
+                    return response
+                status, headers, content = row[0], json.loads(row[1]), zlib.decompress(row[2])
+            self._queue.put(("touch", key, time.time()))
+            cached = httpx.Response(status, headers=headers, content=content, request=response.request)
+            cached.extensions["from_cache"] = True
+            return cached
+
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if response.status_code == 200 and (etag or last_modified):
+            self._store(key, etag, last_modified, response)
+        return response
+
+    def _store(self, key, etag, last_modified, response):
+        headers = [(name, value) for name, value in response.headers.multi_items()
+                   if name.lower() not in _DROPPED_HEADERS]
+        entry = (key, etag, last_modified, response.status_code, headers, response.content)
+        with self._lock:
+            self.validators[key] = (etag, last_modified)
+            self._pending[key] = entry
+        self._queue.put(("store", entry))
+
+    def _write_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            # Let a burst of responses collect first: waking for every one would contend with the request path for
+            # the GIL, and each transaction commits once for the whole batch
+            self._closing.wait(self.flush_interval)
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in batch
+            try:
+                self._write([entry for entry in batch if entry is not None])
+            except Exception as e:
+                logger.warning(f"Could not write {len(batch)} entries to {self.path}: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if stop:
+                return
+
+    def _write(self, batch):
+        rows = []
+        for entry in batch:
+            if entry[0] == "store":
+                key, etag, last_modified, status, headers, content = entry[1]
+                body = zlib.compress(content)
+                rows.append((entry[1], (key, etag, last_modified, status, json.dumps(headers), body, len(body),
+                                        time.time())))
+        with self._db_lock, self.connection:
+            self.connection.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                        [row for _, row in rows if row[6] <= self.max_bytes])
+            self.connection.executemany("UPDATE entries SET last_used = ? WHERE key = ?",
+                                        [(used, key) for kind, key, used in
+                                         (entry for entry in batch if entry[0] == "touch")])
+            with self._lock:
+                for pending, row in rows:
+                    key, size = row[0], row[6]
+                    # A newer response for the same key may have been queued meanwhile; it stays pending
+                    if self._pending.get(key) is pending:
+                        del self._pending[key]
+                        if size > self.max_bytes:
+                            self.validators.pop(key, None)
+                    if size > self.max_bytes:
+                        continue
+                    self.total += size - self.sizes.get(key, 0)
+                    self.sizes[key] = size
+            if self.total > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        excess = self.total - self.max_bytes
+        for key, size in self.connection.execute("SELECT key, size FROM entries ORDER BY last_used").fetchall():
+            self.connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+            with self._lock:
+                self.sizes.pop(key, None)
+                if key not in self._pending:
+                    self.validators.pop(key, None)
+                self.total -= size
+            excess -= size
+            if excess <= 0:
+                break
+        logger.info(f"Evicted least recently used entries to keep {self.path} under {self.max_bytes} bytes")
+
+    def flush(self):
+        """
+        Wait until every queued response has been written.
+        """
+        self._closing.set()
+        self._queue.join()
+        self._closing.clear()
+
+    def close(self):
+        if not self._writer.is_alive():
+            return
+        self._closing.set()
+        self._queue.put(None)
+        self._writer.join()
+        with self._db_lock:
+            self.connection.close()
@@ -0,0 +1,231 @@
+import contextlib
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+
+@contextlib.contextmanager
+def _locked(path, timeout=60.0, poll=0.1):
+    """
+    Exclusive lock on ``path`` across processes (e.g. xdist workers), held through a ``.lock`` file.
+    """
+    lock_path = f"{path}.lock"
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Timed out waiting for the lock on {path}.")
+            time.sleep(poll)
+    try:
+        os.close(fd)
+        yield
+    finally:
+        os.remove(lock_path)
+
+
+class SyncState:
+    """
+    The last synced change-tracking version per database (``server/database``), with the bookkeeping for periodic
+    full sweeps and the users still to re-check, kept in a small JSON file.
+    """
+
+    def __init__(self, path, target):
+        self.path = path
+        self.target = target
+
+    def _read(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def load(self):
+        return self._read().get(self.target, {})
+
+    def update(self, apply):
+        """
+        Read-modify-write this database's entry under a file lock; ``apply(entry)`` changes it in place.
+        """
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with _locked(self.path):
+            state = self._read()
+            entry = state.setdefault(self.target, {})
+            apply(entry)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(state, f, indent=2)
+            os.replace(tmp_path, self.path)
+
+
+class SweepPlan:
+    """
+    Which users one run checks: every user (``users`` is None) or an explicit list, and the state to record once
+    the run has checked them.
+    """
+
+    def __init__(self, mode, reason, version, users=None, runs_since_full=0, last_full_sweep=None, dropped=()):
+        self.mode = mode
+        self.reason = reason
+        self.version = version
+        self.users = users
+        self.runs_since_full = runs_since_full
+        self.last_full_sweep = last_full_sweep
+        self.dropped = list(dropped)
+
+    def to_dict(self):
+        return dict(vars(self))
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+
+class IncrementalSweep:
+    """
+    Plans user-access sweeps from SQL Server change tracking, so a typical run costs what the churn costs.
+
+    An incremental run checks the users whose User_Master/User_Access rows changed since the last synced version,
+    the users that failed last time, and a random sample as a safety net, stratified by the User_Access
+    ``stratum_column`` when one is configured. A full sweep runs instead when there is no usable version (first
+    run, change tracking off or not keyed by UserID, or changes already purged by retention) and periodically,
+    every ``full_sweep_every`` runs or ``full_sweep_interval`` seconds.
+
+    The current version is read before the changes, so a change made while the run is in progress is picked up
+    (again) by the next run rather than missed. Pending users who no longer exist (deleted from User_Master or
+    left without User_Access rows) are dropped instead of failing every run with a 404.
+    """
+
+    def __init__(self, db_manager, state, full_sweep_every=24, full_sweep_interval=7 * 24 * 3600.0,
+                 sample_per_stratum=5, stratum_column=None):
+        self.db_manager = db_manager
+        self.state = state
+        self.full_sweep_every = full_sweep_every
+        self.full_sweep_interval = full_sweep_interval
+        self.sample_per_stratum = sample_per_stratum
+        self.stratum_column = stratum_column
+        self.plan = None
+
+    @classmethod
+    def from_settings(cls, section, db_manager):
+        """
+        Build a sweep from the [incremental] section, with state kept per ``server/database``.
+        """
+        state = SyncState(section.get("state_path", fallback="logs/sync_state.json"),
+                          f"{db_manager.server}/{db_manager.database}")
+        return cls(
+            db_manager,
+            state,
+            full_sweep_every=section.getint("full_sweep_every", fallback=24),
+            full_sweep_interval=section.getfloat("full_sweep_interval_hours", fallback=168.0) * 3600,
+            sample_per_stratum=section.getint("sample_per_stratum", fallback=5),
+            stratum_column=section.get("stratum_column", fallback="") or None,
+        )
+
+    def _full_sweep_reason(self, entry, versions, now):
+        if versions is None:
+            return "change tracking is not available"
+        unkeyed = [f"MAP.{table}" for table in ("User_Master", "User_Access")
+                   if "userid" not in {column.lower() for column in self.db_manager.primary_key_columns(table)}]
+        if unkeyed:
+            # CHANGETABLE only returns primary key columns, so the changed rows could not be traced to users
+            return f"UserID is not part of the primary key of {', '.join(unkeyed)}"
+        if entry.get("version") is None:
+            return "no synced change version yet"
+        if entry["version"] < versions[1]:
+            return f"synced version {entry['version']} is older than the minimum valid version {versions[1]}"
+        if self.full_sweep_every and entry.get("runs_since_full", 0) + 1 >= self.full_sweep_every:
+            return f"periodic full sweep (every {self.full_sweep_every} runs)"
+        if self.full_sweep_interval and now - (entry.get("last_full_sweep") or 0) >= self.full_sweep_interval:
+            return f"periodic full sweep (every {self.full_sweep_interval / 3600:g} hours)"
+        return None
+
+    def make_plan(self):
+        entry = self.state.load()
+        now = time.time()
+        try:
+            versions = self.db_manager.change_tracking_versions()
+        except Exception as e:
+            logger.warning(f"Could not read change tracking versions: {e}")
+            versions = None
+        version = versions[0] if versions else None
+
+        reason = self._full_sweep_reason(entry, versions, now)
+        if reason is not None:
+            logger.info(f"Full user sweep: {reason}")
+            return SweepPlan("full", reason, version, runs_since_full=0, last_full_sweep=now)
+
+        changed = self.db_manager.changed_user_emails(entry["version"])
+        pending = entry.get("pending", [])
+        dropped = []
+        if pending:
+            existing = {user.lower() for user in self.db_manager.existing_user_emails(pending)}
+            dropped = [user for user in pending if user.lower() not in existing]
+            pending = [user for user in pending if user.lower() in existing]
+            if dropped:
+                logger.info(f"Dropped {len(dropped)} pending users that no longer exist: {dropped[:5]}")
+        sampled = []
+        if self.sample_per_stratum:
+            sampled = self.db_manager.sample_user_emails(self.sample_per_stratum, self._stratum_column())
+        users = list(dict.fromkeys(changed + pending + sampled))
+        reason = (f"{len(changed)} changed since version {entry['version']}, {len(pending)} pending, "
+                  f"{len(sampled)} sampled")
+        logger.info(f"Incremental user sweep of {len(users)} users: {reason}")
+        return SweepPlan("incremental", reason, version, users, runs_since_full=entry.get("runs_since_full", 0) + 1,
+                         last_full_sweep=entry.get("last_full_sweep"), dropped=dropped)
+
+    def _stratum_column(self):
+        """
+        The configured stratum column as spelled in MAP.User_Access, or None for an unstratified sample.
+        """
+        if not self.stratum_column:
+            return None
+        columns = {column.lower(): column for column in self.db_manager.table_columns("User_Access")}
+        column = columns.get(self.stratum_column.lower())
+        if column is None:
+            logger.warning(f"stratum_column '{self.stratum_column}' is not a column of MAP.User_Access; sampling "
+                           f"{self.sample_per_stratum} random users without stratification instead")
+        return column
+
+    def commit(self, outcomes):
+        """
+        Record the planned version once the sweep has run. ``outcomes`` yields ``(user, ok)``; failed users are kept
+        as pending and re-checked by the next run until they pass.
+
+        Each shard of a parallel run commits its own outcomes. All shards share one plan, so they write the same
+        version. A full sweep also drops pending users from earlier runs that it did not see fail again.
+        """
+        plan = self.plan
+
+        def apply(entry):
+            # A full sweep re-checks everyone, so its first committing shard starts the pending list afresh
+            fresh = plan.mode == "full" and entry.get("last_full_sweep") != plan.last_full_sweep
+            pending = set() if fresh else set(entry.get("pending", [])) - set(plan.dropped)
+            for user, ok in outcomes:
+                if ok:
+                    pending.discard(user)
+                else:
+                    pending.add(user)
+            entry["pending"] = sorted(pending)
+            if plan.version is not None:
+                entry["version"] = plan.version
+            entry["runs_since_full"] = plan.runs_since_full
+            entry["last_full_sweep"] = plan.last_full_sweep
+            entry["last_mode"] = plan.mode
+            entry["updated"] = time.time()
+
+        self.state.update(apply)
+
+    def add_pending(self, users):
+        """
+        Queue ``users`` for the next run, e.g. those whose access did not match the database.
+        """
+        users = list(users)
+        if users:
+            self.state.update(lambda entry: entry.update(pending=sorted(set(entry.get("pending", [])) | set(users))))
@@ -3,23 +3,25 @@ import logging
 import json
 import pyodbc
 import configparser
-from azure.identity import DefaultAzureCredential
-from azure.keyvault.secrets import SecretClient
+from utilities.config import load_config
+from utilities.db_helper import iter_unique_column
+from utilities.db_pool import ConnectionPool, pool_settings
+from utilities.secret_provider import SecretProvider
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class DatabaseManager:
-    def __init__(self, vault_url=None, secret_name=None):
+    def __init__(self, vault_url=None, secret_name=None, secret_client=None):
         """
         Initialize the DatabaseManager with optional Azure Key Vault details.
         """
         self.vault_url = vault_url
         self.secret_name = secret_name
+        self.secret_client = secret_client
         self.credentials = None
-        self.connection = None
-        self.cursor = None
+        self.pool = None
 
     def load_db_config(self):
         """
@@ -49,8 +51,7 @@ class DatabaseManager:
             f'Authentication=ActiveDirectoryPassword;'
         )
         try:
-            self.connection = pyodbc.connect(connection_string)
-            self.cursor = self.connection.cursor()
+            self.create_pool(connection_string)
             logger.info("Local database connection established.")
         except Exception as e:
             logger.error(f"Error connecting to the database: {e}", exc_info=True)
@@ -61,18 +62,15 @@ class DatabaseManager:
         Fetch database credentials from Azure Key Vault.
         """
         try:
-            logger.info("Initializing Azure Key Vault client...")
-            credential = DefaultAzureCredential()
-            client = SecretClient(vault_url=self.vault_url, credential=credential)
-            
             logger.info(f"Fetching secret: {self.secret_name}...")
-            secret = client.get_secret(self.secret_name)
+            secrets = SecretProvider.from_config(self.vault_url, client=self.secret_client)
+            value = secrets.get_secret(self.secret_name)
             
-            if not secret.value:
+            if not value:
                 raise ValueError(f"Secret '{self.secret_name}' has no value!")
             
             logger.info(f"Successfully retrieved secret: {self.secret_name}")
-            self.credentials = json.loads(secret.value)
+            self.credentials = json.loads(value)
         except Exception as e:
             logger.error(f"Error retrieving secret '{self.secret_name}': {e}", exc_info=True)
             raise
@@ -130,21 +128,31 @@ class DatabaseManager:
         """
         try:
             logger.info("Connecting to the database...")
-            self.connection = pyodbc.connect(connection_string)
-            self.cursor = self.connection.cursor()
+            self.create_pool(connection_string)
             logger.info("Database connection established.")
         except Exception as e:
             logger.error(f"Error connecting to the database: {e}", exc_info=True)
             raise
 
+    def create_pool(self, connection_string):
+        """
+        Create the connection pool that all queries lease their connections from.
+        """
+        settings = pool_settings(load_config()['database'])
+        self.pool = ConnectionPool(lambda: pyodbc.connect(connection_string), **settings)
+
+    def cursor(self):
+        """
+        Lease a pooled connection and return a cursor context manager that is private to the caller.
+        """
+        return self.pool.cursor()
+
     def close(self):
         """
-        Close the database connection and cursor.
+        Close the connection pool.
         """
-        if self.cursor:
-            self.cursor.close()
-        if self.connection:
-            self.connection.close()
+        if self.pool:
+            self.pool.close()
         logger.info("Database connection closed.")
 
     def fetch_user_emails(self):
@@ -152,11 +160,12 @@ class DatabaseManager:
         Fetch user emails from the database.
         """
         try:
-            self.cursor.execute(
-                "SELECT UM.UserEmail FROM MAP.User_Master UM "
-                "JOIN MAP.User_Access UA ON UM.UserID = UA.UserID;"
-            )
-            rows = self.cursor.fetchall()
+            with self.cursor() as cursor:
+                cursor.execute(
+                    "SELECT UM.UserEmail FROM MAP.User_Master UM "
+                    "JOIN MAP.User_Access UA ON UM.UserID = UA.UserID;"
+                )
+                rows = cursor.fetchall()
             if not rows:
                 raise ValueError("No user emails found.")
             return [row[0] for row in rows]
@@ -164,13 +173,34 @@ class DatabaseManager:
             logger.error(f"Error fetching user emails: {e}", exc_info=True)
             raise
 
+    def iter_user_emails(self, batch_size=None):
+        """
+        Stream distinct user emails from the database in batches.
+        """
+        try:
+            found = False
+            with self.cursor() as cursor:
+                cursor.execute(
+                    "SELECT UM.UserEmail FROM MAP.User_Master UM "
+                    "JOIN MAP.User_Access UA ON UM.UserID = UA.UserID;"
+                )
+                for batch in iter_unique_column(cursor, batch_size):
+                    found = True
+                    yield batch
+            if not found:
+                raise ValueError("No user emails found.")
+        except Exception as e:
+            logger.error(f"Error fetching user emails: {e}", exc_info=True)
+            raise
+
     def fetch_field_name(self):
         """
         Fetch field name from the database.
         """
         try:
-            self.cursor.execute("SELECT Field_Name FROM MAP.Field_Master")
-            result = self.cursor.fetchone()
+            with self.cursor() as cursor:
+                cursor.execute("SELECT Field_Name FROM MAP.Field_Master")
+                result = cursor.fetchone()
             if result is None:
                 raise ValueError("No field name found.")
             return result[0]
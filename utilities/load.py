@@ -0,0 +1,242 @@
+"""
+Load-generation mode for the MAP API endpoints.
+
+Drives GetUserAccessInfo and/or GetFieldData at a target request rate (open loop) or a fixed concurrency
+(closed loop) from one worker process per core, using real parameters read through DatabaseManager.
+Each worker records latencies into mergeable LatencyHistograms; the parent merges them and reports
+throughput, error rate and p50/p95/p99/p99.9 per endpoint.
+
+    python -m utilities.load --endpoint user-access --endpoint field-data --rps 200 --duration 60
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+from collections import Counter
+from itertools import islice
+
+from utilities.api_client import AsyncAPIClient, client_settings
+from utilities.config import load_config
+from utilities.histogram import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+ENDPOINTS = {
+    "user-access": ("/api/Access/GetUserAccessInfo", "UserEmail"),
+    "field-data": ("/api/FieldData/GetFieldData", "FieldName"),
+}
+
+
+class EndpointStats:
+    __slots__ = ("histogram", "requests", "errors", "statuses")
+
+    def __init__(self):
+        self.histogram = LatencyHistogram()
+        self.requests = 0
+        self.errors = 0
+        self.statuses = Counter()
+
+    def merge(self, other):
+        self.histogram.merge(other.histogram)
+        self.requests += other.requests
+        self.errors += other.errors
+        self.statuses.update(other.statuses)
+        return self
+
+
+def load_parameters(db_manager, endpoint_names, max_params):
+    """
+    Read up to ``max_params`` real parameter values per endpoint from the database.
+    """
+    values = {}
+    if "user-access" in endpoint_names:
+        batches = db_manager.iter_user_emails()
+        values["user-access"] = list(islice((email for batch in batches for email in batch), max_params))
+        batches.close()
+    if "field-data" in endpoint_names:
+        values["field-data"] = db_manager.sample_field_names(max_params)
+    return values
+
+
+def check_targets(targets):
+    """
+    Reject a load run without targets, or with a target that has no parameter values to cycle through.
+    """
+    if not targets:
+        raise ValueError("No endpoints to drive; choose at least one of " + ", ".join(ENDPOINTS) + ".")
+    empty = [name for name, (_, key, values) in targets.items() if not values]
+    if empty:
+        raise ValueError(f"No parameter values for {', '.join(empty)}; the database returned none, or pass them in "
+                         f"through 'parameters'.")
+
+
+async def drive(client, base_url, targets, rps, concurrency, duration):
+    """
+    Issue requests round-robin across ``targets`` until ``duration`` elapses.
+
+    With ``rps`` set, requests are scheduled at fixed intervals and latency is measured from the intended start
+    time, so a stalled backend shows up as queueing delay instead of silently lowering the offered load.
+    """
+    check_targets(targets)
+    if concurrency < 1:
+        raise ValueError(f"Concurrency must be at least 1, got {concurrency}.")
+    stats = {name: EndpointStats() for name in targets}
+    names = list(targets)
+    semaphore = asyncio.Semaphore(concurrency)
+    loop = asyncio.get_running_loop()
+    pending = set()
+
+    async def send(name, params, intended):
+        endpoint, _, _ = targets[name]
+        try:
+            response = await client.get(f"{base_url}{endpoint}", params=params)
+            status = response.status_code
+        except Exception as e:
+            status = type(e).__name__
+        finally:
+            semaphore.release()
+        entry = stats[name]
+        entry.histogram.record(loop.time() - intended)
+        entry.requests += 1
+        entry.statuses[str(status)] += 1
+        if not isinstance(status, int) or status >= 400:
+            entry.errors += 1
+
+    start = loop.time()
+    sent = 0
+    while loop.time() - start < duration:
+        intended = start + sent / rps if rps else loop.time()
+        delay = intended - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await semaphore.acquire()
+        if not rps:
+            intended = loop.time()
+        name = names[sent % len(names)]
+        _, key, values = targets[name]
+        params = {key: values[(sent // len(names)) % len(values)]}
+        task = asyncio.create_task(send(name, params, intended))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+        sent += 1
+
+    if pending:
+        await asyncio.gather(*pending)
+    return stats, loop.time() - start
+
+
+def run_worker(job):
+    async def run():
+        client = AsyncAPIClient(job["base_url"], **job["client_settings"])
+        # The load loop talks to the raw httpx client: per-request logging and raise_for_status would dominate
+        try:
+            return await drive(client.client, job["base_url"], job["targets"], job["rps"], job["concurrency"],
+                               job["duration"])
+        finally:
+            await client.client.aclose()
+
+    return asyncio.run(run())
+
+
+def build_report(results):
+    merged = {}
+    elapsed = max(worker_elapsed for _, worker_elapsed in results) if results else 0.0
+    for stats, _ in results:
+        for name, entry in stats.items():
+            merged.setdefault(name, EndpointStats()).merge(entry)
+
+    report = {"elapsed_s": elapsed, "endpoints": {}}
+    for name, entry in merged.items():
+        report["endpoints"][ENDPOINTS[name][0]] = {
+            "requests": entry.requests,
+            "throughput_rps": entry.requests / elapsed if elapsed else 0.0,
+            "error_rate": entry.errors / entry.requests if entry.requests else 0.0,
+            "statuses": dict(entry.statuses),
+            "latency": entry.histogram.summary(),
+            "histogram": entry.histogram.to_dict(),
+        }
+    return report
+
+
+def format_report(report):
+    lines = [f"Load run finished in {report['elapsed_s']:.1f}s"]
+    lines.append(f"{'endpoint':40} {'req':>8} {'rps':>8} {'err%':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'p99.9':>8}")
+    for endpoint, data in report["endpoints"].items():
+        latency = data["latency"]
+        lines.append(
+            f"{endpoint:40} {data['requests']:>8} {data['throughput_rps']:>8.1f} {data['error_rate'] * 100:>6.2f} "
+            + " ".join(f"{(latency[key] or 0):>8.1f}" for key in ("p50_ms", "p95_ms", "p99_ms", "p99_9_ms"))
+        )
+    return "\n".join(lines)
+
+
+def run_load(config, endpoint_names, rps=None, concurrency=64, duration=60.0, processes=None, max_params=10000,
+             parameters=None):
+    """
+    Run a load test and return the aggregated report. ``parameters`` overrides the database lookup.
+    """
+    processes = processes or os.cpu_count() or 1
+    if parameters is None:
+        from utilities.db_manager import create_database_manager
+        db_manager = create_database_manager(config)
+        db_manager.connect()
+        try:
+            parameters = load_parameters(db_manager, endpoint_names, max_params)
+        finally:
+            db_manager.close()
+
+    # Checked here as well, so a bad run fails before any worker process starts
+    check_targets({name: (*ENDPOINTS[name], parameters.get(name)) for name in endpoint_names})
+    jobs = []
+    for index in range(processes):
+        targets = {}
+        for name in endpoint_names:
+            endpoint, key = ENDPOINTS[name]
+            # Give each worker its own slice of the parameters, falling back to all of them when there are few
+            values = parameters[name][index::processes] or parameters[name]
+            targets[name] = (endpoint, key, values)
+        jobs.append({
+            "base_url": config['api']['base_url'],
+            "client_settings": client_settings(config['api']),
+            "targets": targets,
+            "rps": rps / processes if rps else None,
+            "concurrency": max(1, concurrency // processes),
+            "duration": duration,
+        })
+
+    logger.info(f"Starting load run: {processes} process(es), rps={rps}, concurrency={concurrency}, "
+                f"duration={duration}s, endpoints={endpoint_names}")
+    with multiprocessing.Pool(processes) as pool:
+        results = pool.map(run_worker, jobs)
+    return build_report(results)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate load against the MAP API endpoints.")
+    parser.add_argument("--endpoint", action="append", choices=sorted(ENDPOINTS),
+                        help="Endpoint to drive (repeatable, default: all)")
+    parser.add_argument("--rps", type=float, default=None, help="Target requests per second across all workers")
+    parser.add_argument("--concurrency", type=int, default=64, help="Maximum requests in flight across all workers")
+    parser.add_argument("--duration", type=float, default=60.0, help="Run time in seconds")
+    parser.add_argument("--processes", type=int, default=None, help="Worker processes (default: one per core)")
+    parser.add_argument("--max-params", type=int, default=10000, help="Parameter values read per endpoint")
+    parser.add_argument("--output", default="logs/load_report.json", help="Where to write the JSON report")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        report = run_load(load_config(), args.endpoint or sorted(ENDPOINTS), rps=args.rps,
+                          concurrency=args.concurrency, duration=args.duration, processes=args.processes,
+                          max_params=args.max_params)
+    except ValueError as e:
+        parser.error(str(e))
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(format_report(report))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,144 @@
+import atexit
+import copy
+import itertools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+
+from utilities.config import load_config
+
+# Attributes every LogRecord has; anything else on a record came in through ``extra=``
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_lock = threading.Lock()
+_listener = None
+_stopped = False
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line: timestamp, level, logger, message, plus any ``extra`` fields and the traceback.
+    """
+
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and key != "sample":
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class StructuredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Like QueueHandler, but keeps the traceback separate from the message so it ends up in its own JSON field.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _TRACEBACK_FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_TRACEBACK_FORMATTER = logging.Formatter()
+
+# Loggers whose records below WARNING are written; third-party INFO chatter (httpx, urllib3, azure) is not
+PROJECT_LOGGERS = ("APIClient", "DatabaseManager", "api_test_logger", "utilities")
+
+
+class ProjectFilter(logging.Filter):
+    """
+    Passes warnings and errors from any logger, and lower levels only from PROJECT_LOGGERS and their children.
+    pytest's log capture lowers the root level to ``log_level``, so the level alone cannot keep the rest out.
+    """
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or record.name.partition(".")[0] in PROJECT_LOGGERS
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps one in every ``1 / rate`` records logged with ``extra={"sample": True}`` below WARNING; everything
+    else passes. Dropped records are never formatted.
+    """
+
+    def __init__(self, rate=1.0):
+        super().__init__()
+        self.every = max(1, round(1 / rate)) if rate > 0 else 0
+        self._counter = itertools.count()
+
+    def filter(self, record):
+        if not getattr(record, "sample", False) or record.levelno >= logging.WARNING:
+            return True
+        return self.every > 0 and next(self._counter) % self.every == 0
+
+
+def configure_logging(config=None):
+    """
+    Route every logger through one QueueHandler on the root logger; a QueueListener thread writes JSON lines to
+    ``[logging] file``, so request paths never wait on disk I/O.
+
+    Idempotent: later calls (from APIClient, DatabaseManager or conftest) reuse the running listener instead of
+    adding handlers again.
+    """
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return
+        config = config if config is not None else load_config()
+        section = config['logging'] if config.has_section('logging') else {}
+        level = getattr(logging, str(section.get('level', 'INFO')).upper(), logging.INFO)
+        path = section.get('file', 'logs/mapapi.jsonl')
+        rate = float(section.get('request_sample_rate', 1.0))
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        file_handler = logging.FileHandler(path)
+        file_handler.setFormatter(JsonFormatter())
+        records = queue.SimpleQueue()
+        _listener = logging.handlers.QueueListener(records, file_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop_logging)
+
+        # The root logger keeps its WARNING default; only the project loggers are opened up to ``level``
+        handler = StructuredQueueHandler(records)
+        handler.addFilter(ProjectFilter())
+        logging.getLogger().addHandler(handler)
+        sampler = SamplingFilter(rate)
+        for name in PROJECT_LOGGERS:
+            named = logging.getLogger(name)
+            named.setLevel(level)
+            if name != "utilities":
+                named.addFilter(sampler)
+        # httpx logs every request at INFO; per-request lines come from APIClient (sampled) instead
+        logging.getLogger("httpx").setLevel(max(level, logging.WARNING))
+
+
+def stop_logging():
+    """
+    Flush queued records and stop the listener thread.
+    """
+    global _stopped
+    with _lock:
+        if _listener is not None and not _stopped:
+            _listener.stop()
+            _stopped = True
+
+
+def get_logger(name, config=None):
+    configure_logging(config)
+    return logging.getLogger(name)
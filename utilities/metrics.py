@@ -0,0 +1,267 @@
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+from collections import Counter
+
+import httpx
+
+from utilities.histogram import LatencyHistogram
+
+PHASES = ("connect_ms", "tls_ms", "ttfb_ms", "total_ms")
+COUNTERS = ("requests", "errors", "retries", "throttled", "rejected", "request_bytes", "response_bytes",
+            "decoded_bytes")
+
+
+class RequestTimer:
+    """
+    Collects httpcore trace events for one request; pass ``trace``/``atrace`` as the httpx ``trace`` extension.
+
+    httpcore resolves DNS inside ``connect_tcp``, so ``connect_ms`` covers DNS lookup plus the TCP handshake.
+    Connect and TLS times are only present for requests that opened a new connection.
+    """
+    __slots__ = ("start", "marks")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.marks = {}
+
+    def trace(self, event, info):
+        self.marks[event] = time.perf_counter()
+
+    async def atrace(self, event, info):
+        self.marks[event] = time.perf_counter()
+
+    def _span(self, name):
+        started = self.marks.get(f"{name}.started")
+        complete = self.marks.get(f"{name}.complete")
+        if started is None or complete is None:
+            return None
+        return (complete - started) * 1000
+
+    def timings(self):
+        end = time.perf_counter()
+        first_byte = (self.marks.get("http11.receive_response_headers.complete")
+                      or self.marks.get("http2.receive_response_headers.complete"))
+        return {
+            "connect_ms": self._span("connection.connect_tcp"),
+            "tls_ms": self._span("connection.start_tls"),
+            "ttfb_ms": (first_byte - self.start) * 1000 if first_byte else None,
+            "total_ms": (end - self.start) * 1000,
+        }
+
+
+def decoded_size(response):
+    """
+    Body size after content decoding, or 0 for a streamed response whose body was not kept.
+    """
+    try:
+        return len(response.content)
+    except httpx.ResponseNotRead:
+        return 0
+
+
+def request_size(request):
+    """
+    Approximate bytes on the wire for a request: request line, headers and body.
+    """
+    headers = sum(len(name) + len(value) + 4 for name, value in request.headers.raw)
+    return len(request.method) + len(request.url.raw_path) + headers + len(request.content)
+
+
+class EndpointMetrics:
+    def __init__(self, slowest):
+        self.slowest_size = slowest
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.throttled = 0
+        self.rejected = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.decoded_bytes = 0
+        self.statuses = Counter()
+        self.histograms = {phase: LatencyHistogram() for phase in PHASES}
+        self.slowest = []
+
+    def to_dict(self):
+        """
+        Plain-data form of everything recorded, for handing from an xdist worker to the controller.
+        """
+        return {
+            **{name: getattr(self, name) for name in COUNTERS},
+            "statuses": dict(self.statuses),
+            "histograms": {phase: histogram.to_dict() for phase, histogram in self.histograms.items()},
+            "slowest": [entry for _, _, entry in self.slowest],
+        }
+
+    def summary(self):
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "rejected": self.rejected,
+            "request_bytes": self.request_bytes,
+            "response_bytes": self.response_bytes,
+            "decoded_bytes": self.decoded_bytes,
+            "statuses": dict(self.statuses),
+            "latency": {phase: histogram.summary() for phase, histogram in self.histograms.items() if histogram.count},
+            "slowest": [record for _, _, record in sorted(self.slowest, reverse=True)],
+        }
+
+
+class LatencyWindow:
+    """
+    Total latencies of only the requests recorded while the window was open, per endpoint.
+    """
+    __slots__ = ("histograms",)
+
+    def __init__(self):
+        self.histograms = {}
+
+    def record(self, endpoint, seconds):
+        histogram = self.histograms.get(endpoint)
+        if histogram is None:
+            histogram = self.histograms[endpoint] = LatencyHistogram()
+        histogram.record(seconds)
+
+    def histogram(self, endpoint):
+        return self.histograms.get(endpoint) or LatencyHistogram()
+
+
+class MetricsRegistry:
+    """
+    In-memory, thread-safe store of per-request timings, aggregated per endpoint.
+
+    Keeps latency histograms for every phase plus the ``slowest`` individual requests (with their parameters) per
+    endpoint, so slow endpoints and slow users can be identified after the run.
+    """
+
+    def __init__(self, slowest=20):
+        self.slowest = slowest
+        self.endpoints = {}
+        self.windows = []
+        self._lock = threading.Lock()
+        self._sequence = itertools.count()
+
+    def _endpoint(self, endpoint):
+        metrics = self.endpoints.get(endpoint)
+        if metrics is None:
+            metrics = self.endpoints[endpoint] = EndpointMetrics(self.slowest)
+        return metrics
+
+    def record(self, endpoint, params, timer, response=None, retries=0, error=None, throttled=0):
+        """
+        Record one logical request; ``retries`` and ``throttled`` count the extra attempts and the 429/503
+        responses that preceded the final ``response`` or ``error``.
+        """
+        timings = timer.timings()
+        status = response.status_code if response is not None else None
+        request_bytes = request_size(response.request) if response is not None else 0
+        response_bytes = response.num_bytes_downloaded if response is not None else 0
+        decoded_bytes = decoded_size(response) if response is not None else 0
+        entry = {
+            "endpoint": endpoint,
+            "params": params,
+            "status": status,
+            "error": type(error).__name__ if error is not None else None,
+            "retries": retries,
+            "throttled": throttled,
+            "request_bytes": request_bytes,
+            "response_bytes": response_bytes,
+            "decoded_bytes": decoded_bytes,
+            **timings,
+        }
+        with self._lock:
+            metrics = self._endpoint(endpoint)
+            metrics.requests += 1
+            metrics.retries += retries
+            metrics.throttled += throttled
+            metrics.request_bytes += request_bytes
+            metrics.response_bytes += response_bytes
+            metrics.decoded_bytes += decoded_bytes
+            metrics.statuses[str(status or entry["error"])] += 1
+            if status is None or status >= 400:
+                metrics.errors += 1
+            for phase in PHASES:
+                if timings[phase] is not None:
+                    metrics.histograms[phase].record(timings[phase] / 1000)
+            for window in self.windows:
+                window.record(endpoint, timings["total_ms"] / 1000)
+            item = (timings["total_ms"], next(self._sequence), entry)
+            if len(metrics.slowest) < metrics.slowest_size:
+                heapq.heappush(metrics.slowest, item)
+            else:
+                heapq.heappushpop(metrics.slowest, item)
+        return entry
+
+    def record_rejection(self, endpoint):
+        """
+        Count a request refused locally by an open circuit breaker (it never reached the network).
+        """
+        with self._lock:
+            self._endpoint(endpoint).rejected += 1
+
+    def open_window(self):
+        """
+        Start a LatencyWindow that sees every request recorded until ``close_window``, e.g. one scenario's.
+        """
+        window = LatencyWindow()
+        with self._lock:
+            self.windows.append(window)
+        return window
+
+    def close_window(self, window):
+        with self._lock:
+            self.windows.remove(window)
+
+    def to_dict(self):
+        with self._lock:
+            return {endpoint: metrics.to_dict() for endpoint, metrics in self.endpoints.items()}
+
+    def merge(self, data):
+        """
+        Add the metrics of another registry's ``to_dict()``, e.g. one xdist worker's, to this one.
+        """
+        with self._lock:
+            for endpoint, other in data.items():
+                metrics = self._endpoint(endpoint)
+                for name in COUNTERS:
+                    setattr(metrics, name, getattr(metrics, name) + other[name])
+                metrics.statuses.update(other["statuses"])
+                for phase, histogram in other["histograms"].items():
+                    metrics.histograms[phase].merge(LatencyHistogram.from_dict(histogram))
+                for entry in other["slowest"]:
+                    item = (entry["total_ms"], next(self._sequence), entry)
+                    if len(metrics.slowest) < metrics.slowest_size:
+                        heapq.heappush(metrics.slowest, item)
+                    else:
+                        heapq.heappushpop(metrics.slowest, item)
+
+    def histogram(self, endpoint, phase="total_ms"):
+        """
+        Latency histogram recorded so far for ``endpoint`` (empty if it was never called).
+        """
+        with self._lock:
+            metrics = self.endpoints.get(endpoint)
+            return LatencyHistogram().merge(metrics.histograms[phase]) if metrics else LatencyHistogram()
+
+    def summary(self):
+        with self._lock:
+            return {endpoint: metrics.summary() for endpoint, metrics in self.endpoints.items()}
+
+    def export_json(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=2, default=str)
+
+    def reset(self):
+        with self._lock:
+            self.endpoints.clear()
+
+
+# Default registry shared by every APIClient in the process
+registry = MetricsRegistry()
@@ -2,25 +2,28 @@ import os
 import logging
 import json
 import pyodbc
-from azure.identity import DefaultAzureCredential
-from azure.keyvault.secrets import SecretClient
+import configparser
+from utilities.db_helper import iter_unique_column
+from utilities.db_pool import ConnectionPool, pool_settings
+from utilities.secret_provider import SecretProvider
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class DatabaseManager:
-    def __init__(self, vault_url, secret_name):
+    def __init__(self, vault_url, secret_name, secret_client=None):
         """
         Initialize the AzureDatabaseConnector with Key Vault details.
         """
         if not vault_url or not secret_name:
             raise ValueError("Both vault_url and secret_name must be provided.")
+        self.logger = logger
         self.load_db_config()
-        self.connection = None
-        self.cursor = None
+        self.pool = None
         self.vault_url = vault_url
         self.secret_name = secret_name
+        self.secret_client = secret_client
         self.credentials = None
 
     def load_db_config(self):
@@ -30,13 +33,13 @@ class DatabaseManager:
         self.database = config['database']['database']
         self.username = config['database']['username']
         self.password = config['database']['password']
+        self.pool_settings = pool_settings(config['database'])
 
     def local_connect(self):
-          connection_string = (f'DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={self.server};DATABASE={self.database};'
+        connection_string = (f'DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={self.server};DATABASE={self.database};'
                              f'UID={self.username};PWD={self.password};Authentication=ActiveDirectoryPassword;')
         try:
-            self.connection = pyodbc.connect(connection_string)
-            self.cursor = self.connection.cursor()
+            self.pool = ConnectionPool(lambda: pyodbc.connect(connection_string), **self.pool_settings)
             self.logger.info('Database connection established.')
         except Exception as e:
             self.logger.error(f"Error connecting to the database: {e}", exc_info=True)
@@ -48,25 +51,22 @@ class DatabaseManager:
         if os.getenv('BUILD_ID') or os.getenv('SYSTEM_TEAMPROJECT'):
             logger.info("Running in Azure Pipeline")
             try:
-                logger.info("Initializing Azure Key Vault client...")
-                credential = DefaultAzureCredential()
-                client = SecretClient(vault_url=self.vault_url, credential=credential)
-                
                 logger.info(f"Fetching secret: {self.secret_name}...")
-                secret = client.get_secret(self.secret_name)
+                secrets = SecretProvider.from_config(self.vault_url, client=self.secret_client)
+                value = secrets.get_secret(self.secret_name)
                 
-                if not secret.value:
+                if not value:
                     raise ValueError(f"Secret '{self.secret_name}' has no value!")
                 
                 logger.info(f"Successfully retrieved secret: {self.secret_name}")
-                self.credentials = json.loads(secret.value)
+                self.credentials = json.loads(value)
             except Exception as e:
                 logger.error(f"Error retrieving secret '{self.secret_name}': {e}")
                 raise
         else:
             logger.info("Running locally")
             try:
-                local_connect()
+                self.local_connect()
             except Exception as e:
                 logger.error(f"Error connecting from local credentials: {e}")
                 raise
@@ -123,42 +123,61 @@ class DatabaseManager:
 
     def connect(self):
         """
-        Full process to fetch credentials, build connection string, and test the connection.
+        Full process to fetch credentials, build connection string, test the connection and open the pool.
         """
         self.fetch_credentials()
-        connection_string = self.build_connection_string()
-        self.test_connection(connection_string)
+        if self.pool is None:
+            connection_string = self.build_connection_string()
+            self.test_connection(connection_string)
+            self.pool = ConnectionPool(lambda: pyodbc.connect(connection_string), **self.pool_settings)
+
+    def cursor(self):
+        """
+        Lease a pooled connection and return a cursor context manager that is private to the caller.
+        """
+        return self.pool.cursor()
 
     def close(self):
-        if self.cursor:
-            self.cursor.close()
-        if self.connection:
-            self.connection.close()
+        if self.pool:
+            self.pool.close()
         self.logger.info('Database connection closed.')
 
     def fetch_user_emails(self):
         try:
-            self.cursor.execute("SELECT UM.UserEmail FROM MAP.User_Master UM JOIN MAP.User_Access UA ON UM.UserID = "
-                                "UA.UserID;")
-            rows = self.cursor.fetchall()
+            with self.cursor() as cursor:
+                cursor.execute("SELECT UM.UserEmail FROM MAP.User_Master UM JOIN MAP.User_Access UA ON UM.UserID = "
+                               "UA.UserID;")
+                rows = cursor.fetchall()
             if not rows:
                 raise ValueError("No user emails found.")
             return [row[0] for row in rows]
         except Exception as e:
             self.logger.error(f"Error fetching user emails: {e}", exc_info=True)
             raise
-        finally:
-            self.close()
+
+    def iter_user_emails(self, batch_size=None):
+        try:
+            found = False
+            with self.cursor() as cursor:
+                cursor.execute("SELECT UM.UserEmail FROM MAP.User_Master UM JOIN MAP.User_Access UA ON UM.UserID = "
+                               "UA.UserID;")
+                for batch in iter_unique_column(cursor, batch_size):
+                    found = True
+                    yield batch
+            if not found:
+                raise ValueError("No user emails found.")
+        except Exception as e:
+            self.logger.error(f"Error fetching user emails: {e}", exc_info=True)
+            raise
 
     def fetch_field_name(self):
         try:
-            self.cursor.execute("SELECT Field_Name FROM MAP.Field_Master")
-            result = self.cursor.fetchone()
+            with self.cursor() as cursor:
+                cursor.execute("SELECT Field_Name FROM MAP.Field_Master")
+                result = cursor.fetchone()
             if result is None:
                 raise ValueError("No field name found.")
             return result[0]
         except Exception as e:
             self.logger.error(f"Error fetching field name: {e}", exc_info=True)
             raise
-        finally:
-            self.close()
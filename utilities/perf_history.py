@@ -0,0 +1,136 @@
+import json
+import math
+import os
+import sqlite3
+import subprocess
+import time
+
+from utilities.histogram import LatencyHistogram
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    recorded_at REAL NOT NULL,
+    endpoint TEXT NOT NULL,
+    environment TEXT NOT NULL,
+    commit_id TEXT NOT NULL,
+    workers INTEGER NOT NULL DEFAULT 1,
+    count INTEGER NOT NULL,
+    p50_ms REAL,
+    p95_ms REAL,
+    p99_ms REAL,
+    histogram TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_by_series ON runs (endpoint, environment, recorded_at);
+"""
+# Histories written before runs were keyed by worker count
+MIGRATIONS = ("ALTER TABLE runs ADD COLUMN workers INTEGER NOT NULL DEFAULT 1",)
+
+
+def current_commit():
+    """
+    Commit under test: the Azure Pipelines build commit if set, else ``git rev-parse HEAD``.
+    """
+    commit = os.getenv("BUILD_SOURCEVERSION")
+    if commit:
+        return commit
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def mann_whitney(current, baseline):
+    """
+    One-sided Mann-Whitney U test on two LatencyHistograms, treating each bucket as a tie group.
+
+    Returns ``(z, p)`` where a small ``p`` means ``current`` latencies are stochastically larger than ``baseline``.
+    """
+    n1, n2 = current.count, baseline.count
+    if not n1 or not n2:
+        return 0.0, 1.0
+    total = n1 + n2
+    rank_sum = 0.0
+    ties = 0
+    seen = 0
+    for index in sorted(set(current.counts) | set(baseline.counts)):
+        a = current.counts.get(index, 0)
+        group = a + baseline.counts.get(index, 0)
+        rank_sum += a * (seen + (group + 1) / 2)
+        ties += group ** 3 - group
+        seen += group
+    u = rank_sum - n1 * (n1 + 1) / 2
+    variance = n1 * n2 / 12 * ((total + 1) - ties / (total * (total - 1)))
+    if variance <= 0:
+        return 0.0, 1.0
+    z = (u - n1 * n2 / 2) / math.sqrt(variance)
+    return z, 0.5 * math.erfc(z / math.sqrt(2))
+
+
+class PerfHistory:
+    """
+    Local SQLite store of per-endpoint latency histograms, keyed by endpoint, environment, worker count and commit.
+
+    Runs with a different number of parallel workers put a different load on the API, so they form separate
+    baselines.
+    """
+
+    def __init__(self, path="logs/perf_history.sqlite"):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+        columns = {row[1] for row in self.connection.execute("PRAGMA table_info(runs)")}
+        if "workers" not in columns:
+            with self.connection:
+                for statement in MIGRATIONS:
+                    self.connection.execute(statement)
+
+    def record(self, endpoint, environment, commit_id, histogram, workers=1):
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO runs (recorded_at, endpoint, environment, commit_id, workers, count, p50_ms, p95_ms, "
+                "p99_ms, histogram) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (time.time(), endpoint, environment, commit_id, workers, histogram.count, histogram.percentile(50),
+                 histogram.percentile(95), histogram.percentile(99), json.dumps(histogram.to_dict())),
+            )
+
+    def baseline(self, endpoint, environment, runs=10, workers=1):
+        """
+        Merge the histograms of the last ``runs`` recorded runs for this endpoint, environment and worker count.
+
+        Returns ``(histogram, number_of_runs)``.
+        """
+        rows = self.connection.execute(
+            "SELECT histogram FROM runs WHERE endpoint = ? AND environment = ? AND workers = ? "
+            "ORDER BY recorded_at DESC LIMIT ?",
+            (endpoint, environment, workers, runs),
+        ).fetchall()
+        merged = LatencyHistogram()
+        for (data,) in rows:
+            merged.merge(LatencyHistogram.from_dict(json.loads(data)))
+        return merged, len(rows)
+
+    def close(self):
+        self.connection.close()
+
+
+def compare(current, baseline, margin=0.2, alpha=0.01):
+    """
+    Flag a regression when p95 grew by more than ``margin`` and the whole distribution shifted significantly.
+    """
+    current_p95 = current.percentile(95)
+    baseline_p95 = baseline.percentile(95)
+    z, p_value = mann_whitney(current, baseline)
+    regressed = (
+        current_p95 is not None and baseline_p95 is not None
+        and current_p95 > baseline_p95 * (1 + margin)
+        and p_value < alpha
+    )
+    return {
+        "current_p95_ms": current_p95,
+        "baseline_p95_ms": baseline_p95,
+        "z": z,
+        "p_value": p_value,
+        "regressed": regressed,
+    }
@@ -0,0 +1,92 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utilities.api_client import AsyncAPIClient
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+async def run_pipeline(client, endpoint, batches, to_params, workers=None, queue_size=None, on_result=None,
+                       observers=()):
+    """
+    Feed items from ``batches`` (an iterator of lists, e.g. DatabaseManager.iter_user_emails()) through a
+    bounded queue to a pool of HTTP workers.
+
+    The batch iterator is advanced on a dedicated thread, so the next database fetch overlaps with requests
+    already in flight, and a full queue holds the producer back when the API is slower than the database.
+    Returns ``(item, RequestResult)`` pairs in source order. With ``on_result``, each outcome is handed to
+    ``on_result(item, result, latency_ms)`` as it completes and nothing is kept, so memory does not grow with
+    the number of items. Each of ``observers`` is called with ``(item, result)`` as it completes, either way; an
+    exception raised by an observer is stored as that result's error instead of stopping the pipeline.
+    """
+    workers = workers or client.concurrency
+    queue = asyncio.Queue(maxsize=queue_size or workers * 2)
+    loop = asyncio.get_running_loop()
+    results = []
+
+    async def produce(executor):
+        source = iter(batches)
+        index = 0
+        try:
+            while True:
+                # Keep every cursor call on the same thread; pyodbc connections are not thread-safe
+                batch = await loop.run_in_executor(executor, next, source, None)
+                if batch is None:
+                    break
+                for item in batch:
+                    await queue.put((index, item))
+                    index += 1
+        finally:
+            for _ in range(workers):
+                await queue.put(_DONE)
+
+    async def consume():
+        while True:
+            entry = await queue.get()
+            if entry is _DONE:
+                return
+            index, item = entry
+            started = time.perf_counter()
+            result = await client.fetch(endpoint, to_params(item))
+            for observer in observers:
+                try:
+                    observer(item, result)
+                except Exception as e:
+                    # One item's observer failure must not cancel the other workers and lose their results
+                    logger.error("Observer %r failed for %r: %r", observer, item, e)
+                    if result.error is None:
+                        result.error = e
+            if on_result is not None:
+                on_result(item, result, (time.perf_counter() - started) * 1000)
+            else:
+                results.append((index, item, result))
+
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-producer") as executor:
+        await asyncio.gather(produce(executor), *(consume() for _ in range(workers)))
+
+    results.sort(key=lambda entry: entry[0])
+    return [(item, result) for _, item, result in results]
+
+
+def stream_requests(config, endpoint, batches, to_params, workers=None, store=None, observers=()):
+    """
+    Run ``run_pipeline`` to completion with a session-scoped AsyncAPIClient built from settings.ini.
+
+    When a ResultStore is given, results are added to it as they arrive and the store is returned. Each of
+    ``observers`` is called with ``(item, result)`` while the full response is still available.
+    """
+    queue_size = config['api'].getint('pipeline_queue_size', fallback=None)
+
+    on_result = store.add if store is not None else None
+
+    async def run():
+        async with AsyncAPIClient.from_config(config) as client:
+            return await run_pipeline(client, endpoint, batches, to_params, workers=workers, queue_size=queue_size,
+                                      on_result=on_result, observers=observers)
+
+    results = asyncio.run(run())
+    return store if store is not None else results
@@ -0,0 +1,199 @@
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+
+MAX_DEPTH = 128
+
+
+def frame_label(code):
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class StackSampler:
+    """
+    Wall-clock sampling profiler: every ``interval`` seconds a background thread records the Python stack of the
+    profiled thread and of any thread started while sampling (e.g. the pipeline's DB producer), so waiting on the
+    database or the network shows up as well as CPU work. Overhead is one stack walk per sample, independent of
+    how many calls the profiled code makes.
+
+    With ``root_code`` (the code object of the profiled function), the profiled thread's stacks start at that
+    function instead of at the test runner; samples taken outside it are dropped.
+    """
+
+    def __init__(self, interval=0.005, root_code=None):
+        self.interval = interval
+        self.root_code = root_code
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.target = threading.get_ident()
+        # Threads that already existed (logging listener, idle pools) are left out unless they are the target;
+        # _current_frames() also sees threads started with _thread (e.g. execnet's receiver under xdist)
+        self.baseline = set(sys._current_frames()) - {self.target}
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="step-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own or ident in self.baseline:
+                    continue
+                stack = []
+                rooted = ident != self.target or self.root_code is None
+                while frame is not None and len(stack) < MAX_DEPTH:
+                    stack.append(frame_label(frame.f_code))
+                    if not rooted and frame.f_code is self.root_code:
+                        rooted = True
+                        break
+                    frame = frame.f_back
+                if not rooted:
+                    continue
+                stack.append(names.get(ident, f"thread-{ident}"))
+                self.stacks[tuple(reversed(stack))] += 1
+            self.samples += 1
+
+
+class StepStats:
+    __slots__ = ("calls", "wall_ms", "cpu_ms", "max_wall_ms", "stacks", "samples", "stats")
+
+    def __init__(self):
+        self.calls = 0
+        self.wall_ms = 0.0
+        self.cpu_ms = 0.0
+        self.max_wall_ms = 0.0
+        self.stacks = Counter()
+        self.samples = 0
+        self.stats = None
+
+
+class StepProfiler:
+    """
+    Per-step wall/CPU time and profiles, aggregated over every call of a step function.
+
+    ``mode`` is ``sample`` (StackSampler; collapsed stacks for flame graphs) or ``cprofile`` (deterministic, exact
+    call counts, calling thread only; pstats files). CPU time is process CPU, so it includes worker threads.
+    """
+
+    def __init__(self, mode="sample", interval=0.005, top=10):
+        if mode not in ("sample", "cprofile"):
+            raise ValueError(f"Unknown profiling mode '{mode}', expected 'sample' or 'cprofile'.")
+        self.mode = mode
+        self.interval = interval
+        self.top = top
+        self.steps = {}
+        self._active = None
+
+    def begin(self, name, function=None):
+        """
+        Start timing and profiling one call of step ``name``; ``function`` (the step function) roots the sampled
+        stacks.
+        """
+        code = getattr(function, "__code__", None)
+        profiler = StackSampler(self.interval, code) if self.mode == "sample" else cProfile.Profile()
+        if self.mode == "sample":
+            profiler.start()
+        else:
+            profiler.enable()
+        self._active = (name, profiler, time.perf_counter(), time.process_time())
+
+    def end(self):
+        if self._active is None:
+            return
+        name, profiler, wall_start, cpu_start = self._active
+        self._active = None
+        wall_ms = (time.perf_counter() - wall_start) * 1000
+        cpu_ms = (time.process_time() - cpu_start) * 1000
+        stats = self.steps.get(name)
+        if stats is None:
+            stats = self.steps[name] = StepStats()
+        stats.calls += 1
+        stats.wall_ms += wall_ms
+        stats.cpu_ms += cpu_ms
+        stats.max_wall_ms = max(stats.max_wall_ms, wall_ms)
+        if self.mode == "sample":
+            stats.stacks.update(profiler.stop())
+            stats.samples += profiler.samples
+        else:
+            profiler.disable()
+            if stats.stats is None:
+                stats.stats = pstats.Stats(profiler, stream=io.StringIO())
+            else:
+                stats.stats.add(profiler)
+
+    def hotspots(self, stats):
+        """
+        Top functions of one step: by self samples (sample mode) or by internal time (cprofile mode).
+        """
+        if self.mode == "cprofile":
+            if stats.stats is None:
+                return []
+            rows = sorted(stats.stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:self.top]
+            return [{"frame": f"{os.path.basename(filename)}:{function}", "calls": calls,
+                     "self_ms": round(tottime * 1000, 3), "total_ms": round(cumtime * 1000, 3)}
+                    for (filename, _, function), (_, calls, tottime, cumtime, _) in rows]
+        total = sum(stats.stacks.values())
+        if not total:
+            return []
+        own = Counter()
+        inclusive = Counter()
+        for stack, count in stats.stacks.items():
+            own[stack[-1]] += count
+            for frame in set(stack[1:]):
+                inclusive[frame] += count
+        return [{"frame": frame, "self_pct": round(100 * count / total, 1),
+                 "total_pct": round(100 * inclusive[frame] / total, 1),
+                 "self_ms": round(count * self.interval * 1000, 1)}
+                for frame, count in own.most_common(self.top)]
+
+    def summary(self):
+        return {
+            name: {
+                "calls": stats.calls,
+                "wall_ms": round(stats.wall_ms, 3),
+                "mean_wall_ms": round(stats.wall_ms / stats.calls, 3),
+                "max_wall_ms": round(stats.max_wall_ms, 3),
+                "cpu_ms": round(stats.cpu_ms, 3),
+                "cpu_ratio": round(stats.cpu_ms / stats.wall_ms, 3) if stats.wall_ms else None,
+                "samples": stats.samples,
+                "hotspots": self.hotspots(stats),
+            }
+            for name, stats in sorted(self.steps.items(), key=lambda item: item[1].wall_ms, reverse=True)
+        }
+
+    def write(self, directory, suffix=""):
+        """
+        Write ``<step>[.suffix].collapsed`` (sample mode; input for flamegraph.pl or speedscope) or
+        ``<step>[.suffix].pstats`` (cprofile mode) per step. Returns the paths written.
+        """
+        os.makedirs(directory, exist_ok=True)
+        suffix = f".{suffix}" if suffix else ""
+        paths = []
+        for name, stats in self.steps.items():
+            if self.mode == "sample":
+                path = os.path.join(directory, f"{name}{suffix}.collapsed")
+                with open(path, "w") as f:
+                    for stack, count in stats.stacks.most_common():
+                        f.write(f"{';'.join(stack)} {count}\n")
+            elif stats.stats is not None:
+                path = os.path.join(directory, f"{name}{suffix}.pstats")
+                stats.stats.dump_stats(path)
+            else:
+                continue
+            paths.append(path)
+        return paths
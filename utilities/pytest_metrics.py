@@ -0,0 +1,91 @@
+"""
+Pytest plugin that exports the APIClient metrics registry at the end of the session.
+
+Per-endpoint summaries go to a JSON file (``--metrics-json``), to JUnit XML as test-suite properties (picked
+up by PublishTestResults@2) and, when pytest-html is installed, to the HTML report summary. Under pytest-xdist each
+worker hands its metrics to the controller through ``workeroutput``, and the controller, which writes the reports,
+exports the merged registry.
+"""
+import html
+
+import pytest
+from _pytest.junitxml import xml_key
+
+from utilities.metrics import registry
+
+WORKER_OUTPUT_KEY = "mapapi_request_metrics"
+
+SUMMARY_KEYS = ("p50_ms", "p95_ms", "p99_ms", "max_ms")
+
+
+def pytest_addoption(parser):
+    parser.addoption("--metrics-json", default="logs/request_metrics.json",
+                     help="Where to write per-request latency metrics at session end")
+
+
+def _record_testsuite_properties(config):
+    # The record_testsuite_property fixture does not work under xdist, so the properties are added to the
+    # controller's JUnit XML writer directly
+    xml = config.stash.get(xml_key, None)
+    if xml is None:
+        return
+    for endpoint, data in registry.summary().items():
+        xml.add_global_property(f"{endpoint}.requests", data["requests"])
+        xml.add_global_property(f"{endpoint}.errors", data["errors"])
+        xml.add_global_property(f"{endpoint}.retries", data["retries"])
+        xml.add_global_property(f"{endpoint}.throttled", data["throttled"])
+        xml.add_global_property(f"{endpoint}.rejected", data["rejected"])
+        for key in SUMMARY_KEYS:
+            value = data["latency"].get("total_ms", {}).get(key)
+            if value is not None:
+                xml.add_global_property(f"{endpoint}.{key}", f"{value:.1f}")
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_testnodedown(node, error):
+    data = getattr(node, "workeroutput", {}).get(WORKER_OUTPUT_KEY)
+    if data:
+        registry.merge(data)
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_sessionfinish(session):
+    config = session.config
+    if hasattr(config, "workerinput"):
+        config.workeroutput[WORKER_OUTPUT_KEY] = registry.to_dict()
+        return
+    if registry.endpoints:
+        # tryfirst: the JUnit XML is written by its own sessionfinish hook
+        _record_testsuite_properties(config)
+        registry.export_json(config.getoption("metrics_json"))
+
+
+def _format(value):
+    return "-" if value is None else f"{value:.1f}"
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_html_results_summary(prefix, summary, postfix):
+    data = registry.summary()
+    if not data:
+        return
+    rows = []
+    for endpoint, metrics in data.items():
+        latency = metrics["latency"]
+        total = latency.get("total_ms", {})
+        slowest = metrics["slowest"][0] if metrics["slowest"] else {}
+        rows.append(
+            "<tr>"
+            f"<td>{html.escape(endpoint)}</td><td>{metrics['requests']}</td><td>{metrics['errors']}</td>"
+            f"<td>{metrics['retries']}</td><td>{metrics['throttled']}</td>"
+            + "".join(f"<td>{_format(total.get(key))}</td>" for key in SUMMARY_KEYS)
+            + f"<td>{_format(latency.get('ttfb_ms', {}).get('p95_ms'))}</td>"
+            f"<td>{html.escape(str(slowest.get('params')))}</td>"
+            "</tr>"
+        )
+    prefix.append(
+        "<h2>Request latency</h2><table><tr><th>Endpoint</th><th>Requests</th><th>Errors</th><th>Retries</th><th>Throttled</th>"
+        + "".join(f"<th>{key}</th>" for key in SUMMARY_KEYS)
+        + "<th>TTFB p95_ms</th><th>Slowest params</th></tr>"
+        + "".join(rows) + "</table>"
+    )
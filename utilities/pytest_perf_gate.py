@@ -0,0 +1,90 @@
+"""
+Pytest plugin that gates the session on latency regressions.
+
+At session end each gated endpoint's latency histogram is compared with a rolling baseline of earlier runs
+from the local history store (same endpoint, ``[api] base_url`` and number of xdist workers), then appended to
+the store. Sessions that sent too few requests to a gated endpoint, such as unit-test runs, leave the store
+untouched. A regression
+needs both a p95 increase beyond ``--perf-margin`` and a significant one-sided Mann-Whitney U test, so a
+single noisy run does not trip the gate. Under pytest-xdist the metrics plugin merges every worker's registry
+into the controller's, which gates on the merged distribution.
+"""
+import pytest
+
+from utilities.config import load_config
+from utilities.metrics import registry
+from utilities.perf_history import PerfHistory, compare, current_commit
+
+GATED_ENDPOINTS = ("/api/Access/GetUserAccessInfo", "/api/FieldData/GetFieldData")
+
+_workers_key = pytest.StashKey()
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("perf", "latency regression gate")
+    group.addoption("--perf-gate", choices=("off", "warn", "fail"), default="warn",
+                    help="What to do when p95 latency regresses against the baseline (default: warn)")
+    group.addoption("--perf-margin", type=float, default=0.2,
+                    help="Allowed relative p95 increase over the baseline before flagging (default: 0.2)")
+    group.addoption("--perf-alpha", type=float, default=0.01,
+                    help="Significance level of the Mann-Whitney U test (default: 0.01)")
+    group.addoption("--perf-baseline-runs", type=int, default=10,
+                    help="Number of previous runs merged into the baseline (default: 10)")
+    group.addoption("--perf-min-samples", type=int, default=30,
+                    help="Skip the comparison for endpoints with fewer requests than this (default: 30)")
+    group.addoption("--perf-history", default="logs/perf_history.sqlite",
+                    help="SQLite file holding the latency history")
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_testnodedown(node, error):
+    # Counts the xdist workers, since runs with more parallel callers form their own baseline
+    node.config.stash[_workers_key] = node.config.stash.get(_workers_key, 0) + 1
+
+
+def pytest_sessionfinish(session):
+    config = session.config
+    mode = config.getoption("perf_gate")
+    if mode == "off" or hasattr(config, "workerinput"):
+        return
+
+    histograms = {endpoint: registry.histogram(endpoint) for endpoint in GATED_ENDPOINTS}
+    workers = max(1, config.stash.get(_workers_key, 0))
+    gated = {endpoint: current for endpoint, current in histograms.items()
+             if current.count >= config.getoption("perf_min_samples")}
+    if not gated:
+        # No API scenarios ran (e.g. only unit tests); keep them out of the history and its baselines
+        return
+
+    environment = load_config().get('api', 'base_url', fallback='unknown')
+    commit_id = current_commit()
+    history = PerfHistory(config.getoption("perf_history"))
+    results = {}
+    try:
+        for endpoint, current in gated.items():
+            baseline, runs = history.baseline(endpoint, environment, config.getoption("perf_baseline_runs"),
+                                              workers)
+            if runs:
+                results[endpoint] = compare(current, baseline, config.getoption("perf_margin"),
+                                            config.getoption("perf_alpha"))
+            history.record(endpoint, environment, commit_id, current, workers)
+    finally:
+        history.close()
+
+    config._perf_gate_results = results
+    if mode == "fail" and any(result["regressed"] for result in results.values()):
+        session.exitstatus = pytest.ExitCode.TESTS_FAILED
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    results = getattr(config, "_perf_gate_results", None)
+    if not results:
+        return
+    terminalreporter.section("latency regression gate")
+    for endpoint, result in results.items():
+        line = (f"{endpoint}: p95 {result['current_p95_ms']:.1f} ms vs baseline {result['baseline_p95_ms']:.1f} ms "
+                f"(z={result['z']:.2f}, p={result['p_value']:.3g})")
+        if result["regressed"]:
+            terminalreporter.write_line(f"REGRESSION {line}", red=True)
+        else:
+            terminalreporter.write_line(f"ok {line}", green=True)
@@ -0,0 +1,121 @@
+"""
+Pytest plugin that profiles pytest-bdd steps (``--profile-steps``).
+
+Every ``@given/@when/@then`` step function call is timed (wall and process CPU) and profiled, either with a
+low-overhead wall-clock stack sampler (``sample``, the default) or with cProfile (``cprofile``). At session end
+the per-step summary and top hotspots go to ``<profile dir>/step_profile.json``, the terminal summary and the HTML
+report, and one collapsed-stack (or pstats) file per step is written for flame graphs. Under pytest-xdist each
+worker writes its own files with a ``.gwN`` suffix.
+"""
+import html
+import json
+import os
+
+import pytest
+
+from utilities.profiling import StepProfiler
+
+_profiler_key = pytest.StashKey()
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("profile", "pytest-bdd step profiling")
+    group.addoption("--profile-steps", nargs="?", const="sample", default=None, choices=("sample", "cprofile"),
+                    help="Profile every pytest-bdd step: 'sample' (default, wall-clock stack sampling) or 'cprofile'")
+    group.addoption("--profile-interval", type=float, default=5.0,
+                    help="Sampling interval in milliseconds (default: 5)")
+    group.addoption("--profile-top", type=int, default=10,
+                    help="Hotspots reported per step (default: 10)")
+    group.addoption("--profile-dir", default="logs/profiles",
+                    help="Where the step profiles are written (default: logs/profiles)")
+
+
+def pytest_configure(config):
+    mode = config.getoption("profile_steps")
+    if mode:
+        config.stash[_profiler_key] = StepProfiler(mode, config.getoption("profile_interval") / 1000,
+                                                   config.getoption("profile_top"))
+
+
+def _profiler(config):
+    return config.stash.get(_profiler_key, None)
+
+
+def _worker_suffix(config):
+    return getattr(config, "workerinput", {}).get("workerid", "")
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_bdd_before_step_call(request, feature, scenario, step, step_func, step_func_args):
+    profiler = _profiler(request.config)
+    if profiler is not None:
+        # Module-qualified, since step modules reuse names such as setup and verify_response_code
+        profiler.begin(f"{step_func.__module__.rpartition('.')[2]}.{step_func.__name__}", step_func)
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_bdd_after_step(request, feature, scenario, step, step_func, step_func_args):
+    profiler = _profiler(request.config)
+    if profiler is not None:
+        profiler.end()
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_bdd_step_error(request, feature, scenario, step, step_func, step_func_args, exception):
+    profiler = _profiler(request.config)
+    if profiler is not None:
+        profiler.end()
+
+
+def pytest_sessionfinish(session):
+    profiler = _profiler(session.config)
+    if profiler is None or not profiler.steps:
+        return
+    directory = session.config.getoption("profile_dir")
+    suffix = _worker_suffix(session.config)
+    profiler.write(directory, suffix)
+    path = os.path.join(directory, f"step_profile.{suffix}.json" if suffix else "step_profile.json")
+    with open(path, "w") as f:
+        json.dump({"mode": profiler.mode, "interval_ms": profiler.interval * 1000, "steps": profiler.summary()},
+                  f, indent=2)
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    profiler = _profiler(config)
+    if profiler is None or not profiler.steps:
+        return
+    terminalreporter.section(f"step profile ({profiler.mode})")
+    for name, data in profiler.summary().items():
+        terminalreporter.write_line(
+            f"{name}: {data['calls']} call(s), wall {data['wall_ms']:.1f} ms (max {data['max_wall_ms']:.1f}), "
+            f"cpu {data['cpu_ms']:.1f} ms"
+        )
+        for hotspot in data["hotspots"][:5]:
+            share = (f"{hotspot['self_pct']:5.1f}% self, {hotspot['total_pct']:5.1f}% total"
+                     if profiler.mode == "sample" else f"{hotspot['self_ms']:9.1f} ms self, {hotspot['calls']} calls")
+            terminalreporter.write_line(f"    {share}  {hotspot['frame']}")
+    terminalreporter.write_line(f"Profiles written to {config.getoption('profile_dir')}")
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_html_results_summary(prefix, summary, postfix, session):
+    profiler = _profiler(session.config)
+    if profiler is None or not profiler.steps:
+        return
+    rows = []
+    for name, data in profiler.summary().items():
+        hotspots = "<br>".join(
+            html.escape(f"{hotspot['frame']} ({hotspot['self_pct']}% self)" if profiler.mode == "sample"
+                        else f"{hotspot['frame']} ({hotspot['self_ms']} ms self)")
+            for hotspot in data["hotspots"]
+        )
+        rows.append(
+            "<tr>"
+            f"<td>{html.escape(name)}</td><td>{data['calls']}</td><td>{data['wall_ms']:.1f}</td>"
+            f"<td>{data['max_wall_ms']:.1f}</td><td>{data['cpu_ms']:.1f}</td><td>{hotspots}</td>"
+            "</tr>"
+        )
+    prefix.append(
+        f"<h2>Step profile ({profiler.mode})</h2><table><tr><th>Step</th><th>Calls</th><th>Wall ms</th>"
+        "<th>Max wall ms</th><th>CPU ms</th><th>Hotspots</th></tr>" + "".join(rows) + "</table>"
+    )
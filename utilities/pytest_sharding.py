@@ -0,0 +1,88 @@
+"""
+Pytest plugin that shards the per-user sweep across pytest-xdist workers.
+
+Tests that take a ``user_shard`` argument are parametrized into ``--user-shards`` items (default: one per xdist
+worker), which xdist spreads over its workers. All processes of a run share a run id, used to publish the user
+list once per session and to collect per-shard results, which the controller merges into one per-user report.
+"""
+import os
+import shutil
+import uuid
+
+import pytest
+
+from utilities.sharding import ShardReport
+
+
+def pytest_addoption(parser):
+    parser.addoption("--user-shards", type=int, default=None,
+                     help="Number of shards for the per-user sweep (default: number of xdist workers)")
+    parser.addoption("--user-report", default="logs/user_access_report.json",
+                     help="Where to write the merged per-user report")
+
+
+def pytest_configure(config):
+    workerinput = getattr(config, "workerinput", {})
+    config.mapapi_run_id = workerinput.get("mapapi_run_id") or uuid.uuid4().hex
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_configure_node(node):
+    node.workerinput["mapapi_run_id"] = node.config.mapapi_run_id
+
+
+def shard_count(config):
+    return config.getoption("user_shards") or int(os.getenv("PYTEST_XDIST_WORKER_COUNT", "1"))
+
+
+def run_directory(config):
+    return os.path.join("logs", "shards", config.mapapi_run_id)
+
+
+def pytest_generate_tests(metafunc):
+    shards = shard_count(metafunc.config)
+    if "user_shard" in metafunc.fixturenames and shards > 1:
+        metafunc.parametrize("user_shard", range(shards), ids=[f"shard{i + 1}of{shards}" for i in range(shards)])
+
+
+@pytest.fixture
+def user_shard():
+    return 0
+
+
+@pytest.fixture(scope="session")
+def user_shards(pytestconfig):
+    return shard_count(pytestconfig)
+
+
+@pytest.fixture(scope="session")
+def shard_directory(pytestconfig):
+    return run_directory(pytestconfig)
+
+
+@pytest.fixture(scope="session")
+def shard_report(shard_directory):
+    return ShardReport(shard_directory)
+
+
+@pytest.hookimpl(trylast=True)
+def pytest_sessionfinish(session):
+    config = session.config
+    if hasattr(config, "workerinput"):
+        return
+    directory = run_directory(config)
+    if not os.path.isdir(directory):
+        return
+    report = ShardReport(directory).merge(config.getoption("user_report"))
+    if report is not None:
+        config.mapapi_user_report = report
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    report = getattr(config, "mapapi_user_report", None)
+    if report:
+        terminalreporter.write_line(
+            f"User access sweep: {report['users']} users across {report['shards']} shard(s), "
+            f"{report['failed']} failed; report written to {config.getoption('user_report')}"
+        )
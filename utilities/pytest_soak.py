@@ -0,0 +1,151 @@
+"""
+Pytest plugin for soak (endurance) runs.
+
+``--soak-iterations N`` and/or ``--soak-duration SECONDS`` repeat the whole collected test set, keeping session
+fixtures (clients, database pool) alive across iterations the way a long nightly run does. Between iterations a
+ResourceMonitor samples RSS, traced memory, descriptors and sockets, threads, logging handlers, open httpx clients
+and pool connections/cursors. At the end the per-iteration growth of each metric is compared with its threshold
+(``--soak-threshold metric=value``), and a leak fails the session, so it shows up as a number instead of an OOM.
+"""
+import json
+import os
+import time
+
+import pytest
+
+from utilities.soak import DEFAULT_THRESHOLDS, ResourceMonitor
+
+_monitor_key = pytest.StashKey()
+
+
+def _threshold(value):
+    metric, _, limit = value.partition("=")
+    if metric not in DEFAULT_THRESHOLDS or not limit:
+        raise ValueError(value)
+    return metric, float(limit)
+
+
+def _fresh_item(item):
+    """
+    A new, not yet set up copy of ``item`` for the next iteration, so its function fixtures run again while the
+    parent collectors (and the session fixtures) stay set up. Items that are not test functions are reused.
+    """
+    if not isinstance(item, pytest.Function):
+        return item
+    fresh = pytest.Function.from_parent(item.parent, name=item.name, callspec=getattr(item, "callspec", None),
+                                        callobj=item.obj, fixtureinfo=item._fixtureinfo,
+                                        originalname=item.originalname)
+    fresh.own_markers = list(item.own_markers)
+    fresh.keywords.update(item.keywords)
+    return fresh
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("soak", "soak / endurance runs")
+    group.addoption("--soak-iterations", type=int, default=None,
+                    help="Repeat the collected tests this many times, sampling resources in between")
+    group.addoption("--soak-duration", type=float, default=None,
+                    help="Repeat the collected tests for about this many seconds")
+    group.addoption("--soak-warmup", type=int, default=1,
+                    help="Iterations left out of the growth check while caches fill up (default: 1)")
+    group.addoption("--soak-threshold", type=_threshold, action="append", default=[],
+                    help="Allowed growth per iteration, e.g. rss_mib=2 or sockets=0 (repeatable); metrics: "
+                         + ", ".join(DEFAULT_THRESHOLDS))
+    group.addoption("--soak-gate", choices=("warn", "fail"), default="fail",
+                    help="What to do when a resource keeps growing (default: fail)")
+    group.addoption("--soak-tracemalloc", type=int, default=10,
+                    help="Top allocation sites to report from tracemalloc; 0 disables tracing (default: 10)")
+    group.addoption("--soak-report", default="logs/soak_report.json",
+                    help="Where to write the per-iteration samples and slopes")
+
+
+def pytest_configure(config):
+    iterations = config.getoption("soak_iterations")
+    duration = config.getoption("soak_duration")
+    if iterations is None and duration is None:
+        return
+    if getattr(config.option, "numprocesses", None):
+        raise pytest.UsageError("Soak runs measure a single process; run them without -n.")
+    config.stash[_monitor_key] = ResourceMonitor(dict(config.getoption("soak_threshold")),
+                                                 warmup=config.getoption("soak_warmup"),
+                                                 trace_top=config.getoption("soak_tracemalloc"))
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_runtestloop(session):
+    monitor = session.config.stash.get(_monitor_key, None)
+    if monitor is None:
+        return None
+    if session.testsfailed and not session.config.option.continue_on_collection_errors:
+        raise session.Interrupted(f"{session.testsfailed} error(s) during collection")
+    if session.config.option.collectonly or not session.items:
+        return True
+
+    iterations = session.config.getoption("soak_iterations")
+    duration = session.config.getoption("soak_duration")
+    deadline = time.monotonic() + duration if duration else None
+    items = session.items
+    monitor.start()
+    iteration = 0
+    last_iteration_seconds = 0.0
+    while True:
+        iteration += 1
+        if iteration > 1:
+            # Sampled between iterations, while the session fixtures are still alive (the last one tears them down)
+            monitor.sample(iteration - 1)
+        started = time.monotonic()
+        # Known in advance so the final item can tear the session fixtures down (nextitem=None)
+        last = (iterations is not None and iteration >= iterations) or (
+            deadline is not None and started + last_iteration_seconds >= deadline)
+        # The next iteration runs fresh copies, so each item is torn down before its copy is set up
+        next_items = None if last else [_fresh_item(item) for item in items]
+        for index, item in enumerate(items):
+            nextitem = items[index + 1] if index + 1 < len(items) else (next_items[0] if next_items else None)
+            item.config.hook.pytest_runtest_protocol(item=item, nextitem=nextitem)
+            if session.shouldfail:
+                raise session.Failed(session.shouldfail)
+            if session.shouldstop:
+                raise session.Interrupted(session.shouldstop)
+        last_iteration_seconds = time.monotonic() - started
+        monitor.iterations = iteration
+        if last:
+            break
+        items = next_items
+    return True
+
+
+def pytest_sessionfinish(session):
+    monitor = session.config.stash.get(_monitor_key, None)
+    if monitor is None or not monitor.samples:
+        return
+    monitor.stop()
+    report = monitor.report()
+    path = session.config.getoption("soak_report")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    if report["violations"] and session.config.getoption("soak_gate") == "fail":
+        session.exitstatus = pytest.ExitCode.TESTS_FAILED
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    monitor = config.stash.get(_monitor_key, None)
+    if monitor is None or not monitor.samples:
+        return
+    report = monitor.report()
+    first, last = report["samples"][0], report["samples"][-1]
+    terminalreporter.section(f"soak ({report['iterations']} iterations, warm-up {report['warmup']})")
+    violated = {violation["metric"] for violation in report["violations"]}
+    for metric, value in report["slopes"].items():
+        line = (f"{metric}: {first[metric]} -> {last[metric]}, {value:+g}/iteration "
+                f"(limit {report['thresholds'][metric]:g})")
+        if metric in violated:
+            terminalreporter.write_line(f"GROWING {line}", red=True)
+        else:
+            terminalreporter.write_line(f"ok {line}")
+    if report["violations"] and report["top_allocations"]:
+        terminalreporter.write_line("Largest allocation growth since the warm-up:")
+        for allocation in report["top_allocations"][:5]:
+            terminalreporter.write_line(f"    {allocation['size_diff_kib']:+.1f} KiB "
+                                        f"({allocation['count_diff']:+d} blocks)  {allocation['location']}")
+    terminalreporter.write_line(f"Soak report written to {config.getoption('soak_report')}")
@@ -0,0 +1,240 @@
+import email.utils
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import httpx
+
+# Statuses worth retrying for an idempotent GET; the first two mean "slow down"
+THROTTLE_STATUSES = (429, 503)
+RETRY_STATUSES = (429, 502, 503, 504)
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+def retry_after(response, now=None):
+    """
+    Seconds requested by a Retry-After header (delta-seconds or HTTP-date), or None.
+    """
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - (now or time.time()))
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket whose rate adapts AIMD-style: every success adds about ``increase`` requests/s per
+    second of traffic, and a throttling response multiplies the rate by ``decrease`` (at most once per second, so a
+    burst of 429s from requests already in flight counts as one signal).
+
+    ``reserve()`` takes a token immediately and returns how long the caller must wait for it, so the sync and async
+    clients can share one bucket and sleep in their own way.
+    """
+
+    def __init__(self, rate, burst=None, min_rate=1.0, max_rate=None, increase=5.0, decrease=0.5):
+        self.rate = float(rate)
+        self.burst = float(burst or max(1.0, rate))
+        self.min_rate = min_rate
+        self.max_rate = max_rate or rate * 10
+        self.increase = increase
+        self.decrease = decrease
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self):
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(wait, self.paused_until - now)
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase / self.rate)
+
+    def on_throttle(self, pause=None):
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now - self.last_decrease >= 1.0:
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                self.last_decrease = now
+            if pause:
+                self.paused_until = max(self.paused_until, now + pause)
+
+
+class CircuitBreaker:
+    """
+    Opens after ``failure_threshold`` consecutive failures and rejects requests for ``reset_timeout`` seconds,
+    then lets a single probe through: success closes the circuit, any other outcome opens it again. A probe that
+    never reports back (its caller raised or was cancelled) is given up after another ``reset_timeout`` seconds,
+    and the next request becomes the probe.
+    """
+
+    def __init__(self, failure_threshold=20, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.probe_started = None
+        self.opened = 0
+        self._lock = threading.Lock()
+
+    def _waited(self, now):
+        return now - (self.probe_started if self.probing else self.opened_at) >= self.reset_timeout
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if self.probing or self._waited(time.monotonic()) else "open"
+
+    def check(self):
+        with self._lock:
+            if self.opened_at is None:
+                return
+            now = time.monotonic()
+            if self._waited(now):
+                self.probing = True
+                self.probe_started = now
+                return
+            raise CircuitOpenError(f"Circuit open after {self.failures} consecutive failures; "
+                                   f"retrying in {self.reset_timeout:.0f}s")
+
+    def _open(self):
+        self.opened_at = time.monotonic()
+        self.opened += 1
+        self.probing = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.probing or (self.opened_at is None and self.failures >= self.failure_threshold):
+                self._open()
+
+    def record_throttle(self):
+        """
+        A throttled response does not count as a failure, but a throttled probe has not shown that the host
+        recovered, so the circuit opens again.
+        """
+        with self._lock:
+            if self.probing:
+                self._open()
+
+
+class RequestPolicy:
+    """
+    Rate limiting, retry and circuit breaking for every request to one host, shared by all clients in the process.
+    """
+    _policies = {}
+    _policies_lock = threading.Lock()
+
+    def __init__(self, bucket=None, breaker=None, max_retries=4, base_delay=0.5, max_delay=30.0):
+        self.bucket = bucket
+        self.breaker = breaker
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    @classmethod
+    def from_settings(cls, section):
+        """
+        The policy for the host of ``[api] base_url``, created from the [api] section on first use.
+        """
+        host = urlsplit(section.get("base_url", fallback="")).netloc
+        with cls._policies_lock:
+            policy = cls._policies.get(host)
+            if policy is None:
+                rate = section.getfloat("rate_limit", fallback=50.0)
+                bucket = TokenBucket(
+                    rate,
+                    burst=section.getfloat("rate_limit_burst", fallback=None),
+                    min_rate=section.getfloat("rate_limit_min", fallback=1.0),
+                    max_rate=section.getfloat("rate_limit_max", fallback=None),
+                    increase=section.getfloat("rate_increase", fallback=5.0),
+                    decrease=section.getfloat("rate_decrease", fallback=0.5),
+                ) if rate > 0 else None
+                breaker = CircuitBreaker(
+                    section.getint("circuit_failure_threshold", fallback=20),
+                    section.getfloat("circuit_reset_timeout", fallback=30.0),
+                )
+                policy = cls._policies[host] = cls(
+                    bucket,
+                    breaker,
+                    max_retries=section.getint("max_retries", fallback=4),
+                    base_delay=section.getfloat("retry_base_delay", fallback=0.5),
+                    max_delay=section.getfloat("retry_max_delay", fallback=30.0),
+                )
+        return policy
+
+    def before(self):
+        """
+        Check the circuit and take a rate-limit token; returns the seconds to wait before sending.
+        """
+        if self.breaker is not None:
+            self.breaker.check()
+        return self.bucket.reserve() if self.bucket is not None else 0.0
+
+    def backoff(self, attempt):
+        """
+        Exponential backoff with full jitter.
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def after(self, attempt, response=None, error=None):
+        """
+        Update the limiter and breaker with the outcome of one attempt; returns the delay before the next attempt,
+        or None when the outcome is final.
+        """
+        if error is not None:
+            if self.breaker is not None:
+                self.breaker.record_failure()
+            retryable = isinstance(error, httpx.TransportError)
+            return self.backoff(attempt) if retryable and attempt < self.max_retries else None
+
+        status = response.status_code
+        if status in THROTTLE_STATUSES or status >= 500:
+            requested = retry_after(response)
+            if status in THROTTLE_STATUSES and self.bucket is not None:
+                self.bucket.on_throttle(pause=requested)
+            if self.breaker is not None:
+                if status >= 500:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_throttle()
+            if status in RETRY_STATUSES and attempt < self.max_retries:
+                # Wait at least what the server asked for, jittered so parked requests do not return in lockstep
+                return min(max(requested or 0.0, self.backoff(attempt)), self.max_delay)
+            return None
+
+        if self.bucket is not None:
+            self.bucket.on_success()
+        if self.breaker is not None:
+            self.breaker.record_success()
+        return None
@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+from array import array
+
+SPILL_MODES = ("off", "failures", "all")
+
+
+def body_digest(content):
+    return int.from_bytes(hashlib.blake2b(content, digest_size=8).digest(), "little")
+
+
+class ResultRecord:
+    """
+    One stored call, rebuilt on demand from the ResultStore columns.
+    """
+    __slots__ = ("item", "status_code", "latency_ms", "body_size", "body_hash", "error")
+
+    def __init__(self, item, status_code, latency_ms, body_size, body_hash, error):
+        self.item = item
+        self.status_code = status_code
+        self.latency_ms = latency_ms
+        self.body_size = body_size
+        self.body_hash = body_hash
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+class ResultStore:
+    """
+    Compact per-call results for large sweeps: status, latency, body size and a 64-bit body hash per call, kept in
+    typed arrays instead of holding on to every httpx.Response.
+
+    Errors are kept sparsely by position. Full response bodies go to a JSON-lines spill file on disk, either for
+    failed calls only (``spill='failures'``), for every call (``'all'``) or never (``'off'``).
+    """
+
+    def __init__(self, spill="failures", spill_path="logs/response_bodies.jsonl"):
+        if spill not in SPILL_MODES:
+            raise ValueError(f"Unknown spill mode '{spill}', expected one of {SPILL_MODES}.")
+        self.spill = spill
+        self.spill_path = spill_path
+        self.items = []
+        self.statuses = array("H")
+        self.latencies = array("f")
+        self.sizes = array("L")
+        self.hashes = array("Q")
+        self.errors = {}
+        self.spilled = 0
+        self._spill_file = None
+
+    @classmethod
+    def from_settings(cls, section, suffix=None):
+        """
+        Build a store from the [api] section; ``suffix`` keeps spill files of parallel shards apart.
+        """
+        spill_path = section.get("spill_path", fallback="logs/response_bodies.jsonl")
+        if suffix is not None:
+            root, ext = os.path.splitext(spill_path)
+            spill_path = f"{root}.{suffix}{ext}"
+        return cls(section.get("spill_bodies", fallback="failures"), spill_path)
+
+    def add(self, item, result, latency_ms):
+        """
+        Record a RequestResult; the response itself is not retained.
+        """
+        response = result.response
+        content = response.content if response is not None else b""
+        index = len(self.items)
+        self.items.append(item)
+        self.statuses.append(response.status_code if response is not None else 0)
+        self.latencies.append(latency_ms)
+        self.sizes.append(len(content))
+        self.hashes.append(body_digest(content))
+        if result.error is not None:
+            self.errors[index] = repr(result.error)
+        if self.spill == "all" or (self.spill == "failures" and not result.ok):
+            self._write_spill(item, result)
+
+    def _write_spill(self, item, result):
+        if self._spill_file is None:
+            os.makedirs(os.path.dirname(self.spill_path) or ".", exist_ok=True)
+            self._spill_file = open(self.spill_path, "w")
+        response = result.response
+        record = {
+            "item": item,
+            "params": result.params,
+            "status": response.status_code if response is not None else None,
+            "error": repr(result.error) if result.error is not None else None,
+            "headers": dict(response.headers) if response is not None else None,
+            "body": response.text if response is not None else None,
+        }
+        self._spill_file.write(json.dumps(record, default=str))
+        self._spill_file.write("\n")
+        self.spilled += 1
+
+    def record(self, index):
+        status = self.statuses[index]
+        return ResultRecord(self.items[index], status or None, self.latencies[index], self.sizes[index],
+                            self.hashes[index], self.errors.get(index))
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        """
+        Yield ``(item, ResultRecord)`` pairs in the order the calls completed.
+        """
+        for index in range(len(self.items)):
+            yield self.items[index], self.record(index)
+
+    def failures(self):
+        return [(item, record) for item, record in self if not record.ok]
+
+    def close(self):
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
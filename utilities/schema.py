@@ -0,0 +1,224 @@
+import functools
+import json
+import logging
+import os
+
+try:
+    import ijson
+except ImportError:  # Optional: without it bodies are buffered and validated after download
+    ijson = None
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_DIR = "config/schemas"
+
+_SCALAR_TYPES = {"null": "null", "boolean": "boolean", "string": "string", "integer": "integer", "double": "number",
+                 "number": "number"}
+
+
+class SchemaValidationError(ValueError):
+    def __init__(self, path, message):
+        self.path = path
+        super().__init__(f"{path}: {message}")
+
+
+class SchemaNode:
+    """
+    One compiled level of a JSON Schema subset: type, enum, properties, required, additionalProperties, items,
+    minimum/maximum, minLength/maxLength and minItems/maxItems.
+    """
+    __slots__ = ("types", "enum", "properties", "required", "additional", "items", "minimum", "maximum",
+                 "min_length", "max_length", "min_items", "max_items")
+
+    def __init__(self, schema):
+        types = schema.get("type")
+        self.types = frozenset([types] if isinstance(types, str) else types or ())
+        self.enum = frozenset(schema["enum"]) if "enum" in schema else None
+        self.properties = {name: SchemaNode(sub) for name, sub in schema.get("properties", {}).items()}
+        self.required = frozenset(schema.get("required", ()))
+        additional = schema.get("additionalProperties", True)
+        self.additional = SchemaNode(additional) if isinstance(additional, dict) else additional
+        self.items = SchemaNode(schema["items"]) if "items" in schema else None
+        self.minimum = schema.get("minimum")
+        self.maximum = schema.get("maximum")
+        self.min_length = schema.get("minLength")
+        self.max_length = schema.get("maxLength")
+        self.min_items = schema.get("minItems")
+        self.max_items = schema.get("maxItems")
+
+    def accepts(self, json_type):
+        return (not self.types or json_type in self.types
+                or (json_type == "integer" and "number" in self.types))
+
+
+# Accepts anything; used for unconstrained properties and array items
+ANY = SchemaNode({})
+
+
+@functools.lru_cache(maxsize=None)
+def load_schema(endpoint, directory=SCHEMA_DIR):
+    """
+    Compiled schema for ``endpoint``, read once per process from ``<directory>/<Controller>.<Action>.json``.
+    """
+    name = ".".join(part for part in endpoint.split("/") if part and part != "api")
+    with open(os.path.join(directory, f"{name}.json")) as f:
+        return SchemaNode(json.load(f))
+
+
+class _Frame:
+    __slots__ = ("node", "path", "is_map", "seen", "key", "count")
+
+    def __init__(self, node, path, is_map):
+        self.node = node
+        self.path = path
+        self.is_map = is_map
+        self.seen = set() if is_map else None
+        self.key = None
+        self.count = 0
+
+
+class StreamValidator:
+    """
+    Validates a JSON document from its parse events (ijson ``basic_parse`` events), raising SchemaValidationError
+    at the first violation. Only the current nesting path is kept, never the document.
+    """
+
+    def __init__(self, schema):
+        self.schema = schema
+        self.stack = []
+        self.values = 0
+
+    def _child(self):
+        """
+        Schema node and path of the value that starts with the current event.
+        """
+        if not self.stack:
+            return self.schema, "$"
+        frame = self.stack[-1]
+        if frame.is_map:
+            node = frame.node.properties.get(frame.key)
+            if node is None:
+                node = frame.node.additional if isinstance(frame.node.additional, SchemaNode) else ANY
+            return node, f"{frame.path}.{frame.key}"
+        index = frame.count
+        frame.count += 1
+        if frame.node.max_items is not None and frame.count > frame.node.max_items:
+            raise SchemaValidationError(frame.path, f"more than {frame.node.max_items} items")
+        return frame.node.items or ANY, f"{frame.path}[{index}]"
+
+    def feed(self, event, value):
+        if event == "map_key":
+            frame = self.stack[-1]
+            if value not in frame.node.properties and frame.node.additional is False:
+                raise SchemaValidationError(frame.path, f"unexpected property '{value}'")
+            frame.key = value
+            frame.seen.add(value)
+            return
+        if event in ("end_map", "end_array"):
+            frame = self.stack.pop()
+            if frame.is_map:
+                missing = frame.node.required - frame.seen
+                if missing:
+                    raise SchemaValidationError(frame.path, f"missing required properties {sorted(missing)}")
+            elif frame.node.min_items is not None and frame.count < frame.node.min_items:
+                raise SchemaValidationError(frame.path, f"fewer than {frame.node.min_items} items")
+            return
+
+        self.values += 1
+        node, path = self._child()
+        if event in ("start_map", "start_array"):
+            json_type = "object" if event == "start_map" else "array"
+            if not node.accepts(json_type):
+                raise SchemaValidationError(path, f"expected {sorted(node.types)}, got {json_type}")
+            self.stack.append(_Frame(node, path, event == "start_map"))
+            return
+
+        json_type = _SCALAR_TYPES[event]
+        if json_type == "number" and float(value).is_integer():
+            json_type = "integer"
+        if not node.accepts(json_type):
+            raise SchemaValidationError(path, f"expected {sorted(node.types)}, got {json_type}")
+        self._check_scalar(node, path, value)
+
+    @staticmethod
+    def _check_scalar(node, path, value):
+        if node.enum is not None and value not in node.enum:
+            raise SchemaValidationError(path, f"{value!r} is not one of {sorted(node.enum, key=repr)}")
+        if isinstance(value, str):
+            if node.min_length is not None and len(value) < node.min_length:
+                raise SchemaValidationError(path, f"shorter than {node.min_length} characters")
+            if node.max_length is not None and len(value) > node.max_length:
+                raise SchemaValidationError(path, f"longer than {node.max_length} characters")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            if node.minimum is not None and value < node.minimum:
+                raise SchemaValidationError(path, f"{value} is below the minimum {node.minimum}")
+            if node.maximum is not None and value > node.maximum:
+                raise SchemaValidationError(path, f"{value} is above the maximum {node.maximum}")
+
+
+def _document_events(value):
+    """
+    The ijson ``basic_parse`` events of an already parsed document.
+    """
+    if isinstance(value, dict):
+        yield "start_map", None
+        for key, item in value.items():
+            yield "map_key", key
+            yield from _document_events(item)
+        yield "end_map", None
+    elif isinstance(value, list):
+        yield "start_array", None
+        for item in value:
+            yield from _document_events(item)
+        yield "end_array", None
+    elif value is None:
+        yield "null", None
+    elif isinstance(value, bool):
+        yield "boolean", value
+    elif isinstance(value, int):
+        yield "integer", value
+    elif isinstance(value, float):
+        yield "double", value
+    else:
+        yield "string", value
+
+
+def validate_chunks(chunks, schema):
+    """
+    Validate a JSON document arriving as byte ``chunks`` (e.g. ``response.iter_bytes()``) against ``schema``.
+
+    Each chunk is parsed and validated as soon as it is received, so validation overlaps with the download and a
+    violation stops reading the rest of the body. Returns the number of JSON values checked.
+
+    A body that is not JSON at all, or is cut off, raises SchemaValidationError naming the byte offset reached.
+    """
+    validator = StreamValidator(schema)
+    if ijson is None:
+        logger.warning("ijson is not installed; buffering the response body for schema validation")
+        body = b"".join(chunks)
+        try:
+            document = json.loads(body)
+        except ValueError as e:
+            raise SchemaValidationError("$", f"invalid JSON at byte {getattr(e, 'pos', len(body))}: {e}") from e
+        for event, value in _document_events(document):
+            validator.feed(event, value)
+        return validator.values
+
+    events = ijson.sendable_list()
+    parser = ijson.basic_parse_coro(events, use_float=True)
+    offset = 0
+    try:
+        for chunk in chunks:
+            offset += len(chunk)
+            parser.send(chunk)
+            for event, value in events:
+                validator.feed(event, value)
+            del events[:]
+        parser.close()
+    except ijson.JSONError as e:
+        # yajl reports the offending text over several lines; the first one names the problem
+        reason = str(e).splitlines()[0] if str(e) else type(e).__name__
+        raise SchemaValidationError("$", f"invalid JSON within the first {offset} bytes: {reason}") from e
+    for event, value in events:
+        validator.feed(event, value)
+    return validator.values
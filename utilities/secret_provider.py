@@ -0,0 +1,181 @@
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from utilities.config import load_config
+
+logger = logging.getLogger(__name__)
+
+_credential = None
+_credential_lock = threading.Lock()
+
+# Process-wide cache shared by every provider: (vault_url, secret name) -> (expires_at, value)
+_memory_cache = {}
+_memory_lock = threading.Lock()
+
+
+def shared_credential():
+    """
+    Return one DefaultAzureCredential for the whole process, created on first use.
+    """
+    global _credential
+    with _credential_lock:
+        if _credential is None:
+            from azure.identity import DefaultAzureCredential
+            _credential = DefaultAzureCredential()
+        return _credential
+
+
+def clear_memory_cache():
+    with _memory_lock:
+        _memory_cache.clear()
+
+
+class LocalSecretClient:
+    """
+    Drop-in for azure.keyvault.secrets.SecretClient backed by a dict or a JSON file, for tests and offline runs.
+    """
+
+    def __init__(self, secrets=None, path=None):
+        self.secrets = dict(secrets or {})
+        if path:
+            with open(path) as f:
+                self.secrets.update(json.load(f))
+        self.calls = 0
+
+    def get_secret(self, name):
+        self.calls += 1
+        if name not in self.secrets:
+            raise KeyError(f"Secret '{name}' not found in local secret store.")
+        return SimpleNamespace(name=name, value=self.secrets[name])
+
+
+class EncryptedFileCache:
+    """
+    On-disk secret cache encrypted with Fernet, so repeated sessions and xdist workers can skip Key Vault.
+
+    Disabled (with a warning) when the ``cryptography`` package is not installed or no key is provided.
+    """
+
+    def __init__(self, path, key):
+        self.path = path
+        self.fernet = None
+        if not key:
+            return
+        try:
+            from cryptography.fernet import Fernet
+        except ImportError:
+            logger.warning("cryptography is not installed; on-disk secret cache disabled.")
+            return
+        self.fernet = Fernet(key)
+
+    @property
+    def enabled(self):
+        return self.fernet is not None
+
+    def load(self):
+        if not self.enabled or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "rb") as f:
+                return json.loads(self.fernet.decrypt(f.read()))
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable secret cache {self.path}: {e}")
+            return {}
+
+    def store(self, entries):
+        if not self.enabled:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        # Written aside and renamed into place, so concurrent xdist workers (or threads) never see a torn file
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(self.fernet.encrypt(json.dumps(entries).encode()))
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+class SecretProvider:
+    """
+    Resolve Key Vault secrets concurrently, through an in-process TTL cache and an optional encrypted disk cache.
+    """
+
+    def __init__(self, vault_url, client=None, ttl=3600.0, cache_path=None, cache_key=None, max_workers=8):
+        self.vault_url = vault_url
+        self.ttl = ttl
+        self.max_workers = max_workers
+        self.disk_cache = EncryptedFileCache(cache_path, cache_key) if cache_path else None
+        self._client = client
+
+    @classmethod
+    def from_config(cls, vault_url, client=None):
+        config = load_config()
+        section = config['key_vault'] if config.has_section('key_vault') else config['DEFAULT']
+        return cls(
+            vault_url,
+            client=client,
+            ttl=section.getfloat("secret_ttl", fallback=3600.0),
+            cache_path=section.get("disk_cache_path", fallback=None),
+            cache_key=os.getenv("MAPAPI_SECRET_CACHE_KEY"),
+        )
+
+    @property
+    def client(self):
+        if self._client is None:
+            from azure.keyvault.secrets import SecretClient
+            self._client = SecretClient(vault_url=self.vault_url, credential=shared_credential())
+        return self._client
+
+    def get_secret(self, name):
+        return self.get_secrets([name])[name]
+
+    def get_secrets(self, names):
+        """
+        Return a dict of secret name -> value, fetching only the names missing from both caches.
+        """
+        now = time.time()
+        values = {}
+        with _memory_lock:
+            for name in names:
+                cached = _memory_cache.get((self.vault_url, name))
+                if cached and cached[0] > now:
+                    values[name] = cached[1]
+
+        missing = [name for name in names if name not in values]
+        disk_entries = {}
+        if missing and self.disk_cache and self.disk_cache.enabled:
+            disk_entries = self.disk_cache.load()
+            for name in missing:
+                cached = disk_entries.get(f"{self.vault_url}|{name}")
+                if cached and cached[0] > now:
+                    values[name] = cached[1]
+                    self._remember(name, cached[1], cached[0])
+            missing = [name for name in names if name not in values]
+
+        if missing:
+            logger.info(f"Fetching {len(missing)} secret(s) from {self.vault_url}...")
+            client = self.client
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(missing))) as executor:
+                fetched = dict(zip(missing, executor.map(lambda name: client.get_secret(name).value, missing)))
+            expires_at = now + self.ttl
+            for name, value in fetched.items():
+                values[name] = value
+                self._remember(name, value, expires_at)
+                disk_entries[f"{self.vault_url}|{name}"] = (expires_at, value)
+            if self.disk_cache:
+                self.disk_cache.store({key: entry for key, entry in disk_entries.items() if entry[0] > now})
+
+        return values
+
+    def _remember(self, name, value, expires_at):
+        with _memory_lock:
+            _memory_cache[(self.vault_url, name)] = (expires_at, value)
@@ -0,0 +1,98 @@
+import glob
+import hashlib
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def shard_of(key, shards):
+    """
+    Deterministic shard for ``key``; stable across processes and runs, unlike the built-in hash().
+    """
+    digest = hashlib.blake2b(str(key).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little") % shards
+
+
+def shard_batches(batches, shard, shards):
+    """
+    Filter an iterator of batches down to the items that belong to ``shard``.
+    """
+    for batch in batches:
+        selected = [item for item in batch if shard_of(item, shards) == shard]
+        if selected:
+            yield selected
+
+
+def shared_snapshot(path, produce, timeout=600.0, poll=0.5):
+    """
+    Return the JSON list stored at ``path``, producing it with ``produce()`` in exactly one process.
+
+    The first process to create ``path + '.lock'`` runs ``produce`` and publishes the result atomically; every
+    other process (e.g. the remaining xdist workers) waits for the file instead of running the query itself.
+    """
+    lock_path = f"{path}.lock"
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(path):
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Timed out waiting for {path} to be produced by another worker.")
+            time.sleep(poll)
+            continue
+        try:
+            os.close(fd)
+            # Another worker may have published and released the lock between our exists() check and open()
+            if os.path.exists(path):
+                break
+            items = list(produce())
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(items, f)
+            os.replace(tmp_path, path)
+            logger.info(f"Published {len(items)} items to {path}")
+            return items
+        finally:
+            os.remove(lock_path)
+    with open(path) as f:
+        return json.load(f)
+
+
+class ShardReport:
+    """
+    Per-shard result files for one run, merged into a single per-user report at the end of the session.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, shard, records):
+        path = os.path.join(self.directory, f"results-{shard}.jsonl")
+        with open(path, "w") as f:
+            for record in records:
+                f.write(json.dumps(record, default=str))
+                f.write("\n")
+
+    def merge(self, output_path):
+        records = []
+        for path in sorted(glob.glob(os.path.join(self.directory, "results-*.jsonl"))):
+            with open(path) as f:
+                records.extend(json.loads(line) for line in f)
+        if not records:
+            return None
+        records.sort(key=lambda record: record["user"])
+        report = {
+            "users": len(records),
+            "shards": len(glob.glob(os.path.join(self.directory, "results-*.jsonl"))),
+            "failed": sum(1 for record in records if record["status"] != 200),
+            "results": records,
+        }
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        with open(output_path, "w") as f:
+            json.dump(report, f, indent=2)
+        return report
@@ -0,0 +1,187 @@
+import gc
+import logging
+import os
+import resource
+import threading
+import tracemalloc
+
+import httpx
+
+from utilities.db_pool import ConnectionPool
+
+MIB = 1024 * 1024
+
+# Largest acceptable growth per iteration (least-squares slope) before a soak run fails
+DEFAULT_THRESHOLDS = {
+    "rss_mib": 1.0,
+    "traced_mib": 0.5,
+    "fds": 0.2,
+    "sockets": 0.2,
+    "threads": 0.1,
+    "log_handlers": 0.01,
+    "http_clients": 0.01,
+    "db_pools": 0.01,
+    "db_connections": 0.1,
+    "db_cursors": 0.01,
+}
+
+# Iterations needed after the warm-up before slopes are judged
+MIN_ITERATIONS = 3
+
+
+def rss_bytes():
+    """
+    Current resident set size; the peak (ru_maxrss) where /proc is not available.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def open_descriptors():
+    """
+    ``(open file descriptors, of which sockets)`` for this process.
+    """
+    directory = "/proc/self/fd" if os.path.isdir("/proc/self/fd") else "/dev/fd"
+    descriptors = sockets = 0
+    for name in os.listdir(directory):
+        try:
+            target = os.readlink(os.path.join(directory, name))
+        except OSError:
+            continue
+        descriptors += 1
+        sockets += target.startswith("socket:")
+    return descriptors, sockets
+
+
+def log_handler_count():
+    loggers = [logging.getLogger()] + [logger for logger in logging.Logger.manager.loggerDict.values()
+                                       if isinstance(logger, logging.Logger)]
+    return sum(len(logger.handlers) for logger in loggers)
+
+
+def live_objects():
+    """
+    Open httpx clients and database connection pools still alive in the process, found in one pass over the heap.
+    """
+    counts = {"http_clients": 0, "db_pools": 0, "db_connections": 0, "db_cursors": 0}
+    for obj in gc.get_objects():
+        if isinstance(obj, (httpx.Client, httpx.AsyncClient)):
+            counts["http_clients"] += not obj.is_closed
+        elif isinstance(obj, ConnectionPool) and not obj._closed:
+            stats = obj.stats()
+            counts["db_pools"] += 1
+            counts["db_connections"] += stats["size"]
+            counts["db_cursors"] += stats["open_cursors"]
+    return counts
+
+
+def slope(points):
+    """
+    Least-squares slope of ``(x, y)`` points; 0.0 for fewer than two distinct x values.
+    """
+    if len(points) < 2:
+        return 0.0
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    spread = sum((x - mean_x) ** 2 for x, _ in points)
+    if not spread:
+        return 0.0
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / spread
+
+
+class ResourceMonitor:
+    """
+    Samples process resources between soak iterations and flags steady growth.
+
+    Each sample holds RSS, traced Python memory, open descriptors and sockets, threads, logging handlers, open httpx
+    clients and the database pool's connections and open cursors. After ``warmup`` iterations (caches and pools
+    filling up), the per-iteration least-squares slope of every metric is compared with its threshold. The largest
+    allocation growth since the warm-up is kept from tracemalloc to point at the leaking line.
+    """
+
+    def __init__(self, thresholds=None, warmup=1, trace_top=10):
+        self.thresholds = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+        unknown = set(self.thresholds) - set(DEFAULT_THRESHOLDS)
+        if unknown:
+            raise ValueError(f"Unknown soak metrics {sorted(unknown)}, expected some of {sorted(DEFAULT_THRESHOLDS)}.")
+        self.warmup = warmup
+        self.trace_top = trace_top
+        self.iterations = 0
+        self.samples = []
+        self.top_allocations = []
+        self._baseline = None
+        self._tracing = False
+
+    def start(self):
+        if self.trace_top and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing = True
+
+    def sample(self, iteration):
+        gc.collect()
+        descriptors, sockets = open_descriptors()
+        entry = {
+            "iteration": iteration,
+            "rss_mib": round(rss_bytes() / MIB, 3),
+            "traced_mib": round(tracemalloc.get_traced_memory()[0] / MIB, 3) if tracemalloc.is_tracing() else None,
+            "fds": descriptors,
+            "sockets": sockets,
+            "threads": threading.active_count(),
+            "log_handlers": log_handler_count(),
+            **live_objects(),
+        }
+        self.samples.append(entry)
+        if tracemalloc.is_tracing():
+            self._trace(iteration)
+        return entry
+
+    def _trace(self, iteration):
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        ])
+        # Compare against the end of the warm-up, so one-off caches do not dominate the list
+        if self._baseline is None or iteration <= self.warmup:
+            self._baseline = snapshot
+            return
+        self.top_allocations = [
+            {"location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+             "size_diff_kib": round(stat.size_diff / 1024, 1), "count_diff": stat.count_diff}
+            for stat in snapshot.compare_to(self._baseline, "lineno")[:self.trace_top] if stat.size_diff > 0
+        ]
+
+    def slopes(self):
+        judged = [entry for entry in self.samples if entry["iteration"] > self.warmup]
+        return {metric: round(slope([(entry["iteration"], entry[metric]) for entry in judged
+                                     if entry[metric] is not None]), 4)
+                for metric in self.thresholds}
+
+    def violations(self):
+        """
+        Metrics whose growth per iteration exceeds their threshold, once enough iterations have run.
+        """
+        if len([entry for entry in self.samples if entry["iteration"] > self.warmup]) < MIN_ITERATIONS:
+            return []
+        return [{"metric": metric, "slope": value, "threshold": self.thresholds[metric]}
+                for metric, value in self.slopes().items() if value > self.thresholds[metric]]
+
+    def stop(self):
+        if self._tracing:
+            tracemalloc.stop()
+            self._tracing = False
+
+    def report(self):
+        return {
+            "iterations": self.iterations,
+            "sampled": len(self.samples),
+            "warmup": self.warmup,
+            "thresholds": self.thresholds,
+            "slopes": self.slopes(),
+            "violations": self.violations(),
+            "top_allocations": self.top_allocations,
+            "samples": self.samples,
+        }
@@ -0,0 +1,190 @@
+"""
+Local stand-in for the MAP API, for hermetic benchmarks.
+
+``StandInAPI`` is a plain ASGI app serving ``/api/Access/GetUserAccessInfo`` (from a database seeded by
+``utilities.standin_db``) and ``/api/FieldData/GetFieldData`` (synthetic rows), with configurable latency, error and
+throttling rates and payload sizes. It honours If-None-Match and gzip, so the conditional cache and compression
+paths are exercised too.
+
+Serve it over HTTP (needs uvicorn) and point ``[api] base_url`` at it:
+
+    python -m utilities.standin_db --users 100000
+    python -m utilities.standin_api --db logs/standin.sqlite --latency-ms 20 --error-rate 0.01
+
+or run it in-process with ``httpx.ASGITransport(app=StandInAPI(...))``.
+"""
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import random
+import sqlite3
+import threading
+import time
+from urllib.parse import parse_qs
+
+USER_ACCESS_PATH = "/api/Access/GetUserAccessInfo"
+FIELD_DATA_PATH = "/api/FieldData/GetFieldData"
+
+USER_ACCESS_QUERY = (
+    "SELECT UA.RoleID, UA.FieldID, UA.GrantedOn, UA.IsActive FROM MAP.User_Master UM "
+    "JOIN MAP.User_Access UA ON UM.UserID = UA.UserID WHERE LOWER(UM.UserEmail) = ? ORDER BY UA.RoleID"
+)
+
+# Bodies smaller than this go out uncompressed, as most servers do
+GZIP_MIN_BYTES = 1024
+
+
+class StandInAPI:
+    """
+    ASGI app answering the two MAP endpoints the suite calls.
+
+    ``latency_ms`` (+ uniform ``jitter_ms``) is slept per request; ``error_rate`` of requests get ``error_status``
+    (500, or e.g. 503 to exercise retries) and ``throttle_rate`` a 429 with ``Retry-After: retry_after``.
+    GetFieldData returns ``field_rows`` rows per field.
+    """
+
+    def __init__(self, db_path=None, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, throttle_rate=0.0,
+                 error_status=500, retry_after=1, field_rows=10, seed=None):
+        self.db_path = db_path
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.field_rows = field_rows
+        self.random = random.Random(seed)
+        self.requests = 0
+        self._connection = None
+
+    @property
+    def connection(self):
+        if self._connection is None:
+            if self.db_path is None:
+                raise RuntimeError("GetUserAccessInfo needs a seeded database (db_path)")
+            self._connection = sqlite3.connect(":memory:", check_same_thread=False)
+            self._connection.execute("ATTACH DATABASE ? AS MAP", (self.db_path,))
+        return self._connection
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            while (await receive())["type"] != "lifespan.shutdown":
+                await send({"type": "lifespan.startup.complete"})
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+        if scope["type"] != "http":
+            return
+        self.requests += 1
+        headers = {name.decode().lower(): value.decode() for name, value in scope["headers"]}
+        params = {name: values[0] for name, values in parse_qs(scope["query_string"].decode()).items()}
+        delay = self.latency_ms + (self.random.uniform(0, self.jitter_ms) if self.jitter_ms else 0.0)
+        if delay:
+            await asyncio.sleep(delay / 1000)
+        status, extra_headers, body = self.respond(scope["method"], scope["path"], params, headers)
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(name.encode(), str(value).encode()) for name, value in extra_headers]})
+        await send({"type": "http.response.body", "body": body})
+
+    def respond(self, method, path, params, headers):
+        """
+        Returns ``(status, headers, body)`` for one request.
+        """
+        if method != "GET":
+            return self.json(405, {"error": "Method not allowed"})
+        roll = self.random.random()
+        if roll < self.throttle_rate:
+            status, response_headers, body = self.json(429, {"error": "Too many requests"})
+            return status, response_headers + [("retry-after", self.retry_after)], body
+        if roll < self.throttle_rate + self.error_rate:
+            return self.json(self.error_status, {"error": "Injected server error"})
+
+        if path == USER_ACCESS_PATH:
+            user_email = params.get("UserEmail")
+            if not user_email:
+                return self.json(400, {"error": "UserEmail is required"})
+            rows = self.connection.execute(USER_ACCESS_QUERY, (user_email.strip().lower(),)).fetchall()
+            if not rows:
+                return self.json(404, {"error": f"User {user_email} not found"})
+            payload = {"userEmail": user_email, "access": [
+                {"RoleID": role_id, "FieldID": field_id, "GrantedOn": granted_on, "IsActive": bool(is_active)}
+                for role_id, field_id, granted_on, is_active in rows
+            ]}
+        elif path == FIELD_DATA_PATH:
+            field_name = params.get("FieldName")
+            if not field_name:
+                return self.json(400, {"error": "FieldName is required"})
+            payload = {"fieldName": field_name, "rows": [
+                {"RowID": index, "FieldName": field_name, "Value": f"{field_name}-{index:06d}"}
+                for index in range(self.field_rows)
+            ]}
+        else:
+            return self.json(404, {"error": f"No route for {path}"})
+
+        status, response_headers, body = self.json(200, payload)
+        etag = '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+        if etag in [value.strip() for value in headers.get("if-none-match", "").split(",")]:
+            return 304, [("etag", etag)], b""
+        response_headers.append(("etag", etag))
+        if len(body) >= GZIP_MIN_BYTES and "gzip" in headers.get("accept-encoding", ""):
+            body = gzip.compress(body, compresslevel=1)
+            response_headers = [("content-encoding", "gzip")] + [
+                header for header in response_headers if header[0] != "content-length"]
+            response_headers.append(("content-length", len(body)))
+        return status, response_headers, body
+
+    @staticmethod
+    def json(status, payload):
+        body = json.dumps(payload, separators=(",", ":")).encode()
+        return status, [("content-type", "application/json"), ("content-length", len(body))], body
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+def serve_in_thread(app, host="127.0.0.1", port=0):
+    """
+    Serve ``app`` with uvicorn on a background thread (``port=0`` picks a free port). Returns ``(server, base_url)``;
+    set ``server.should_exit = True`` to stop it.
+    """
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning", lifespan="off"))
+    thread = threading.Thread(target=server.run, name="standin-api", daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError(f"Stand-in API failed to start on {host}:{port}")
+        time.sleep(0.01)
+    bound_port = server.servers[0].sockets[0].getsockname()[1]
+    return server, f"http://{host}:{bound_port}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the local stand-in MAP API.")
+    parser.add_argument("--db", default="logs/standin.sqlite", help="database seeded by utilities.standin_db")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--field-rows", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+    try:
+        import uvicorn
+    except ImportError:
+        parser.error("serving over HTTP needs uvicorn (pip install uvicorn); "
+                     "in-process use only needs httpx.ASGITransport")
+    app = StandInAPI(args.db, args.latency_ms, args.jitter_ms, args.error_rate, args.throttle_rate,
+                     error_status=args.error_status, field_rows=args.field_rows, seed=args.seed)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
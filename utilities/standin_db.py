@@ -0,0 +1,210 @@
+"""
+SQLite stand-in for the MAP SQL Server database, for hermetic benchmarks.
+
+``seed_database`` writes synthetic User_Master/User_Access/Field_Master tables to a SQLite file, and
+``SQLiteDatabaseManager`` runs the regular DatabaseManager code against it. The file is attached as schema ``MAP``
+and the few T-SQL constructs DatabaseManager uses (TOP, TABLESAMPLE, CHECKSUM_AGG/BINARY_CHECKSUM, COUNT_BIG, NEWID) are
+translated on the way in.
+
+    python -m utilities.standin_db --users 100000 --path logs/standin.sqlite
+"""
+import argparse
+import datetime
+import os
+import random
+import re
+import sqlite3
+import time
+import zlib
+
+from utilities.db_manager import DatabaseManager
+
+SCHEMA = """
+CREATE TABLE MAP.User_Master (UserID INTEGER PRIMARY KEY, UserEmail TEXT NOT NULL);
+CREATE TABLE MAP.User_Access (UserID INTEGER NOT NULL, RoleID INTEGER NOT NULL, FieldID INTEGER NOT NULL,
+                              GrantedOn TEXT NOT NULL, IsActive INTEGER NOT NULL);
+CREATE TABLE MAP.Field_Master (Field_Name TEXT PRIMARY KEY);
+"""
+INDEXES = """
+CREATE INDEX MAP.user_master_by_email ON User_Master (UserEmail);
+CREATE INDEX MAP.user_access_by_user ON User_Access (UserID);
+"""
+
+# Column lists for BINARY_CHECKSUM(*), which SQLite functions cannot take
+STAR_COLUMNS = {
+    "MAP.User_Master": "UserID, UserEmail",
+    "MAP.User_Access": "UserID, RoleID, FieldID, GrantedOn, IsActive",
+    "MAP.Field_Master": "Field_Name",
+}
+
+_TOP = re.compile(r"^SELECT (DISTINCT )?TOP \(?(\?|\d+)\)? (.*?);?$", re.DOTALL)
+_TABLESAMPLE = re.compile(r" TABLESAMPLE \([\d.]+ PERCENT\)")
+_STAR_CHECKSUM = re.compile(r"BINARY_CHECKSUM\(\*\)\) FROM (MAP\.\w+)")
+
+
+def translate(sql, params):
+    """
+    Rewrite one T-SQL statement (and its positional parameters) for SQLite.
+    """
+    sql = _STAR_CHECKSUM.sub(lambda m: f"BINARY_CHECKSUM({STAR_COLUMNS[m.group(1)]})) FROM {m.group(1)}", sql)
+    sql = sql.replace("COUNT_BIG(", "COUNT(").replace("NEWID()", "RANDOM()")
+    match = _TOP.match(sql.strip())
+    if match:
+        distinct, limit, rest = match.groups()
+        params = list(params)
+        if limit == "?":
+            limit = params.pop(0)
+        if _TABLESAMPLE.search(rest):
+            rest = _TABLESAMPLE.sub("", rest) + " ORDER BY RANDOM()"
+        sql = f"SELECT {distinct or ''}{rest} LIMIT ?"
+        params.append(int(limit))
+    return sql, tuple(params)
+
+
+def _binary_checksum(*values):
+    return zlib.crc32(repr(values).encode()) - 2 ** 31
+
+
+class _ChecksumAgg:
+    def __init__(self):
+        self.value = 0
+
+    def step(self, value):
+        if value is not None:
+            self.value ^= value
+
+    def finalize(self):
+        return self.value
+
+
+class TranslatingCursor:
+    """
+    pyodbc-style cursor (``execute(sql, *params)``) over a sqlite3 cursor.
+    """
+
+    def __init__(self, cursor):
+        object.__setattr__(self, "_cursor", cursor)
+
+    def execute(self, sql, *params):
+        self._cursor.execute(*translate(sql, params))
+        return self
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        # e.g. fetch_batches setting arraysize
+        setattr(self._cursor, name, value)
+
+
+class TranslatingConnection:
+    def __init__(self, connection):
+        self._connection = connection
+
+    def cursor(self):
+        return TranslatingCursor(self._connection.cursor())
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+def connect(path):
+    """
+    Open ``path`` attached as schema ``MAP``, with the T-SQL helper functions registered.
+    """
+    connection = sqlite3.connect(":memory:", check_same_thread=False)
+    connection.execute("ATTACH DATABASE ? AS MAP", (path,))
+    connection.create_function("BINARY_CHECKSUM", -1, _binary_checksum, deterministic=True)
+    connection.create_aggregate("CHECKSUM_AGG", 1, _ChecksumAgg)
+    return connection
+
+
+def seed_database(path, users=1000, access_per_user=3, fields=1000, seed=0, batch_size=50000):
+    """
+    (Re)create ``path`` with ``users`` users, up to ``access_per_user`` access rows each and ``fields`` field names.
+    Data is deterministic for a given ``seed``.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if os.path.exists(path):
+        os.remove(path)
+    rng = random.Random(seed)
+    connection = connect(path)
+    connection.executescript("PRAGMA MAP.journal_mode = OFF; PRAGMA MAP.synchronous = OFF;")
+    connection.executescript(SCHEMA)
+    epoch = datetime.datetime(2023, 1, 1)
+
+    def insert(sql, rows):
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                connection.executemany(sql, batch)
+                batch = []
+        if batch:
+            connection.executemany(sql, batch)
+
+    with connection:
+        insert("INSERT INTO MAP.Field_Master VALUES (?)", ((f"Field_{index:07d}",) for index in range(fields)))
+        insert("INSERT INTO MAP.User_Master VALUES (?, ?)",
+               ((user_id, f"user{user_id:07d}@example.com") for user_id in range(1, users + 1)))
+        insert("INSERT INTO MAP.User_Access VALUES (?, ?, ?, ?, ?)", (
+            (user_id, role_id, rng.randrange(fields),
+             (epoch + datetime.timedelta(minutes=rng.randrange(525600))).isoformat(), int(rng.random() > 0.1))
+            for user_id in range(1, users + 1)
+            for role_id in range(1, rng.randint(1, access_per_user) + 1)
+        ))
+    connection.executescript(INDEXES)
+    connection.close()
+    return path
+
+
+class SQLiteDatabaseManager(DatabaseManager):
+    """
+    DatabaseManager over a seeded SQLite file, with the same pooling, batching and snapshot behaviour.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        super().__init__()
+        self.server = "sqlite"
+        self.database = path
+        self.authentication = "sqlite"
+
+    def connect(self):
+        if not self.lazy_connect:
+            self.ensure_pool()
+
+    def open_connection(self):
+        start = time.perf_counter()
+        connection = TranslatingConnection(connect(self.path))
+        self.logger.info(f"Opened {self.path} in {time.perf_counter() - start:.3f}s")
+        return connection
+
+    def _table_info(self, table):
+        # SQLite has no INFORMATION_SCHEMA; PRAGMA table_info rows are (cid, name, type, notnull, default, pk)
+        with self.cursor() as cursor:
+            cursor.execute(f"PRAGMA MAP.table_info({table})")
+            return cursor.fetchall()
+
+    def table_columns(self, table):
+        return [row[1] for row in self._table_info(table)]
+
+    def primary_key_columns(self, table):
+        return [row[1] for row in self._table_info(table) if row[5]]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Seed the SQLite stand-in for the MAP database.")
+    parser.add_argument("--path", default="logs/standin.sqlite")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--access-per-user", type=int, default=3)
+    parser.add_argument("--fields", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    start = time.perf_counter()
+    seed_database(args.path, args.users, args.access_per_user, args.fields, args.seed)
+    print(f"Seeded {args.users} users and {args.fields} fields into {args.path} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import logging
+import struct
+import threading
+import time
+
+from utilities.secret_provider import shared_credential
+
+logger = logging.getLogger(__name__)
+
+# msodbcsql pre-connect attribute that takes an AAD access token instead of an AUTHENTICATION= keyword
+SQL_COPT_SS_ACCESS_TOKEN = 1256
+SQL_SERVER_SCOPE = "https://database.windows.net/.default"
+
+
+def access_token_attrs(token):
+    """
+    Build the pyodbc ``attrs_before`` dict that hands ``token`` to the ODBC driver.
+    """
+    raw = token.encode("utf-16-le")
+    return {SQL_COPT_SS_ACCESS_TOKEN: struct.pack(f"<I{len(raw)}s", len(raw), raw)}
+
+
+class AzureIdentityTokenProvider:
+    """
+    Acquire SQL Server tokens through azure-identity (managed identity, service principal, CLI, ...).
+    """
+
+    def __init__(self, credential=None, scope=SQL_SERVER_SCOPE):
+        self.credential = credential
+        self.scope = scope
+
+    def get_token(self):
+        credential = self.credential or shared_credential()
+        token = credential.get_token(self.scope)
+        return token.token, token.expires_on
+
+
+class StaticTokenProvider:
+    """
+    Fixed token source for tests and local runs; counts how often it is asked.
+    """
+
+    def __init__(self, token, lifetime=3600.0):
+        self.token = token
+        self.lifetime = lifetime
+        self.calls = 0
+
+    def get_token(self):
+        self.calls += 1
+        return self.token, time.time() + self.lifetime
+
+
+class CachedTokenProvider:
+    """
+    Reuse a token from ``provider`` until ``refresh_margin`` seconds before it expires.
+    """
+
+    def __init__(self, provider, refresh_margin=300.0):
+        self.provider = provider
+        self.refresh_margin = refresh_margin
+        self._token = None
+        self._expires_on = 0.0
+        self._lock = threading.Lock()
+
+    def get_token(self):
+        with self._lock:
+            if self._token is None or time.time() >= self._expires_on - self.refresh_margin:
+                start = time.perf_counter()
+                self._token, self._expires_on = self.provider.get_token()
+                logger.info(f"Acquired database access token in {time.perf_counter() - start:.3f}s "
+                            f"(expires in {self._expires_on - time.time():.0f}s)")
+            return self._token, self._expires_on